@@ -6,8 +6,8 @@ except ImportError:
     import warnings
 
     warnings.warn(
-        "{pkg!r} must be installed via 'pip install AlbertUnruhUtils.py[{extra}]'".format(
-            pkg=__package__, extra="async"
+        "{pkg!r} requires {req!r} (it uses 'redis.asyncio')".format(
+            pkg=__package__, req="redis>=4.5.4,<4.6.0"
         ),
         category=UserWarning,
     )
@@ -1 +1,6 @@
+from .backend import *
+from .breaker import *
+from .concurrency import *
+from .metrics import *
 from .server import *
+from .store import *
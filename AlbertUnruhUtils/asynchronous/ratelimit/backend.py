@@ -0,0 +1,703 @@
+__all__ = (
+    "Backend",
+    "RedisBackend",
+    "MemoryBackend",
+    "TimerWheelBackend",
+)
+
+
+import asyncio
+import math
+import typing
+from redis.asyncio import (
+    BlockingConnectionPool,
+    Redis,
+)
+from redis.exceptions import NoScriptError
+from time import (
+    monotonic,
+    time,
+)
+
+from ...ratelimit import backend as _sync
+from ...ratelimit.backend import (
+    _PEEK_SCRIPTS,
+    _RETRY_AFTER_SCRIPTS,
+    _SCRIPTS,
+    _Result,
+    _Rule,
+    _member,
+)
+
+
+# the pools which are shared between ``RedisBackend``'s (keyed by their connection-parameters)
+_POOLS: dict[tuple, BlockingConnectionPool] = {}
+
+
+def _pool(
+    host: str,
+    port: int,
+    db: int,
+    max_connections: int,
+    timeout: typing.Optional[float],
+    socket_timeout: typing.Optional[float],
+) -> BlockingConnectionPool:
+    key = (host, port, db, max_connections, timeout, socket_timeout)
+    pool = _POOLS.get(key)
+    if pool is None:
+        pool = _POOLS.setdefault(
+            key,
+            BlockingConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                max_connections=max_connections,
+                timeout=timeout,
+                socket_timeout=socket_timeout,
+            ),
+        )
+    return pool
+
+
+class Backend(typing.Protocol):
+    """The storage a ``ServerRateLimit`` keeps it's calls and cooldowns in."""
+
+    async def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        """
+        Records a call which expires after ``interval`` seconds.
+
+        Parameters
+        ----------
+        key: str
+        interval: int
+        """
+
+    async def count(
+        self,
+        key: str,
+    ) -> int:
+        """
+        Removes expired calls and counts the remaining ones.
+
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        int
+        """
+
+    async def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        """
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        int
+            The remaining cooldown in seconds (``0`` if there is none).
+        """
+
+    async def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        """
+        Starts a cooldown, unless there is already one.
+
+        Parameters
+        ----------
+        key: str
+        timeout: int
+        """
+
+    async def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        """
+        Cleans, counts, applies the cooldowns and records the call
+        in one atomic operation. The call is only recorded if every rule allows it.
+
+        Parameters
+        ----------
+        algorithm: str
+        rules: typing.Sequence[_Rule]
+            ``key``, ``cooldown_key``, ``amount``, ``interval`` and ``timeout`` of every rule.
+        buckets: int
+
+        Returns
+        -------
+        _Result
+            Whether the call is allowed and the remaining calls and the timeout of every rule.
+        """
+
+    async def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        """
+        Like ``evaluate``, but for many requests in one round trip.
+        Every request is evaluated on it's own.
+
+        Parameters
+        ----------
+        algorithm: str
+        requests: typing.Sequence[typing.Sequence[_Rule]]
+            The rules of every request.
+        buckets: int
+
+        Returns
+        -------
+        list[_Result]
+        """
+
+    async def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        """
+        Like ``evaluate`` with ``algorithm="sliding_log"``,
+        but records up to ``size`` calls at once.
+
+        Parameters
+        ----------
+        rules: typing.Sequence[_Rule]
+        size: int
+
+        Returns
+        -------
+        tuple[int, list[tuple[int, int]], typing.Any]
+            The granted calls, the remaining calls and the timeout of every rule
+            and a handle which is needed to ``release`` the lease.
+        """
+
+    async def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        """
+        Gives ``unused`` calls of a lease back.
+
+        Parameters
+        ----------
+        handle: typing.Any
+            The handle returned by ``lease``.
+        unused: int
+        """
+
+    async def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        """
+        Parameters
+        ----------
+        algorithm: str
+        rules: typing.Sequence[_Rule]
+        ahead: int
+            How many calls are queued in front of this one.
+        buckets: int
+
+        Returns
+        -------
+        float
+            The seconds until every rule allows a call again (``0`` if they do already).
+        """
+
+    async def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        """
+        Like ``evaluate``, but only reads (nothing is cleaned, recorded or put in cooldown).
+
+        Parameters
+        ----------
+        algorithm: str
+        rules: typing.Sequence[_Rule]
+        buckets: int
+
+        Returns
+        -------
+        _Result
+            Whether a call would be allowed and the remaining calls and the timeout of every rule.
+        """
+
+
+class RedisBackend:
+    """Keeps calls and cooldowns in redis (the default for ``ServerRateLimit``)."""
+
+    redis: Redis
+
+    __slots__ = (
+        "redis",
+        "_scripts",
+        "_retry_after_scripts",
+        "_peek_scripts",
+    )
+
+    def __init__(
+        self,
+        redis: Redis = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 6262,
+        db: int = 0,
+        max_connections: int = 50,
+        timeout: typing.Optional[float] = 20,
+        socket_timeout: typing.Optional[float] = None,
+    ):
+        """
+        Parameters
+        ----------
+        redis: Redis, optional
+            An own redis can optionally be set.
+            Otherwise a ``redis.asyncio.Redis`` is used whose connection-pool is shared
+            by every ``RedisBackend`` with the same parameters in this process.
+        host: str
+        port: int
+        db: int
+        max_connections: int
+            How many connections the pool opens at most.
+        timeout: float, optional
+            How many seconds a command waits for a free connection of the pool
+            (``None`` waits forever).
+        socket_timeout: float, optional
+            How many seconds a command may take (``None`` waits forever).
+
+        Notes
+        -----
+        The connections of a pool are bound to the event loop they're opened in,
+        so a shared pool can only be used by one event loop.
+        """
+        if not isinstance(max_connections, int) or max_connections < 1:
+            raise ValueError(
+                f"max_connections must be a positive int, not {max_connections!r}!"
+            )
+
+        if redis is None:
+            redis = Redis(
+                connection_pool=_pool(
+                    host, port, db, max_connections, timeout, socket_timeout
+                )
+            )
+        self.redis = redis
+        self._scripts = {
+            algorithm: redis.register_script(script)
+            for algorithm, script in _SCRIPTS.items()
+        }
+        self._retry_after_scripts = {
+            algorithm: redis.register_script(script)
+            for algorithm, script in _RETRY_AFTER_SCRIPTS.items()
+        }
+        self._peek_scripts = {
+            algorithm: redis.register_script(script)
+            for algorithm, script in _PEEK_SCRIPTS.items()
+        }
+
+    async def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {_member(): time() + interval})
+            pipe.expire(key, interval)
+            await pipe.execute()
+
+    async def count(
+        self,
+        key: str,
+    ) -> int:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            # cleanup
+            pipe.zremrangebyscore(key, 0, time())
+            pipe.zcard(key)
+            _, count = await pipe.execute()
+        return int(count or 0)
+
+    async def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        return max(0, await self.redis.ttl(key))
+
+    async def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        if timeout > 0:
+            await self.redis.set(key, 1, ex=timeout, nx=True)
+
+    async def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        granted, results = self._parse(
+            await self._scripts[algorithm](
+                *self._keys_and_args(algorithm, rules, buckets)
+            )
+        )
+        return bool(granted), results
+
+    async def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        responses = await self._evaluate_many(algorithm, requests, buckets)
+        if any(isinstance(response, NoScriptError) for response in responses):
+            # the script isn't cached (yet), so it's loaded and everything is retried
+            await self.redis.script_load(self._scripts[algorithm].script)
+            responses = await self._evaluate_many(algorithm, requests, buckets)
+
+        evaluated = []
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
+            granted, results = self._parse(response)
+            evaluated.append((bool(granted), results))
+        return evaluated
+
+    async def _evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        buckets: int,
+    ) -> list[typing.Any]:
+        sha = self._scripts[algorithm].sha
+        pipe = self.redis.pipeline(transaction=False)
+        for rules in requests:
+            keys, args = self._keys_and_args(algorithm, rules, buckets)
+            pipe.evalsha(sha, len(keys), *keys, *args)
+        return await pipe.execute(raise_on_error=False)
+
+    async def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        token = _member()
+        granted, results = self._parse(
+            await self._scripts["sliding_log"](
+                *self._keys_and_args("sliding_log", rules, 0, member=token, size=size)
+            )
+        )
+        return granted, results, (token, granted, [rule[0] for rule in rules])
+
+    async def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        token, granted, keys = handle
+        members = [
+            b"%s:%d" % (token, i) for i in range(granted - unused + 1, granted + 1)
+        ]
+        if not members:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrem(key, *members)
+        await pipe.execute()
+
+    async def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        return float(
+            await self._retry_after_scripts[algorithm](
+                *self._keys_and_args(algorithm, rules, buckets, size=ahead)
+            )
+        )
+
+    async def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        allowed, results = self._parse(
+            await self._peek_scripts[algorithm](
+                *self._keys_and_args(algorithm, rules, buckets)
+            )
+        )
+        return bool(allowed), results
+
+    _keys_and_args = staticmethod(_sync.RedisBackend._keys_and_args)
+    _parse = staticmethod(_sync.RedisBackend._parse)
+
+
+class MemoryBackend:
+    """
+    Keeps calls and cooldowns in-process, so limiting costs
+    microseconds instead of a network hop.
+
+    Notes
+    -----
+    This wraps ``.ratelimit.backend.MemoryBackend``, which can be passed
+    to share the limits with synchronous ``ServerRateLimit``'s.
+    """
+
+    __slots__ = ("_backend",)
+
+    def __init__(
+        self,
+        backend: _sync.MemoryBackend = None,
+    ):
+        """
+        Parameters
+        ----------
+        backend: .ratelimit.backend.MemoryBackend, optional
+        """
+        if backend is None:
+            backend = _sync.MemoryBackend()
+        self._backend = backend
+
+    @property
+    def algorithms(self) -> typing.Optional[tuple[str, ...]]:
+        """The algorithms the wrapped backend supports (``None`` if it supports all)."""
+        return getattr(self._backend, "algorithms", None)
+
+    def __len__(self) -> int:
+        return len(self._backend)
+
+    async def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        self._backend.record(key, interval)
+
+    async def count(
+        self,
+        key: str,
+    ) -> int:
+        return self._backend.count(key)
+
+    async def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        return self._backend.get_cooldown(key)
+
+    async def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        self._backend.set_cooldown(key, timeout)
+
+    async def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return self._backend.evaluate(algorithm, rules, buckets=buckets)
+
+    async def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        return self._backend.evaluate_many(algorithm, requests, buckets=buckets)
+
+    async def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        return self._backend.lease(rules, size)
+
+    async def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        self._backend.release(handle, unused)
+
+    async def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        return self._backend.retry_after(algorithm, rules, ahead=ahead, buckets=buckets)
+
+    async def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return self._backend.peek(algorithm, rules, buckets=buckets)
+
+
+class _WheelStore(_sync.MemoryBackend):
+    """
+    A ``.ratelimit.backend.MemoryBackend`` whose expired entries are dropped
+    by a hashed timer wheel (driven by ``loop.call_later``) instead of a heap
+    which is swept on every call.
+    """
+
+    __slots__ = (
+        "tick",
+        "_wheel",
+        "_position",
+        "_handle",
+    )
+
+    def __init__(
+        self,
+        tick: float,
+        slots: int,
+    ):
+        super().__init__()
+        self.tick = tick
+        self._wheel: list[set[str]] = [set() for _ in range(slots)]
+        # the next tick which is processed
+        self._position = 0
+        self._handle: typing.Optional[asyncio.TimerHandle] = None
+
+    def _sweep(
+        self,
+        now: float,
+    ) -> None:
+        # expired entries are dropped by ``_advance`` (``_get`` ignores them until then)
+        pass
+
+    def _put(
+        self,
+        key: str,
+        expires: float,
+        value: typing.Any,
+    ) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = _sync._Entry(expires, value)
+            if self._handle is None:
+                self._position = math.floor(monotonic() / self.tick)
+                self._handle = asyncio.get_running_loop().call_later(
+                    self.tick, self._advance
+                )
+            self._schedule(key, expires)
+        else:
+            # the entry is rescheduled when it's old slot comes up
+            entry.expires = expires
+            entry.value = value
+
+    def _schedule(
+        self,
+        key: str,
+        expires: float,
+    ) -> None:
+        tick = max(math.floor(expires / self.tick), self._position)
+        self._wheel[tick % len(self._wheel)].add(key)
+
+    def _advance(self) -> None:
+        with self._lock:
+            now = monotonic()
+            current = math.floor(now / self.tick)
+            while self._position <= current:
+                index = self._position % len(self._wheel)
+                keys, self._wheel[index] = self._wheel[index], set()
+                self._position += 1
+
+                for key in keys:
+                    entry = self._entries.get(key)
+                    if entry is None:
+                        continue
+                    if entry.expires <= now:
+                        del self._entries[key]
+                    else:
+                        # the entry got extended or expires in a later round
+                        self._schedule(key, entry.expires)
+
+            if self._entries:
+                self._handle = asyncio.get_running_loop().call_later(
+                    self.tick, self._advance
+                )
+            else:
+                self._handle = None
+
+
+class TimerWheelBackend(MemoryBackend):
+    """
+    Keeps calls and cooldowns in-process like ``MemoryBackend``,
+    but expires them with a hashed timer wheel on the running event loop,
+    so no call has to scan for expired entries.
+
+    Notes
+    -----
+    The limits are only shared between the ``ServerRateLimit``'s
+    using the same instance, which has to be used by one event loop only.
+    """
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        *,
+        tick: float = 0.1,
+        slots: int = 1024,
+    ):
+        """
+        Parameters
+        ----------
+        tick: float
+            How many seconds one slot of the wheel covers.
+            Expired entries are dropped at most one ``tick`` late.
+        slots: int
+            How many slots the wheel has. Entries which expire
+            more than ``tick * slots`` seconds ahead take several rounds.
+        """
+        if not tick > 0:
+            raise ValueError(f"tick must be positive, not {tick!r}!")
+        if not isinstance(slots, int) or slots < 1:
+            raise ValueError(f"slots must be a positive int, not {slots!r}!")
+
+        super().__init__(_WheelStore(tick, slots))
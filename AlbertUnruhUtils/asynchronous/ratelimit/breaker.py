@@ -0,0 +1,219 @@
+__all__ = (
+    "CircuitBreaker",
+    "BreakerBackend",
+)
+
+
+import asyncio
+import typing
+from time import perf_counter
+
+from ...ratelimit import breaker as _sync
+from ...ratelimit.backend import (
+    _Result,
+    _Rule,
+)
+from ...ratelimit.breaker import (
+    _FALLBACK,
+    CircuitBreaker,
+)
+from .backend import Backend
+
+
+# the errors which count as a failed call of the backend
+_FAILURES = _sync._FAILURES + (asyncio.TimeoutError,)
+
+
+class BreakerBackend:
+    """
+    Wraps a backend (e.g. ``RedisBackend``) with a ``CircuitBreaker``.
+    While the breaker is open, or if a call fails, the ``fallback`` answers instead,
+    so a slow or unavailable redis doesn't block every limited call.
+
+    Notes
+    -----
+    The fallback is the same as the one of ``.ratelimit.breaker.BreakerBackend``
+    (it's in-process, so it doesn't need to be awaited).
+    """
+
+    backend: Backend
+    breaker: CircuitBreaker
+    fallback: _FALLBACK
+    timeout: typing.Optional[float]
+
+    __slots__ = (
+        "backend",
+        "breaker",
+        "fallback",
+        "timeout",
+        "_fallback",
+    )
+
+    def __init__(
+        self,
+        backend: Backend,
+        *,
+        breaker: CircuitBreaker = None,
+        fallback: _FALLBACK = "local",
+        timeout: float = None,
+    ):
+        """
+        Parameters
+        ----------
+        backend: Backend
+        breaker: CircuitBreaker, optional
+            Defaults to a ``CircuitBreaker()``.
+        fallback: _FALLBACK
+            Who answers while the breaker is open.
+            ``"local"`` limits approximately in-process (with a ``MemoryBackend``, default),
+            ``"open"`` allows every call and ``"closed"`` rejects every call.
+        timeout: float, optional
+            After how many seconds a call of the backend is cancelled (and counts as failed).
+        """
+        if fallback not in _FALLBACK.__args__:  # type: ignore
+            raise ValueError(
+                f"Unknown fallback {fallback!r}! "
+                f"Use one of them instead: {', '.join(_FALLBACK.__args__)}"  # type: ignore
+            )
+        if timeout is not None and not timeout > 0:
+            raise ValueError(f"timeout must be positive, not {timeout!r}!")
+        if breaker is None:
+            breaker = CircuitBreaker()
+
+        self.backend = backend
+        self.breaker = breaker
+        self.fallback = fallback
+        self.timeout = timeout
+        if fallback == "local":
+            self._fallback = _sync.MemoryBackend()
+        else:
+            self._fallback = _sync._StaticBackend(fallback == "open", breaker)
+
+    @property
+    def algorithms(self) -> typing.Optional[tuple[str, ...]]:
+        """The algorithms the wrapped backend supports (``None`` if it supports all)."""
+        return getattr(self.backend, "algorithms", None)
+
+    async def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        await self._call("record", key, interval)
+
+    async def count(
+        self,
+        key: str,
+    ) -> int:
+        return await self._call("count", key)
+
+    async def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        return await self._call("get_cooldown", key)
+
+    async def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        await self._call("set_cooldown", key, timeout)
+
+    async def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return await self._call("evaluate", algorithm, rules, buckets=buckets)
+
+    async def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        return await self._call("evaluate_many", algorithm, requests, buckets=buckets)
+
+    async def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        source = self.backend
+        succeeded, leased = await self._try("lease", rules, size)
+        if not succeeded:
+            source = self._fallback
+            leased = self._fallback.lease(rules, size)
+        granted, results, handle = leased
+        # the handle is only known by the backend which leased it
+        return granted, results, (source, handle)
+
+    async def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        source, handle = handle
+        if source is self._fallback:
+            self._fallback.release(handle, unused)
+        else:
+            # if the backend is down, the leased calls expire there on their own
+            await self._try("release", handle, unused)
+
+    async def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        return await self._call(
+            "retry_after", algorithm, rules, ahead=ahead, buckets=buckets
+        )
+
+    async def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return await self._call("peek", algorithm, rules, buckets=buckets)
+
+    async def _call(
+        self,
+        method: str,
+        *args,
+        **kwargs,
+    ) -> typing.Any:
+        """Calls ``method`` of the backend (or of the fallback if the breaker is open or the call fails)."""
+        succeeded, result = await self._try(method, *args, **kwargs)
+        if succeeded:
+            return result
+        return getattr(self._fallback, method)(*args, **kwargs)
+
+    async def _try(
+        self,
+        method: str,
+        *args,
+        **kwargs,
+    ) -> tuple[bool, typing.Any]:
+        """Calls ``method`` of the backend if the breaker allows it and reports the outcome to the breaker."""
+        if not self.breaker.allow():
+            return False, None
+
+        start = perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                getattr(self.backend, method)(*args, **kwargs), self.timeout
+            )
+        except _FAILURES:
+            self.breaker.failed()
+            return False, None
+        self.breaker.succeeded(perf_counter() - start)
+        return True, result
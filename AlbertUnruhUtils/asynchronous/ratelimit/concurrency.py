@@ -0,0 +1,280 @@
+__all__ = ("ConcurrencyLimit",)
+
+
+import functools
+import typing
+from redis.asyncio import Redis
+from time import time
+
+from ...ratelimit._scripts import (
+    ACQUIRE_SLOT,
+    EXTEND_SLOT,
+)
+from ...ratelimit.backend import _member
+from ...ratelimit.concurrency import _validate
+from ...ratelimit.policy import _layout
+from .backend import RedisBackend
+
+
+C_IN = typing.TypeVar("C_IN")
+C_OUT = typing.TypeVar("C_OUT")
+
+
+class ConcurrencyLimit:
+    """
+    Limits how many calls of a ``section`` and ``id`` run at once
+    (a distributed semaphore), while ``ServerRateLimit`` limits how many start per interval.
+    """
+
+    sections: dict[str, dict[str, int]]
+    retrieve_section: typing.Callable[
+        [...], typing.Awaitable[tuple[str, typing.Union[str, int]]]
+    ]
+
+    __slots__ = (
+        "sections",
+        "retrieve_section",
+        "redis",
+        "key_prefix",
+        "hash_tags",
+        "_acquire_slot",
+        "_extend_slot",
+    )
+
+    def __init__(
+        self,
+        sections: dict[str, dict[str, int]],
+        retrieve_section: typing.Callable[
+            [...], typing.Awaitable[tuple[str, typing.Union[str, int]]]
+        ],
+        *,
+        redis: Redis = None,
+        key_prefix: str = "",
+        hash_tags: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        sections: dict[str, dict[str, int]]
+            Parameter ``sections`` requires following structure:
+            ```py
+            >>> {
+            ...     "<NAME or TYPE (e.g. user, admin etc.)>": {
+            ...         # type: int
+            ...         "amount": 5  # how many calls can run at once
+            ...
+            ...         # type: int
+            ...         "ttl": 60  # in seconds  # the slot of a call is freed after this (e.g. if the worker crashed)
+            ...     },
+            ...     ...
+            ... }
+            ```
+        retrieve_section: typing.Callable[[...], typing.Awaitable[tuple[str, typing.Union[str, int]]]]
+            Works like ``retrieve_section`` of ``ServerRateLimit``.
+        redis: Redis, optional
+            An own redis can optionally be set.
+            Otherwise the connection-pool of a default ``RedisBackend`` is shared.
+        key_prefix: str
+        hash_tags: bool
+            Lay the keys out like ``ServerRateLimit`` does (e.g. ``rl:{user:42}:inflight``
+            with ``key_prefix="rl:"`` and ``hash_tags=True``).
+
+        Raises
+        ------
+        ValueError
+            If a section has no positive ``amount`` or ``ttl``.
+
+        Notes
+        -----
+        ``ttl`` should be longer than the slowest call, otherwise it's slot is freed
+        while it's still running (a call which was acquired with ``acquire()``
+        can keep it's slot longer with ``extend()``).
+        """
+        _validate(sections)
+        if redis is None:
+            redis = RedisBackend().redis
+
+        if hash_tags and "{" in key_prefix:
+            # redis only hashes the first part in braces
+            raise ValueError(
+                f"key_prefix can't contain braces with hash_tags, not {key_prefix!r}!"
+            )
+
+        self.sections = sections
+        self.retrieve_section = retrieve_section
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.hash_tags = hash_tags
+        self._acquire_slot = redis.register_script(ACQUIRE_SLOT)
+        self._extend_slot = redis.register_script(EXTEND_SLOT)
+
+    def __call__(
+        self,
+        func: typing.Callable[[C_IN], typing.Awaitable[C_OUT]],
+    ) -> typing.Callable[
+        [C_IN], typing.Awaitable[tuple[tuple[bool, dict[str, int]], C_OUT]]
+    ]:
+        async def decorator(
+            *args, **kwargs
+        ) -> tuple[tuple[bool, dict[str, int]], C_OUT]:
+            """
+            Returns
+            -------
+            tuple[tuple[bool, dict[str, int]], C_OUT]
+            """
+            section, id = await self.retrieve_section(*args, **kwargs)  # noqa
+
+            token, remaining = await self.acquire(section, id)
+            data = self._data(section, remaining)
+
+            if token is None:
+                return (False, data), ()
+            try:
+                return (True, data), await func(*args, **kwargs)
+            finally:
+                await self.release(section, id, token)
+
+        return functools.update_wrapper(decorator, func)
+
+    async def acquire(
+        self,
+        section: str,
+        id: typing.Union[str, int],  # noqa
+    ) -> tuple[typing.Optional[bytes], int]:
+        """
+        Acquires a slot, which has to be given back via ``release``.
+
+        Parameters
+        ----------
+        section: str
+        id: str, int
+
+        Returns
+        -------
+        tuple[bytes, optional, int]
+            The token of the slot (``None`` if every slot is taken) and the remaining slots.
+
+        Raises
+        ------
+        RuntimeError
+            If ``section`` is unknown.
+        """
+        self._check_section(section)
+
+        token = _member()
+        acquired, remaining = await self._acquire_slot(
+            keys=[self._key(section, id)],
+            args=[
+                time(),
+                self.sections[section]["amount"],
+                self.sections[section]["ttl"],
+                token,
+            ],
+        )
+        return (token if acquired else None), int(remaining)
+
+    async def extend(
+        self,
+        section: str,
+        id: typing.Union[str, int],  # noqa
+        token: bytes,
+    ) -> bool:
+        """
+        Restarts the ``ttl`` of a slot (e.g. periodically while a long call runs).
+
+        Parameters
+        ----------
+        section: str
+        id: str, int
+        token: bytes
+            The token returned by ``acquire``.
+
+        Returns
+        -------
+        bool
+            Whether the slot was still held (``False`` if it was already freed after ``ttl``).
+
+        Raises
+        ------
+        RuntimeError
+            If ``section`` is unknown.
+        """
+        self._check_section(section)
+        return bool(
+            await self._extend_slot(
+                keys=[self._key(section, id)],
+                args=[time(), self.sections[section]["ttl"], token],
+            )
+        )
+
+    async def release(
+        self,
+        section: str,
+        id: typing.Union[str, int],  # noqa
+        token: bytes,
+    ) -> None:
+        """
+        Gives a slot back.
+
+        Parameters
+        ----------
+        section: str
+        id: str, int
+        token: bytes
+            The token returned by ``acquire``.
+        """
+        await self.redis.zrem(self._key(section, id), token)
+
+    def _key(
+        self,
+        section: str,
+        id: typing.Union[str, int],  # noqa
+    ) -> str:
+        """The key of the slots of ``section`` and ``id``."""
+        head, tail = _layout(section, "inflight", self.key_prefix, self.hash_tags)
+        return f"{head}{id}{tail}"
+
+    def _check_section(
+        self,
+        section: str,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        section: str
+
+        Raises
+        ------
+        RuntimeError
+            If ``section`` is unknown.
+        """
+        if section not in self.sections:
+            raise RuntimeError(
+                "Can't use key {section!r}. You have to return one of the following: {possible}".format(
+                    section=section,
+                    possible=", ".join(f"{k!r}" for k in self.sections),
+                )
+            )
+
+    def _data(
+        self,
+        section: str,
+        remaining: int,
+    ) -> dict[str, dict[str, int]]:
+        """
+        Parameters
+        ----------
+        section: str
+        remaining: int
+
+        Returns
+        -------
+        dict[str, dict[str, int]]
+        """
+        return {
+            "request": {
+                "remaining": remaining,
+                "limit": self.sections[section]["amount"],
+                "ttl": self.sections[section]["ttl"],
+            }
+        }
@@ -0,0 +1,151 @@
+__all__ = (
+    "Observer",
+    "Metrics",
+    "MetricsBackend",
+)
+
+
+import typing
+from time import perf_counter
+
+from ...ratelimit.backend import (
+    _Result,
+    _Rule,
+)
+from ...ratelimit.metrics import (
+    Metrics,
+    Observer,
+)
+from .backend import Backend
+
+
+class MetricsBackend:
+    """
+    Wraps a backend and reports how long every call of it took
+    (as ``"backend"``) to an ``Observer``.
+    ``ServerRateLimit(metrics=...)`` wraps it's backend with it.
+
+    Notes
+    -----
+    The ``Observer`` is the same as the one of ``.ratelimit.metrics``
+    (it's in-process, so it doesn't need to be awaited).
+    """
+
+    backend: Backend
+    observer: Observer
+
+    __slots__ = (
+        "backend",
+        "observer",
+    )
+
+    def __init__(
+        self,
+        backend: Backend,
+        observer: Observer,
+    ):
+        """
+        Parameters
+        ----------
+        backend: Backend
+        observer: Observer
+        """
+        self.backend = backend
+        self.observer = observer
+
+    @property
+    def algorithms(self) -> typing.Optional[tuple[str, ...]]:
+        """The algorithms the wrapped backend supports (``None`` if it supports all)."""
+        return getattr(self.backend, "algorithms", None)
+
+    async def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        await self._call("record", key, interval)
+
+    async def count(
+        self,
+        key: str,
+    ) -> int:
+        return await self._call("count", key)
+
+    async def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        return await self._call("get_cooldown", key)
+
+    async def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        await self._call("set_cooldown", key, timeout)
+
+    async def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return await self._call("evaluate", algorithm, rules, buckets=buckets)
+
+    async def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        return await self._call("evaluate_many", algorithm, requests, buckets=buckets)
+
+    async def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        return await self._call("lease", rules, size)
+
+    async def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        await self._call("release", handle, unused)
+
+    async def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        return await self._call(
+            "retry_after", algorithm, rules, ahead=ahead, buckets=buckets
+        )
+
+    async def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return await self._call("peek", algorithm, rules, buckets=buckets)
+
+    async def _call(
+        self,
+        method: str,
+        *args,
+        **kwargs,
+    ) -> typing.Any:
+        """Calls ``method`` of the backend and reports how long it took (also if it fails)."""
+        start = perf_counter()
+        try:
+            return await getattr(self.backend, method)(*args, **kwargs)
+        finally:
+            self.observer.observe("backend", perf_counter() - start)
@@ -1,38 +1,233 @@
 __all__ = ("ServerRateLimit",)
 
 
+import asyncio
 import functools
+import heapq
+import itertools
 import typing
-import uuid
-from aioredis import Redis
-from time import time
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from time import (
+    monotonic,
+    perf_counter,
+)
+
+from ...ratelimit._base import (
+    BaseServerRateLimit,
+    _ALGORITHM,
+    _ENGINE,
+    _Policies,
+    _SCOPE,
+    _SCOPES,
+    _SECTION,
+)
+from ...ratelimit.policy import Decision
+from ...ratelimit.store import PolicyStore
+from .backend import (
+    Backend,
+    RedisBackend,
+    _Result,
+    _Rule,
+)
+from .metrics import (
+    MetricsBackend,
+    Observer,
+)
 
 
 C_IN = typing.TypeVar("C_IN")
 C_OUT = typing.TypeVar("C_OUT")
 
 
-class ServerRateLimit:
-    """Docs 'll come soon... (If you want docs right now you can take a look into ``__init__``)"""
+class _Lease:
+    """Calls which are leased from the backend and handed out locally."""
+
+    __slots__ = (
+        "permits",
+        "remaining",
+        "expires",
+        "handle",
+        "lock",
+        "swept",
+    )
+
+    def __init__(self):
+        self.permits = 0
+        self.remaining: list[int] = []
+        self.expires = 0.0
+        self.handle = None
+        self.lock = asyncio.Lock()
+        # set once the lease is removed from ``_leases``, a waiting call has to look it up again
+        self.swept = False
 
-    sections: dict[str, dict[str, int]]
-    retrieve_section: typing.Callable[[...], typing.Awaitable[tuple[str, str]]]
 
-    __slots__ = ("sections", "retrieve_section", "_redis")
+class _Waiters:
+    """Parks waiting calls until their wake-up time and wakes them in order."""
+
+    __slots__ = (
+        "queued",
+        "_heap",
+        "_counter",
+        "_handle",
+    )
+
+    def __init__(self):
+        self.queued: dict[tuple[_SCOPE, ...], int] = {}
+        self._heap: list[tuple[float, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._handle: typing.Optional[asyncio.TimerHandle] = None
+
+    def enqueue(
+        self,
+        scopes: tuple[_SCOPE, ...],
+    ) -> int:
+        """Returns how many calls of ``scopes`` are already waiting."""
+        ahead = self.queued.get(scopes, 0)
+        self.queued[scopes] = ahead + 1
+        return ahead
+
+    def dequeue(
+        self,
+        scopes: tuple[_SCOPE, ...],
+    ) -> None:
+        if self.queued[scopes] > 1:
+            self.queued[scopes] -= 1
+        else:
+            del self.queued[scopes]
+
+    async def park(
+        self,
+        until: float,
+    ) -> None:
+        """Sleeps until ``until`` (``loop.time()``) is reached and every earlier waiter is woken."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._heap, (until, next(self._counter), future))
+        # only one timer is scheduled, the one of the earliest waiter
+        if self._handle is None or until < self._handle.when():
+            if self._handle is not None:
+                self._handle.cancel()
+            self._handle = loop.call_at(until, self._wake, loop)
+        await future
+
+    def _wake(
+        self,
+        loop: asyncio.AbstractEventLoop,
+    ) -> None:
+        self._handle = None
+        now = loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, future = heapq.heappop(self._heap)
+            # cancelled waiters are skipped
+            if not future.done():
+                future.set_result(None)
+        if self._heap:
+            self._handle = loop.call_at(self._heap[0][0], self._wake, loop)
+
+
+class _Batch:
+    """Gathers the checks of one loop iteration (or ``window``) and evaluates them in one round trip."""
+
+    __slots__ = (
+        "window",
+        "_evaluate_many",
+        "_pending",
+        "_handle",
+        "_tasks",
+    )
 
     def __init__(
         self,
-        sections: dict[str, dict[str, int]],
-        retrieve_section: typing.Callable[
-            [...], typing.Awaitable[tuple[str, typing.Union[str, int]]]
+        window: float,
+        evaluate_many: typing.Callable[
+            [list[list[_Rule]]], typing.Awaitable[list[_Result]]
         ],
+    ):
+        self.window = window
+        self._evaluate_many = evaluate_many
+        self._pending: list[tuple[list[_Rule], asyncio.Future]] = []
+        self._handle: typing.Optional[asyncio.Handle] = None
+        # the running flushes are referenced, so they aren't garbage collected
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(
+        self,
+        rules: list[_Rule],
+    ) -> asyncio.Future:
+        """Queues ``rules`` for the next flush; the returned future resolves with their result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((rules, future))
+        if self._handle is None:
+            if self.window:
+                self._handle = loop.call_later(self.window, self._flush)
+            else:
+                self._handle = loop.call_soon(self._flush)
+        return future
+
+    def _flush(self) -> None:
+        self._handle = None
+        pending, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._run(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self,
+        pending: list[tuple[list[_Rule], asyncio.Future]],
+    ) -> None:
+        try:
+            results = await self._evaluate_many([rules for rules, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(pending, results):
+            # cancelled checks are skipped (they're recorded anyway)
+            if not future.done():
+                future.set_result(result)
+
+
+class ServerRateLimit(BaseServerRateLimit):
+    """Docs 'll come soon... (If you want docs right now you can take a look into ``__init__``)"""
+
+    sections: typing.Mapping[str, _SECTION]
+    retrieve_section: typing.Callable[[...], typing.Awaitable[_SCOPES]]
+
+    __slots__ = (
+        "batch",
+        "_waiters",
+        "_batch",
+        "_sweeper",
+    )
+
+    def __init__(
+        self,
+        sections: typing.Union[dict[str, _SECTION], PolicyStore],
+        retrieve_section: typing.Callable[[...], typing.Awaitable[_SCOPES]],
         *,
         redis: Redis = None,
+        backend: Backend = None,
+        engine: _ENGINE = "commands",
+        algorithm: _ALGORITHM = "sliding_log",
+        buckets: int = 10,
+        cooldown_cache: int = 0,
+        lease: float = 0,
+        lease_ttl: float = 1.0,
+        wait: bool = False,
+        max_wait: float = None,
+        batch: float = None,
+        key_prefix: str = "",
+        hash_tags: bool = False,
+        metrics: Observer = None,
     ):
         """
         Parameters
         ----------
-        sections: dict[str, dict[str, int]]
+        sections: dict[str, _SECTION], PolicyStore
             Parameter ``sections`` requires following structure:
             ```py
             >>> {
@@ -49,10 +244,20 @@ class ServerRateLimit:
             ...     "<second NAME or TYPE>": {
             ...         ...
             ...     },
+            ...     "<NAME or TYPE with stacked limits (e.g. 10/s AND 1000/h)>": [
+            ...         {"amount": 10, "interval": 1, "timeout": 5},
+            ...         {"amount": 1000, "interval": 3600, "timeout": 60},
+            ...     ],
             ...     ...
             ... }
             ```
-        retrieve_section: typing.Callable[[...], typing.Awaitable[tuple[str, typing.Union[str, int]]]]
+            A call is only allowed (and recorded) if every limit of it's section allows it,
+            the returned data reports the tightest limit.
+            The sections are validated and compiled into ``Policy``'s once
+            (a limit can also be given as ``Limit``).
+            If a ``PolicyStore`` is given, the policies are recompiled and swapped in at once
+            whenever it's updated, so the next call uses the new limits.
+        retrieve_section: typing.Callable[[...], typing.Awaitable[_SCOPES]]
             This function 'll feed all it's data from the original callable.
             e.g. ```py
             >>> @ServerRateLimit({"user": {...}, "admin": {...}}, retrieve)
@@ -66,150 +271,489 @@ class ServerRateLimit:
             ...         return "admin", 0
             ...     return "user", 0
             ```
+            To count a call against many scopes at once (e.g. global -> tenant -> user)
+            it can also return a list of ``section``'s and ``id``'s:
+            ```py
+            >>> async def retrieve(*args, **kwargs) -> list[tuple[str, str]]:
+            ...     return [("global", 0), ("tenant", kwargs["tenant_id"]), ("user", kwargs["user_id"])]
+            ```
+            The call is only allowed (and recorded against every scope) if every scope has room.
         redis: Redis, optional
             An own redis can optionally be set.
+        backend: Backend, optional
+            Where the calls and cooldowns are stored (e.g. ``MemoryBackend()`` to limit in-process).
+            Defaults to a ``RedisBackend`` using ``redis``.
+        engine: _ENGINE
+            How a call gets checked and recorded.
+            ``"commands"`` sends every redis-command on its own (default),
+            ``"script"`` runs one Lua-script (``EVALSHA``) which cleans, counts,
+            applies the cooldown and records the call atomically in a single round trip.
+            A section with more than one limit and a call with more than one scope
+            always use the script, so their limits are checked and recorded atomically.
+        algorithm: _ALGORITHM
+            How the calls are counted.
+            ``"sliding_log"`` stores one entry per call (default),
+            ``"gcra"`` (generic cell rate algorithm) and ``"token_bucket"``
+            only store one timestamp/counter per ``section`` and ``id``,
+            so memory and CPU stay constant no matter how big ``amount`` is.
+            ``"sliding_window"`` splits ``interval`` into ``buckets`` counters
+            and estimates the window by weighting the oldest one.
+            Every algorithm except ``"sliding_log"`` is always evaluated
+            atomically (e.g. by a Lua-script), regardless of ``engine``.
+        buckets: int
+            How many counters ``algorithm="sliding_window"`` uses per ``interval``.
+            More buckets are more precise, but need more memory.
+        cooldown_cache: int
+            If set, up to ``cooldown_cache`` cooldowns are remembered in-process
+            (least recently used ones are dropped first) and calls from a ``section`` and ``id``
+            which is still in cooldown are rejected without asking the backend.
+            Those rejections report ``0`` remaining calls.
+        lease: float
+            If set, blocks of ``lease * amount`` calls are leased from the backend
+            at once and handed out locally until the lease runs out or expires
+            (only one round trip per block instead of per call).
+            This is only supported by ``algorithm="sliding_log"``.
+        lease_ttl: float
+            After how many seconds the unused calls of a lease are given back.
+        wait: bool
+            If set, a rejected call waits until the backend has room again instead of
+            returning ``(False, data), ()`` right away. The waiting calls are parked locally
+            and woken in order at the exact time the next call is permitted, so they don't poll.
+        max_wait: float, optional
+            How many seconds a call waits at most (only with ``wait=True``).
+            If the next permitted call is further away, it's rejected right away.
+        batch: float, optional
+            If set, the checks of concurrent calls are gathered and sent to the backend
+            in one round trip (``Backend.evaluate_many``), every call gets it's own result.
+            ``0`` gathers the checks queued in the same loop iteration,
+            a positive value waits that many seconds (e.g. ``0.0003``) for more checks.
+            Batched checks are always evaluated atomically (regardless of ``engine``),
+            leases aren't batched.
+        key_prefix: str
+            Is put in front of every key (e.g. ``"rl:"``), so many limiters can share one redis.
+        hash_tags: bool
+            If set, the keys are laid out as ``<key_prefix>{<section>:<id>}:<kind>``
+            (e.g. ``rl:{user:42}:call`` and ``rl:{user:42}:cooldown``) instead of
+            ``<key_prefix><kind>-<section>-<id>``. In a Redis Cluster only the part
+            in braces is hashed, so every key of one ``section`` and ``id`` lands on the
+            same slot while different ones spread across the cluster.
+        metrics: Observer, optional
+            Gets the outcome of every call (``"allowed"``, ``"denied"`` or ``"cooldown"``
+            per ``section``; the rejection which starts a cooldown is ``"denied"``, the ones
+            while it's running are ``"cooldown"``, as far as this process knows) and how long ``retrieve_section`` and every call of the backend took
+            (e.g. ``Metrics()``, which can be dumped in the Prometheus text-format).
 
         Notes
         -----
         The first return value from ``retrieve_section``
         is the ``section``, the second is the ``id`` to
-        have every section separated.
-        """
-        self.sections = sections
-        self.retrieve_section = retrieve_section
+        have every section separated (the same applies to
+        every scope if a list is returned).
 
-        if redis is None:
-            redis = Redis(host="127.0.0.1", port=6262, db=0)
-        self._redis = redis
+        A call which is counted against many scopes touches the keys of every scope at once,
+        so with a Redis Cluster only one scope can be returned per call (unless all of them
+        hash to the same slot).
+        """
+        if redis is not None and backend is not None:
+            raise ValueError("Only one of redis and backend can be set!")
+        if batch is not None and not batch >= 0:
+            raise ValueError(f"batch must not be negative, not {batch!r}!")
+
+        super().__init__(
+            sections,
+            retrieve_section,
+            engine=engine,
+            algorithm=algorithm,
+            buckets=buckets,
+            cooldown_cache=cooldown_cache,
+            lease=lease,
+            lease_ttl=lease_ttl,
+            wait=wait,
+            max_wait=max_wait,
+            key_prefix=key_prefix,
+            hash_tags=hash_tags,
+            metrics=metrics,
+        )
+        self.batch = batch
+
+        if backend is None:
+            backend = RedisBackend(redis)
+        self._check_backend(backend)
+        if metrics is not None:
+            backend = MetricsBackend(backend, metrics)
+        self._backend = backend
+        self._waiters = _Waiters()
+        self._batch = None if batch is None else _Batch(batch, self._evaluate_many)
+        self._sweeper: typing.Optional[asyncio.Task] = None
 
     def __call__(
         self,
         func: typing.Callable[[C_IN], typing.Awaitable[C_OUT]],
-    ) -> typing.Callable[
-        [C_IN], typing.Awaitable[tuple[tuple[bool, dict[str, int]], C_OUT]]
-    ]:
-        async def decorator(
-            *args, **kwargs
-        ) -> tuple[tuple[bool, dict[str, int]], C_OUT]:
+    ) -> typing.Callable[[C_IN], typing.Awaitable[tuple[tuple[bool, Decision], C_OUT]]]:
+        async def decorator(*args, **kwargs) -> tuple[tuple[bool, Decision], C_OUT]:
             """
             Returns
             -------
-            tuple[tuple[bool, dict[str, int]], C_OUT]
+            tuple[tuple[bool, Decision], C_OUT]
             """
-            section, id = await self.retrieve_section(*args, **kwargs)  # noqa
-            if section not in self.sections:
-                raise RuntimeError(
-                    "Can't use key {section!r}. You have to return one of the following: {possible}".format(
-                        section=section,
-                        possible=", ".join(f"{k!r}" for k in self.sections),
-                    )
-                )
-
-            await self._check_timeout(section, id)
-
-            timeout = await self._calculate_timeout(section, id)
-            remaining = await self._calculate_remaining_calls(section, id)
-
-            data = {
-                "request": {
-                    "remaining": -1,
-                    "limit": self.sections[section]["amount"],
-                    "period": self.sections[section]["interval"],
-                    "timeout": timeout,
-                }
-            }
-
-            if not remaining > 0 or timeout:
-                data["request"]["remaining"] = await self._calculate_remaining_calls(
-                    section, id
-                )
+            start = perf_counter()
+            retrieved = await self.retrieve_section(*args, **kwargs)
+            if self.metrics is not None:
+                self.metrics.observe("retrieve_section", perf_counter() - start)
+            # one snapshot per call, a ``PolicyStore`` can swap them in the meantime
+            policies = self._policies
+            scopes = self._scopes(policies, retrieved)
+
+            allowed, results = await self._acquire(policies, scopes)
+            if not allowed and self.wait:
+                allowed, results = await self._wait(policies, scopes, results)
+            self._report(policies, scopes, allowed, results)
+            data = self._data(policies, scopes, allowed, results)
+
+            if not allowed:
                 return (False, data), ()
-
-            await self._record_call(section, id)
-            data["request"]["remaining"] = await self._calculate_remaining_calls(
-                section, id
-            )
             return (True, data), await func(*args, **kwargs)
 
         return functools.update_wrapper(decorator, func)
 
-    async def _record_call(
+    async def acquire_many(
+        self,
+        requests: typing.Iterable[_SCOPES],
+    ) -> list[tuple[bool, Decision]]:
+        """
+        Checks and records many requests with one round trip to the backend.
+        Every request is evaluated on it's own and atomically (regardless of ``engine``),
+        leases aren't used and rejected requests don't ``wait``.
+
+        Parameters
+        ----------
+        requests: typing.Iterable[_SCOPES]
+            The ``section`` and ``id`` (or a list of them) of every request
+            (like ``retrieve_section`` returns them).
+
+        Returns
+        -------
+        list[tuple[bool, Decision]]
+            Whether the request is allowed and it's data (in the same order as ``requests``).
+        """
+        policies = self._policies
+        requests = [self._scopes(policies, request) for request in requests]
+
+        results: list[typing.Optional[tuple[bool, list[tuple[int, int]]]]] = [
+            None
+        ] * len(requests)
+        pending = []
+        for index, scopes in enumerate(requests):
+            cached = self._cached(policies, scopes)
+            if cached is not None:
+                results[index] = cached
+                continue
+            pending.append(index)
+
+        if pending:
+            evaluated = await self._backend.evaluate_many(
+                self.algorithm,
+                [self._rules(policies, requests[index]) for index in pending],
+                buckets=self.buckets,
+            )
+            for index, result in zip(pending, evaluated):
+                results[index] = result
+                self._cache(policies, requests[index], result[1])
+
+        for scopes, (allowed, limits) in zip(requests, results):
+            self._report(policies, scopes, allowed, limits)
+        return [
+            (allowed, self._data(policies, scopes, allowed, limits))
+            for scopes, (allowed, limits) in zip(requests, results)
+        ]
+
+    async def peek(
         self,
         section: str,
         id: typing.Union[str, int],  # noqa
-    ) -> None:
+    ) -> Decision:
         """
+        Reads the data of ``section`` and ``id`` like the decorator returns it,
+        but without recording a call (e.g. for ``X-RateLimit-Remaining``-headers).
+        The backend is only read (one round trip) and nothing gets cleaned up.
+
         Parameters
         ----------
         section: str
         id: str, int
+
+        Returns
+        -------
+        Decision
+            Whether a call would be allowed and the data of the tightest limit.
+
+        Notes
+        -----
+        A peek doesn't start a cooldown, only running ones are reported.
+        Leased calls which aren't handed out yet count as used.
         """
-        key = f"call-{section}-{id}"
-        await self._redis.execute_command(
-            f"ZADD {key} {time()+self.sections[section]['interval']} {uuid.uuid4()}"
+        policies = self._policies
+        scopes = self._scopes(policies, (section, id))
+        cached = self._cached(policies, scopes)
+        if cached is not None:
+            return self._data(policies, scopes, *cached)
+        allowed, results = await self._backend.peek(
+            self.algorithm, self._rules(policies, scopes), buckets=self.buckets
         )
-        await self._redis.expire(key, self.sections[section]["interval"])
+        return self._data(policies, scopes, allowed, results)
 
-    async def _calculate_remaining_calls(
+    async def _acquire(
         self,
-        section: str,
-        id: typing.Union[str, int],  # noqa
-    ) -> int:
+        policies: _Policies,
+        scopes: list[_SCOPE],
+        *,
+        cached: bool = True,
+    ) -> tuple[bool, list[tuple[int, int]]]:
         """
         Parameters
         ----------
-        section: str
-        id: str, int
+        policies: _Policies
+        scopes: list[_SCOPE]
+        cached: bool
+            Whether the ``cooldown_cache`` is asked first.
 
         Returns
         -------
-        int
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
         """
-        key = f"call-{section}-{id}"
-
-        # cleanup
-        await self._redis.zremrangebyscore(key, 0, time())
+        if cached:
+            rejection = self._cached(policies, scopes)
+            if rejection is not None:
+                return rejection
+
+        if self.lease:
+            allowed, results = await self._take_lease(policies, scopes)
+        elif (
+            self.engine == "script"
+            or self.algorithm != "sliding_log"
+            or self._batch is not None
+            or self._stacked(policies, scopes)
+        ):
+            allowed, results = await self._evaluate(policies, scopes)
+        else:
+            allowed, results = await self._run_commands(policies, scopes)
+
+        self._cache(policies, scopes, results)
+        return allowed, results
+
+    async def _wait(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+        results: list[tuple[int, int]],
+    ) -> tuple[bool, list[tuple[int, int]]]:
+        """
+        Parks the call until the backend has room again and retries it.
 
-        return self.sections[section]["amount"] - int(
-            await self._redis.zcount(key, 0, 2**62) or 0
-        )
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+        results: list[tuple[int, int]]
+            The results of the rejected call.
 
-    async def _check_timeout(
+        Returns
+        -------
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if self.max_wait is None else loop.time() + self.max_wait
+        key = tuple(scopes)
+        # calls which already wait get the permits before this one
+        ahead = self._waiters.enqueue(key)
+        try:
+            while True:
+                until = loop.time() + await self._backend.retry_after(
+                    self.algorithm,
+                    self._rules(policies, scopes),
+                    ahead=ahead,
+                    buckets=self.buckets,
+                )
+                if deadline is not None and until > deadline:
+                    return False, results
+
+                await self._waiters.park(until)
+                # the cooldown_cache only knows whole seconds
+                allowed, results = await self._acquire(policies, scopes, cached=False)
+                if allowed:
+                    return True, results
+                ahead = 0
+        finally:
+            self._waiters.dequeue(key)
+
+    async def _run_commands(
         self,
-        section: str,
-        id: typing.Union[str, int],  # noqa
-    ) -> None:
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> tuple[bool, list[tuple[int, int]]]:
         """
         Parameters
         ----------
-        section: str
-        id: str, int
+        policies: _Policies
+        scopes: list[_SCOPE]
+
+        Returns
+        -------
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
+        """
+        rules = self._rules(policies, scopes)
+        for key, cooldown_key, amount, _, timeout in rules:
+            if not amount - await self._backend.count(key) > 0:
+                await self._backend.set_cooldown(cooldown_key, timeout)
+
+        timeouts = [await self._backend.get_cooldown(rule[1]) for rule in rules]
+        remaining = [
+            amount - await self._backend.count(key) for key, _, amount, _, _ in rules
+        ]
+
+        allowed = all(calls > 0 for calls in remaining) and not any(timeouts)
+        if allowed:
+            for key, _, _, interval, _ in rules:
+                await self._backend.record(key, interval)
+            remaining = [calls - 1 for calls in remaining]
+        return allowed, [(max(0, calls), t) for calls, t in zip(remaining, timeouts)]
+
+    async def _evaluate(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> tuple[bool, list[tuple[int, int]]]:
         """
-        key = f"cooldown-{section}-{id}"
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
 
-        if not await self._calculate_remaining_calls(section, id) > 0:
-            if not await self._redis.exists(key):
-                await self._redis.append(key, 1)
-                await self._redis.expire(key, self.sections[section]["timeout"])
+        Returns
+        -------
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
+        """
+        if self._batch is not None:
+            return await self._batch.submit(self._rules(policies, scopes))
+        return await self._backend.evaluate(
+            self.algorithm, self._rules(policies, scopes), buckets=self.buckets
+        )
 
-    async def _calculate_timeout(
+    async def _evaluate_many(
         self,
-        section: str,
-        id: typing.Union[str, int],  # noqa
-    ) -> int:
+        requests: list[list[_Rule]],
+    ) -> list[_Result]:
         """
         Parameters
         ----------
-        section: str
-        id: str, int
+        requests: list[list[_Rule]]
+            The rules of every batched call.
 
         Returns
         -------
-        int
+        list[_Result]
         """
-        key = f"cooldown-{section}-{id}"
+        return await self._backend.evaluate_many(
+            self.algorithm, requests, buckets=self.buckets
+        )
+
+    async def _take_lease(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> tuple[bool, list[tuple[int, int]]]:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
 
-        return max(0, await self._redis.ttl(key))
+        Returns
+        -------
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
+        """
+        key = tuple(scopes)
+        while True:
+            lease = self._leases.get(key)
+            if lease is None:
+                lease = self._leases.setdefault(key, _Lease())
+
+            async with lease.lock:
+                if lease.swept:
+                    continue
+
+                if lease.permits > 0 and lease.expires > monotonic():
+                    lease.permits -= 1
+                    return True, self._leased(lease)
+
+                if lease.permits > 0:
+                    await self._backend.release(lease.handle, lease.permits)
+                    lease.permits = 0
+
+                rules = self._rules(policies, scopes)
+                amount = min(rule[2] for rule in rules)
+                granted, results, handle = await self._backend.lease(
+                    rules, max(1, int(amount * self.lease))
+                )
+                if not granted:
+                    return False, results
+
+                lease.permits = granted - 1
+                lease.remaining = [remaining for remaining, _ in results]
+                lease.expires = monotonic() + self.lease_ttl
+                lease.handle = handle
+                self._schedule_sweep()
+                return True, [
+                    (remaining + lease.permits, t) for remaining, t in results
+                ]
+
+    def _schedule_sweep(self) -> None:
+        """Sweeps the leases after ``lease_ttl`` seconds in a task (if no sweep is scheduled yet)."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_leases())
+
+    async def _sweep_leases(self) -> None:
+        """
+        Gives the unused calls of every expired lease back and removes it,
+        so an ``id`` which isn't used anymore doesn't keep them reserved
+        (or it's entry in ``_leases``). Runs every ``lease_ttl`` seconds as long as there are leases.
+        """
+        await asyncio.sleep(self.lease_ttl)
+        self._sweeper = None
+
+        for key, lease in list(self._leases.items()):
+            # a lease which is in use right now is swept next time
+            if lease.expires > monotonic() or lease.lock.locked():
+                continue
+            async with lease.lock:
+                if lease.permits > 0:
+                    try:
+                        await self._backend.release(lease.handle, lease.permits)
+                    except (RedisError, OSError):
+                        # the backend expires them on it's own
+                        pass
+                    lease.permits = 0
+                lease.swept = True
+                if self._leases.get(key) is lease:
+                    del self._leases[key]
+
+        if self._leases:
+            self._schedule_sweep()
+
+    async def release_leases(self) -> None:
+        """Gives the unused calls of every lease back (e.g. before shutting down)."""
+        for lease in list(self._leases.values()):
+            async with lease.lock:
+                if lease.permits > 0:
+                    await self._backend.release(lease.handle, lease.permits)
+                    lease.permits = 0
+                lease.swept = True
+        self._leases.clear()
 
 
 if __name__ == "__main__":
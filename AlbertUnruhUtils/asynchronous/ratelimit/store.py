@@ -0,0 +1,137 @@
+__all__ = ("PolicyStore",)
+
+
+import asyncio
+import typing
+from redis.asyncio import Redis
+
+from ...ratelimit.store import (
+    PolicyStore as _PolicyStore,
+    _FAILURES,
+    _encode,
+)
+
+
+class PolicyStore(_PolicyStore):
+    """
+    Like ``.ratelimit.store.PolicyStore``, but the redis-hash is read
+    and written with ``redis.asyncio`` and ``watch()`` polls in a task.
+
+    Notes
+    -----
+    ``update()`` swaps the policies synchronously (it doesn't touch redis),
+    so it can be used by both ``ServerRateLimit``'s.
+    """
+
+    __slots__ = ("_task",)
+
+    def __init__(
+        self,
+        sections: typing.Mapping[str, typing.Any],
+    ):
+        """
+        Parameters
+        ----------
+        sections: typing.Mapping[str, typing.Any]
+            The sections like ``ServerRateLimit`` takes them.
+        """
+        super().__init__(sections)
+        self._task: typing.Optional[asyncio.Task] = None
+
+    async def load(  # type: ignore
+        self,
+        redis: Redis,
+        key: str,
+    ) -> bool:
+        """
+        Updates the sections from a redis-hash (if they changed).
+
+        Parameters
+        ----------
+        redis: Redis
+        key: str
+            The key of the hash.
+
+        Returns
+        -------
+        bool
+            Whether the sections changed.
+
+        Raises
+        ------
+        ValueError
+            If the hash is empty or contains invalid sections (the current sections are kept).
+        """
+        return self._load(await redis.hgetall(key), key)
+
+    async def save(  # type: ignore
+        self,
+        redis: Redis,
+        key: str,
+    ) -> None:
+        """
+        Replaces the redis-hash with the current sections.
+
+        Parameters
+        ----------
+        redis: Redis
+        key: str
+            The key of the hash.
+        """
+        fields = _encode(self._sections)
+        # see ``.ratelimit.store.PolicyStore.save``
+        stale = [
+            field for field in await redis.hkeys(key) if field.decode() not in fields
+        ]
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=fields)
+            if stale:
+                pipe.hdel(key, *stale)
+            await pipe.execute()
+
+    async def watch(  # type: ignore
+        self,
+        redis: Redis,
+        key: str,
+        *,
+        interval: float = 5.0,
+        on_error: typing.Callable[[Exception], None] = None,
+    ) -> None:
+        """
+        Polls the redis-hash every ``interval`` seconds in a task
+        until ``stop()`` is called. The hash is loaded once before this returns.
+
+        Parameters
+        ----------
+        redis: Redis
+        key: str
+            The key of the hash.
+        interval: float
+            In seconds.
+        on_error: typing.Callable[[Exception], None], optional
+            Gets every error of a poll (e.g. if redis is down or the hash contains invalid sections),
+            the current sections are kept until the next poll succeeds.
+        """
+        if not interval > 0:
+            raise ValueError(f"interval must be positive, not {interval!r}!")
+        if self._task is not None:
+            raise RuntimeError("The store is already watched!")
+
+        await self.load(redis, key)
+
+        async def poll() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.load(redis, key)
+                except _FAILURES as e:
+                    if on_error is not None:
+                        on_error(e)
+
+        self._task = asyncio.create_task(poll())
+
+    def stop(self) -> None:
+        """Stops ``watch()``."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -1,7 +1,13 @@
 __all__ = ("JSONConfig",)
 
 
+import atexit
+import contextlib
+import os
+import shutil
+import threading
 import typing
+from copy import deepcopy
 from json import (
     dump,
     load,
@@ -21,6 +27,12 @@ class JSONConfig:
         "_config",
         "_file",
         "_default_config",
+        "_flush_delay",
+        "_flush_threshold",
+        "_dirty",
+        "_timer",
+        "_lock",
+        "_depth",
     )
 
     def __init__(
@@ -29,6 +41,8 @@ class JSONConfig:
         file: str,
         default_return: typing.Any = None,
         default_config: dict = None,
+        flush_delay: float = None,
+        flush_threshold: int = None,
     ):
         """
         Parameters
@@ -37,7 +51,33 @@ class JSONConfig:
         default_return: Any
             The default when calling `__getitem__`
         default_config: dict
+        flush_delay: float, optional
+            If set, changes aren't written right away, but once
+            ``flush_delay`` seconds after the first unwritten change.
+        flush_threshold: int, optional
+            If set, changes aren't written right away, but once
+            ``flush_threshold`` changes are unwritten.
+
+        Notes
+        -----
+        If ``flush_delay`` or ``flush_threshold`` is set, unwritten changes can also be written
+        with ``flush()`` and are written when the interpreter exits.
         """
+        if flush_delay is not None and not flush_delay > 0:
+            raise ValueError(f"flush_delay must be positive, not {flush_delay!r}!")
+        if flush_threshold is not None and (
+            not isinstance(flush_threshold, int) or flush_threshold < 1
+        ):
+            raise ValueError(
+                f"flush_threshold must be a positive int, not {flush_threshold!r}!"
+            )
+
+        # the ``file``-setter runs ``__init__`` again, a transaction has to keep it's lock
+        if not hasattr(self, "_lock"):
+            self._lock = threading.RLock()
+            self._depth = 0
+
+        self._file = file
         try:
             with open(file) as f:
                 self._config = load(f)
@@ -50,13 +90,20 @@ class JSONConfig:
                 file=sys.stderr,
             )
 
-            self._config = default_config or DEFAULT_CONFIG
-            with open(file, "w") as f:
-                dump(self._config, f, indent=4)
+            # a copy, so ``default_config`` isn't changed with the config
+            self._config = deepcopy(default_config or DEFAULT_CONFIG)
+            self._dump()
 
         self.default = default_return
-        self._file = file
         self._default_config = default_config
+        self._flush_delay = flush_delay
+        self._flush_threshold = flush_threshold
+        self._dirty = 0
+        self._timer: typing.Optional[threading.Timer] = None
+
+        atexit.unregister(self.flush)
+        if self.write_behind:
+            atexit.register(self.flush)
 
     @property
     def file(self) -> str:
@@ -64,9 +111,23 @@ class JSONConfig:
 
     @file.setter
     def file(self, value: str) -> None:
-        self.__init__(
-            file=value, default_return=self.default, default_config=self._default_config
-        )
+        with self._lock:
+            if self._depth:
+                raise RuntimeError("The file can't be changed inside a transaction!")
+            # the unwritten changes belong to the old file
+            self.flush()
+            self.__init__(
+                file=value,
+                default_return=self.default,
+                default_config=self._default_config,
+                flush_delay=self._flush_delay,
+                flush_threshold=self._flush_threshold,
+            )
+
+    @property
+    def write_behind(self) -> bool:
+        """Whether changes are written delayed (see ``flush_delay`` and ``flush_threshold``)."""
+        return self._flush_delay is not None or self._flush_threshold is not None
 
     @property
     def config(self) -> dict:
@@ -77,14 +138,98 @@ class JSONConfig:
         assert isinstance(
             value, dict
         ), f"{self.__class__.__name__}.config must be an instance of 'dict', not {value.__class__.__name__!r}!"
-        self._config = value
-        with open(self._file, "w") as f:
-            dump(self._config, f, indent=4)
+        with self._lock:
+            self._config = value
+            self._changed()
 
     def __getitem__(self, item):
         return self._config.get(item, self.default)
 
     def __setitem__(self, key, value):
-        self._config[key] = value
-        with open(self._file, "w") as f:
-            dump(self._config, f, indent=4)
+        with self._lock:
+            self._config[key] = value
+            self._changed()
+
+    @contextlib.contextmanager
+    def transaction(self) -> typing.Iterator["JSONConfig"]:
+        """
+        Groups changes: they are only made in memory and written at once when the
+        outermost transaction ends (even without ``write_behind``),
+        or discarded if an exception is raised.
+        Changes made in place (e.g. ``config.config["a"]["b"] = 2``) are written as well.
+        Transactions can be nested, an inner one only discards it's own changes.
+
+        Yields
+        ------
+        JSONConfig
+            This config.
+
+        Notes
+        -----
+        Other threads can't change the config while a transaction is running.
+        Dicts which were taken from ``config`` before the changes were discarded
+        aren't the ones of the config anymore.
+        """
+        with self._lock:
+            config, dirty = deepcopy(self._config), self._dirty
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._config, self._dirty = config, dirty
+                raise
+            finally:
+                self._depth -= 1
+            if not self._depth:
+                # in-place changes (e.g. ``config["a"]["b"] = 2``) don't go through ``_changed``
+                if self._config != config:
+                    self._dirty += 1
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the unwritten changes (only needed if ``write_behind``).
+        Inside a ``transaction()`` nothing is written until it ends.
+        """
+        with self._lock:
+            if self._depth:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self._dump()
+                self._dirty = 0
+
+    def _changed(self) -> None:
+        """Writes the config right away or when it's time to (if ``write_behind``)."""
+        if not self.write_behind and not self._depth:
+            self._dump()
+            return
+
+        self._dirty += 1
+        if self._depth:
+            # written when the transaction ends
+            return
+        if self._flush_threshold is not None and self._dirty >= self._flush_threshold:
+            self.flush()
+        elif self._flush_delay is not None and self._timer is None:
+            self._timer = threading.Timer(self._flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _dump(self) -> None:
+        """Replaces the file at once, so it's never read half written."""
+        # next to the file, since ``os.replace`` can't move across filesystems
+        tmp = f"{self._file}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                dump(self._config, f, indent=4)
+            with contextlib.suppress(FileNotFoundError):
+                shutil.copymode(self._file, tmp)
+            os.replace(tmp, self._file)
+        except BaseException:
+            # ``open`` might have failed, the original error is raised either way
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp)
+            raise
@@ -1 +1,8 @@
+from .backend import *
+from .breaker import *
+from .cache import *
+from .concurrency import *
+from .metrics import *
+from .policy import *
 from .server import *
+from .store import *
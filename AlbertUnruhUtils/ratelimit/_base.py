@@ -0,0 +1,468 @@
+"""
+The parts of ``.server.ServerRateLimit`` and ``.asynchronous.ratelimit.server.ServerRateLimit``
+which don't talk to the backend (so they don't need to be awaited).
+"""
+
+__all__ = ("BaseServerRateLimit",)
+
+
+import typing
+from types import MappingProxyType
+
+from .backend import _Rule
+from .cache import CooldownCache
+from .metrics import Observer
+from .policy import (
+    Decision,
+    Policy,
+)
+from .store import PolicyStore
+
+
+_LIMIT = dict[str, int]
+_SECTION = typing.Union[_LIMIT, list[_LIMIT]]
+_SCOPE = tuple[str, typing.Union[str, int]]
+_SCOPES = typing.Union[_SCOPE, list[_SCOPE]]
+_ENGINE = typing.Literal["commands", "script"]
+_ALGORITHM = typing.Literal["sliding_log", "gcra", "token_bucket", "sliding_window"]
+
+# how many running cooldowns ``_report`` remembers at most
+_REPORTED_COOLDOWNS = 4096
+
+_KEY_PREFIXES: dict[str, str] = {
+    "sliding_log": "call",
+    "gcra": "gcra",
+    "token_bucket": "bucket",
+    "sliding_window": "window",
+}
+
+
+def _frozen(
+    sections: typing.Mapping[str, _SECTION],
+) -> typing.Mapping[str, _SECTION]:
+    """
+    A read-only copy of ``sections``, so changing it fails
+    instead of being silently ignored (the limits are compiled already).
+    """
+
+    def limit(value):
+        return MappingProxyType(dict(value)) if isinstance(value, dict) else value
+
+    return MappingProxyType(
+        {
+            section: (
+                tuple(limit(value) for value in limits)
+                if isinstance(limits, (list, tuple))
+                else limit(limits)
+            )
+            for section, limits in sections.items()
+        }
+    )
+
+
+class _Policies(dict):
+    """
+    The compiled ``Policy`` of every section together with the ``sections``
+    they were compiled from, so both are swapped at once.
+    A call reads ``_policies`` once and uses that snapshot to the end.
+    """
+
+    __slots__ = ("sections",)
+
+    sections: typing.Mapping[str, _SECTION]
+
+
+class BaseServerRateLimit:
+    """Validates the options and compiles the sections of a ``ServerRateLimit``."""
+
+    sections: typing.Mapping[str, _SECTION]
+    retrieve_section: typing.Callable[[...], typing.Any]
+
+    __slots__ = (
+        "retrieve_section",
+        "engine",
+        "algorithm",
+        "buckets",
+        "lease",
+        "lease_ttl",
+        "wait",
+        "max_wait",
+        "key_prefix",
+        "hash_tags",
+        "metrics",
+        "_policies",
+        "_backend",
+        "_cooldowns",
+        "_leases",
+        "_reported",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        sections: typing.Union[dict[str, _SECTION], PolicyStore],
+        retrieve_section: typing.Callable[[...], typing.Any],
+        *,
+        engine: _ENGINE,
+        algorithm: _ALGORITHM,
+        buckets: int,
+        cooldown_cache: int,
+        lease: float,
+        lease_ttl: float,
+        wait: bool,
+        max_wait: typing.Optional[float],
+        key_prefix: str,
+        hash_tags: bool,
+        metrics: typing.Optional[Observer],
+    ):
+        """See ``ServerRateLimit``, the backend is set by it."""
+        if engine not in _ENGINE.__args__:  # type: ignore
+            raise ValueError(
+                f"Unknown engine {engine!r}! "
+                f"Use one of them instead: {', '.join(_ENGINE.__args__)}"  # type: ignore
+            )
+        if algorithm not in _ALGORITHM.__args__:  # type: ignore
+            raise ValueError(
+                f"Unknown algorithm {algorithm!r}! "
+                f"Use one of them instead: {', '.join(_ALGORITHM.__args__)}"  # type: ignore
+            )
+        if not isinstance(buckets, int) or buckets < 1:
+            raise ValueError(f"buckets must be a positive int, not {buckets!r}!")
+
+        if not 0 <= lease <= 1:
+            raise ValueError(f"lease must be between 0 and 1, not {lease!r}!")
+        if lease and algorithm != "sliding_log":
+            raise ValueError("lease is only supported by algorithm='sliding_log'!")
+        if not lease_ttl > 0:
+            raise ValueError(f"lease_ttl must be positive, not {lease_ttl!r}!")
+        if max_wait is not None and not max_wait > 0:
+            raise ValueError(f"max_wait must be positive, not {max_wait!r}!")
+        if hash_tags and "{" in key_prefix:
+            # redis only hashes the first part in braces
+            raise ValueError(
+                f"key_prefix can't contain braces with hash_tags, not {key_prefix!r}!"
+            )
+
+        self.retrieve_section = retrieve_section
+        self.engine = engine
+        self.algorithm = algorithm
+        self.buckets = buckets
+        self.lease = lease
+        self.lease_ttl = lease_ttl
+        self.wait = wait
+        self.max_wait = max_wait
+        self.key_prefix = key_prefix
+        self.hash_tags = hash_tags
+        self.metrics = metrics
+        if isinstance(sections, PolicyStore):
+            sections.subscribe(self._compile)
+        else:
+            self._compile(sections)
+
+        self._cooldowns = CooldownCache(cooldown_cache) if cooldown_cache else None
+        self._leases: dict[tuple[_SCOPE, ...], typing.Any] = {}
+        # the cooldowns which were already reported as ``"denied"``
+        self._reported = None if metrics is None else CooldownCache(_REPORTED_COOLDOWNS)
+
+    def _check_backend(
+        self,
+        backend: typing.Any,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        backend: Backend
+
+        Raises
+        ------
+        ValueError
+            If ``backend`` doesn't support ``algorithm`` (see ``Backend``).
+        """
+        algorithms = getattr(backend, "algorithms", None)
+        if algorithms is not None and self.algorithm not in algorithms:
+            raise ValueError(
+                f"{backend.__class__.__name__} doesn't support algorithm {self.algorithm!r}! "
+                f"Use one of them instead: {', '.join(algorithms)}"
+            )
+
+    @property
+    def sections(self) -> typing.Mapping[str, _SECTION]:
+        """
+        The sections the current policies were compiled from (read-only,
+        to change the limits at runtime pass a ``PolicyStore`` as ``sections``).
+        """
+        return self._policies.sections
+
+    def _scopes(
+        self,
+        policies: _Policies,
+        scopes: _SCOPES,
+    ) -> list[_SCOPE]:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: _SCOPES
+            What ``retrieve_section`` returned.
+
+        Returns
+        -------
+        list[_SCOPE]
+            Every ``section`` and ``id`` the call counts against.
+
+        Raises
+        ------
+        RuntimeError
+            If no or an unknown ``section`` is returned.
+        """
+        if not scopes:
+            raise RuntimeError("retrieve_section has to return at least one section!")
+        if isinstance(scopes[0], str):
+            scopes = [scopes]
+        scopes = [(section, id) for section, id in scopes]  # noqa
+        for section, _ in scopes:
+            self._check_section(policies, section)
+        return scopes
+
+    def _compile(
+        self,
+        sections: typing.Mapping[str, _SECTION],
+    ) -> None:
+        """
+        Compiles ``sections`` into ``Policy``'s (once, so a call doesn't need to look into
+        the nested dicts) and swaps them in together with ``sections`` in a single assignment
+        (this is also how a ``PolicyStore`` updates them).
+
+        Parameters
+        ----------
+        sections: typing.Mapping[str, _SECTION]
+        """
+        policies = _Policies()
+        for section, limits in sections.items():
+            policies[section] = Policy(
+                section,
+                limits,
+                kind=_KEY_PREFIXES[self.algorithm],
+                key_prefix=self.key_prefix,
+                hash_tags=self.hash_tags,
+            )
+        policies.sections = _frozen(sections)
+        self._policies = policies
+
+    def _check_section(
+        self,
+        policies: _Policies,
+        section: str,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        section: str
+
+        Raises
+        ------
+        RuntimeError
+            If ``section`` is unknown.
+        """
+        if section not in policies:
+            raise RuntimeError(
+                "Can't use key {section!r}. You have to return one of the following: {possible}".format(
+                    section=section,
+                    possible=", ".join(f"{k!r}" for k in policies.sections),
+                )
+            )
+
+    def _data(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+        allowed: bool,
+        results: list[tuple[int, int]],
+    ) -> Decision:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+        allowed: bool
+        results: list[tuple[int, int]]
+            The remaining calls and the timeout of every limit of ``scopes``.
+
+        Returns
+        -------
+        Decision
+            Whether the call is allowed and the data of the tightest limit.
+        """
+        if len(results) == 1:
+            # the common case (one scope with one limit)
+            limit = policies[scopes[0][0]].limits[0]
+            remaining, timeout = results[0]
+            return Decision(allowed, remaining, limit.amount, limit.interval, timeout)
+
+        limits = [limit for section, _ in scopes for limit in policies[section].limits]
+        tightest = min(range(len(results)), key=lambda i: results[i][0])
+        return Decision(
+            allowed,
+            results[tightest][0],
+            limits[tightest].amount,
+            limits[tightest].interval,
+            max(timeout for _, timeout in results),
+        )
+
+    def _report(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+        allowed: bool,
+        results: list[tuple[int, int]],
+    ) -> None:
+        """
+        Reports the outcome of a call to ``metrics`` (once per ``section``).
+        The rejection which starts a cooldown is ``"denied"``, the ones
+        which hit it afterwards (while it's running) are ``"cooldown"``.
+
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+        allowed: bool
+        results: list[tuple[int, int]]
+            The remaining calls and the timeout of every limit of ``scopes``.
+        """
+        if self.metrics is None:
+            return
+        outcome = "allowed" if allowed else "denied"
+        if not allowed:
+            for scope, timeout in self._timeouts(policies, scopes, results):
+                if self._reported.get(scope):
+                    outcome = "cooldown"
+                elif timeout:
+                    self._reported.set(scope, timeout)
+        for section in dict.fromkeys(section for section, _ in scopes):
+            self.metrics.count(section, outcome)
+
+    def _stacked(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> bool:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+
+        Returns
+        -------
+        bool
+            Whether the call counts against more than one limit or scope
+            (only ``Backend.evaluate`` checks and records those atomically).
+        """
+        return len(scopes) > 1 or len(policies[scopes[0][0]].limits) > 1
+
+    def _rules(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> list[_Rule]:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+
+        Returns
+        -------
+        list[_Rule]
+            ``key``, ``cooldown_key``, ``amount``, ``interval`` and ``timeout``
+            of every limit of ``scopes`` like ``Backend.evaluate`` takes them.
+        """
+        if len(scopes) == 1:
+            section, id = scopes[0]  # noqa
+            return policies[section].rules(id)
+        return [rule for section, id in scopes for rule in policies[section].rules(id)]
+
+    def _cached(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> typing.Optional[tuple[bool, list[tuple[int, int]]]]:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+
+        Returns
+        -------
+        tuple[bool, list[tuple[int, int]]], optional
+            A rejection if any of ``scopes`` is in the ``cooldown_cache``.
+        """
+        if self._cooldowns is None:
+            return None
+        timeout = max(self._cooldowns.get(scope) for scope in scopes)
+        if not timeout:
+            return None
+        return False, [(0, timeout)] * sum(
+            len(policies[section].limits) for section, _ in scopes
+        )
+
+    def _cache(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+        results: list[tuple[int, int]],
+    ) -> None:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+        results: list[tuple[int, int]]
+        """
+        if self._cooldowns is None:
+            return
+        for scope, timeout in self._timeouts(policies, scopes, results):
+            if timeout:
+                self._cooldowns.set(scope, timeout)
+
+    @staticmethod
+    def _timeouts(
+        policies: _Policies,
+        scopes: list[_SCOPE],
+        results: list[tuple[int, int]],
+    ) -> typing.Iterator[tuple[_SCOPE, int]]:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+        results: list[tuple[int, int]]
+
+        Yields
+        ------
+        tuple[_SCOPE, int]
+            Every scope and the longest timeout of it's limits.
+        """
+        start = 0
+        for scope in scopes:
+            end = start + len(policies[scope[0]].limits)
+            yield scope, max(timeout for _, timeout in results[start:end])
+            start = end
+
+    @staticmethod
+    def _leased(
+        lease: typing.Any,
+    ) -> list[tuple[int, int]]:
+        """
+        Parameters
+        ----------
+        lease: _Lease
+
+        Returns
+        -------
+        list[tuple[int, int]]
+            The remaining calls (including the unused ones of ``lease``) of every limit.
+        """
+        return [(remaining + lease.permits, 0) for remaining in lease.remaining]
@@ -0,0 +1,303 @@
+"""
+Lua-scripts which are shared between ``.ratelimit.server`` and ``.asynchronous.ratelimit.server``.
+
+Every script runs atomically on the redis-server, so a whole check-and-record
+only costs one round trip (``EVALSHA``) and can't race with other workers.
+
+All scripts evaluate one or more rules and only record the call if every rule allows it:
+
+- KEYS: ``key`` and ``cooldown-key`` of every rule
+- ARGV[1]: now
+- ARGV[2]: member (``"sliding_log"``) or buckets (``"sliding_window"``)
+- ARGV[3]: size (optional, leases up to ``size`` calls as members "<member>:<1..size>")
+- ARGV[4..]: ``amount``, ``interval`` and ``timeout`` of every rule
+- returns {allowed (granted calls), remaining, timeout, remaining, timeout, ...}
+
+The ``*_RETRY_AFTER`` scripts take the same KEYS and ARGV (ARGV[3] is how many calls
+are queued ahead instead) and return the seconds until every rule allows a call again
+(as string, because redis truncates numbers to integers).
+
+The ``*_PEEK`` scripts take the same KEYS and ARGV (ARGV[3] isn't used)
+and return like the other ones whether a call would be allowed, but only read
+(nothing is cleaned, recorded or put in cooldown).
+
+``ACQUIRE_SLOT`` is used by ``.ratelimit.concurrency`` and ``.asynchronous.ratelimit.concurrency``:
+
+- KEYS: ``key``
+- ARGV: now, ``amount``, ``ttl`` and the token of the slot
+- returns {acquired, remaining}
+
+``EXTEND_SLOT`` restarts the ``ttl`` of a slot which is still held:
+
+- KEYS: ``key``
+- ARGV: now, ``ttl`` and the token of the slot
+- returns whether the slot was still held
+"""
+
+__all__ = (
+    "SLIDING_LOG",
+    "GCRA",
+    "TOKEN_BUCKET",
+    "SLIDING_WINDOW",
+    "SLIDING_LOG_RETRY_AFTER",
+    "GCRA_RETRY_AFTER",
+    "TOKEN_BUCKET_RETRY_AFTER",
+    "SLIDING_WINDOW_RETRY_AFTER",
+    "SLIDING_LOG_PEEK",
+    "GCRA_PEEK",
+    "TOKEN_BUCKET_PEEK",
+    "SLIDING_WINDOW_PEEK",
+    "ACQUIRE_SLOT",
+    "EXTEND_SLOT",
+)
+
+
+_HEADER = """
+local now = tonumber(ARGV[1])
+local extra = ARGV[2]
+local size = tonumber(ARGV[3])
+"""
+
+_EVALUATE = """
+local rules = #KEYS / 2
+local available = {}
+local ttls = {}
+local allowed = true
+
+for i = 1, rules do
+    local amount = tonumber(ARGV[1 + 3 * i])
+    local interval = tonumber(ARGV[2 + 3 * i])
+    local timeout = tonumber(ARGV[3 + 3 * i])
+
+    available[i] = remaining(KEYS[2 * i - 1], amount, interval)
+    if available[i] <= 0 and timeout > 0 and redis.call("EXISTS", KEYS[2 * i]) == 0 then
+        redis.call("SET", KEYS[2 * i], 1, "EX", timeout)
+    end
+end
+
+local granted = size or 1
+for i = 1, rules do
+    ttls[i] = math.max(0, redis.call("TTL", KEYS[2 * i]))
+    if available[i] <= 0 or ttls[i] > 0 then
+        allowed = false
+    end
+    granted = math.min(granted, available[i])
+end
+
+local result = {allowed and granted or 0}
+for i = 1, rules do
+    if allowed then
+        take(KEYS[2 * i - 1], tonumber(ARGV[1 + 3 * i]), tonumber(ARGV[2 + 3 * i]), granted)
+        available[i] = available[i] - granted
+    end
+    table.insert(result, math.max(0, available[i]))
+    table.insert(result, ttls[i])
+end
+return result
+"""
+
+_RETRY_AFTER = """
+local ahead = size or 0
+local retry = 0
+
+for i = 1, #KEYS / 2 do
+    local amount = tonumber(ARGV[1 + 3 * i])
+    local interval = tonumber(ARGV[2 + 3 * i])
+    retry = math.max(retry, wait(KEYS[2 * i - 1], amount, interval, ahead), redis.call("PTTL", KEYS[2 * i]) / 1000)
+end
+return string.format("%.6f", retry)
+"""
+
+_PEEK = """
+local allowed = 1
+local result = {}
+
+for i = 1, #KEYS / 2 do
+    local amount = tonumber(ARGV[1 + 3 * i])
+    local interval = tonumber(ARGV[2 + 3 * i])
+    local available = remaining(KEYS[2 * i - 1], amount, interval, true)
+    local ttl = math.max(0, redis.call("TTL", KEYS[2 * i]))
+    if available <= 0 or ttl > 0 then
+        allowed = 0
+    end
+    table.insert(result, math.max(0, available))
+    table.insert(result, ttl)
+end
+table.insert(result, 1, allowed)
+return result
+"""
+
+
+_SLIDING_LOG = """
+-- ``peek`` only counts the calls which aren't expired yet instead of removing the expired ones
+local function remaining(key, amount, interval, peek)
+    if peek then
+        return amount - redis.call("ZCOUNT", key, string.format("(%.6f", now), "+inf")
+    end
+    redis.call("ZREMRANGEBYSCORE", key, 0, now)
+    return amount - redis.call("ZCARD", key)
+end
+
+local function take(key, amount, interval, granted)
+    local expires = string.format("%.6f", now + interval)
+    if size then
+        for n = 1, granted do
+            redis.call("ZADD", key, expires, extra .. ":" .. n)
+        end
+    else
+        redis.call("ZADD", key, expires, extra)
+    end
+    redis.call("EXPIRE", key, interval)
+end
+
+-- the scores are the expiries, so the call which frees the next permit is known exactly
+local function wait(key, amount, interval, ahead)
+    local live = string.format("(%.6f", now)
+    local calls = redis.call("ZCOUNT", key, live, "+inf")
+    local index = calls - amount + ahead
+    if index < 0 then
+        return 0
+    elseif index >= calls then
+        return interval
+    end
+    local call = redis.call("ZRANGEBYSCORE", key, live, "+inf", "WITHSCORES", "LIMIT", index, 1)
+    return tonumber(call[2]) - now
+end
+"""
+
+SLIDING_LOG = _HEADER + _SLIDING_LOG + _EVALUATE
+SLIDING_LOG_RETRY_AFTER = _HEADER + _SLIDING_LOG + _RETRY_AFTER
+SLIDING_LOG_PEEK = _HEADER + _SLIDING_LOG + _PEEK
+
+
+_GCRA = """
+local function tat(key)
+    return math.max(tonumber(redis.call("GET", key)) or now, now)
+end
+
+local function remaining(key, amount, interval)
+    return math.floor((now + interval - tat(key)) / (interval / amount) + 1e-6)
+end
+
+local function take(key, amount, interval, granted)
+    local new = tat(key) + granted * interval / amount
+    redis.call("SET", key, string.format("%.6f", new), "PX", math.ceil((new - now) * 1000))
+end
+
+local function wait(key, amount, interval, ahead)
+    return math.max(0, tat(key) + (ahead + 1) * interval / amount - interval - now)
+end
+"""
+
+GCRA = _HEADER + _GCRA + _EVALUATE
+GCRA_RETRY_AFTER = _HEADER + _GCRA + _RETRY_AFTER
+GCRA_PEEK = _HEADER + _GCRA + _PEEK
+
+
+_TOKEN_BUCKET = """
+local function tokens(key, amount, interval)
+    local bucket = redis.call("HMGET", key, "tokens", "ts")
+    local ts = tonumber(bucket[2]) or now
+    return math.min(amount, (tonumber(bucket[1]) or amount) + math.max(0, now - ts) * amount / interval)
+end
+
+local function remaining(key, amount, interval)
+    return math.floor(tokens(key, amount, interval) + 1e-6)
+end
+
+local function take(key, amount, interval, granted)
+    local left = tokens(key, amount, interval) - granted
+    redis.call("HSET", key, "tokens", string.format("%.6f", left), "ts", string.format("%.6f", now))
+    redis.call("EXPIRE", key, math.ceil((amount - left) * interval / amount) + 1)
+end
+
+local function wait(key, amount, interval, ahead)
+    return math.max(0, (ahead + 1 - tokens(key, amount, interval)) * interval / amount)
+end
+"""
+
+TOKEN_BUCKET = _HEADER + _TOKEN_BUCKET + _EVALUATE
+TOKEN_BUCKET_RETRY_AFTER = _HEADER + _TOKEN_BUCKET + _RETRY_AFTER
+TOKEN_BUCKET_PEEK = _HEADER + _TOKEN_BUCKET + _PEEK
+
+
+_SLIDING_WINDOW = """
+local buckets = tonumber(extra)
+
+-- the oldest bucket only partially overlaps with the window and gets weighted
+local function remaining(key, amount, interval, peek)
+    local size = interval / buckets
+    local current = math.floor(now / size)
+    local oldest = current - buckets
+
+    local estimate = 0
+    local counters = redis.call("HGETALL", key)
+    for i = 1, #counters, 2 do
+        local bucket = tonumber(counters[i])
+        local count = tonumber(counters[i + 1])
+        if bucket < oldest then
+            if not peek then
+                redis.call("HDEL", key, counters[i])
+            end
+        elseif bucket == oldest then
+            estimate = estimate + count * ((current + 1) * size - now) / size
+        else
+            estimate = estimate + count
+        end
+    end
+    return amount - math.ceil(estimate - 1e-6)
+end
+
+local function take(key, amount, interval, granted)
+    local size = interval / buckets
+    redis.call("HINCRBY", key, string.format("%d", math.floor(now / size)), granted)
+    redis.call("EXPIRE", key, math.ceil(interval + size))
+end
+
+-- the estimate only changes when the next bucket starts
+local function wait(key, amount, interval, ahead)
+    if remaining(key, amount, interval) > ahead then
+        return 0
+    end
+    local size = interval / buckets
+    return (math.floor(now / size) + 1) * size - now
+end
+"""
+
+SLIDING_WINDOW = _HEADER + _SLIDING_WINDOW + _EVALUATE
+SLIDING_WINDOW_RETRY_AFTER = _HEADER + _SLIDING_WINDOW + _RETRY_AFTER
+SLIDING_WINDOW_PEEK = _HEADER + _SLIDING_WINDOW + _PEEK
+
+
+# every running call holds one member (scored with it's expiry), so slots of crashed workers expire
+ACQUIRE_SLOT = """
+local now = tonumber(ARGV[1])
+local amount = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+
+redis.call("ZREMRANGEBYSCORE", KEYS[1], 0, now)
+local running = redis.call("ZCARD", KEYS[1])
+if running >= amount then
+    return {0, 0}
+end
+
+redis.call("ZADD", KEYS[1], string.format("%.6f", now + ttl), ARGV[4])
+redis.call("EXPIRE", KEYS[1], math.ceil(ttl))
+return {1, amount - running - 1}
+"""
+
+EXTEND_SLOT = """
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+
+redis.call("ZREMRANGEBYSCORE", KEYS[1], 0, now)
+if not redis.call("ZSCORE", KEYS[1], ARGV[3]) then
+    return 0
+end
+
+redis.call("ZADD", KEYS[1], "XX", string.format("%.6f", now + ttl), ARGV[3])
+if redis.call("TTL", KEYS[1]) < math.ceil(ttl) then
+    redis.call("EXPIRE", KEYS[1], math.ceil(ttl))
+end
+return 1
+"""
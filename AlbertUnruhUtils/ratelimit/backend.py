@@ -0,0 +1,1280 @@
+__all__ = (
+    "Backend",
+    "RedisBackend",
+    "MemoryBackend",
+    "SharedMemoryBackend",
+)
+
+
+import contextlib
+import functools
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import struct
+import tempfile
+import threading
+import typing
+from collections import deque
+from multiprocessing import (
+    resource_tracker,
+    shared_memory,
+)
+from redis import Redis
+from redis.exceptions import NoScriptError
+from time import (
+    monotonic,
+    time,
+)
+
+from ._scripts import (
+    GCRA,
+    GCRA_PEEK,
+    GCRA_RETRY_AFTER,
+    SLIDING_LOG,
+    SLIDING_LOG_PEEK,
+    SLIDING_LOG_RETRY_AFTER,
+    SLIDING_WINDOW,
+    SLIDING_WINDOW_PEEK,
+    SLIDING_WINDOW_RETRY_AFTER,
+    TOKEN_BUCKET,
+    TOKEN_BUCKET_PEEK,
+    TOKEN_BUCKET_RETRY_AFTER,
+)
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX
+    fcntl = None
+
+
+_SCRIPTS: dict[str, str] = {
+    "sliding_log": SLIDING_LOG,
+    "gcra": GCRA,
+    "token_bucket": TOKEN_BUCKET,
+    "sliding_window": SLIDING_WINDOW,
+}
+_RETRY_AFTER_SCRIPTS: dict[str, str] = {
+    "sliding_log": SLIDING_LOG_RETRY_AFTER,
+    "gcra": GCRA_RETRY_AFTER,
+    "token_bucket": TOKEN_BUCKET_RETRY_AFTER,
+    "sliding_window": SLIDING_WINDOW_RETRY_AFTER,
+}
+_PEEK_SCRIPTS: dict[str, str] = {
+    "sliding_log": SLIDING_LOG_PEEK,
+    "gcra": GCRA_PEEK,
+    "token_bucket": TOKEN_BUCKET_PEEK,
+    "sliding_window": SLIDING_WINDOW_PEEK,
+}
+
+# every member of a sliding log is unique per process (``_PREFIX``) and call (``_COUNTER``)
+_PREFIX = os.urandom(8)
+_COUNTER = itertools.count()
+_PACK = struct.Struct(">Q").pack
+
+
+def _reset_members() -> None:
+    """A forked process mustn't continue the members of it's parent."""
+    global _PREFIX, _COUNTER
+    _PREFIX = os.urandom(8)
+    _COUNTER = itertools.count()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_members)
+
+
+def _member() -> bytes:
+    """
+    Returns
+    -------
+    bytes
+        A unique member for a sliding log (16 bytes instead of a 36 characters long uuid4).
+    """
+    return _PREFIX + _PACK(next(_COUNTER))
+
+
+# ``key``, ``cooldown_key``, ``amount``, ``interval`` and ``timeout`` of a rule
+_Rule = tuple[str, str, int, int, int]
+# whether the call is allowed and the remaining calls and the timeout of every rule
+_Result = tuple[bool, list[tuple[int, int]]]
+
+
+class Backend(typing.Protocol):
+    """
+    The storage a ``ServerRateLimit`` keeps it's calls and cooldowns in.
+
+    Notes
+    -----
+    A backend which only supports some algorithms lists them as ``algorithms``
+    (``ServerRateLimit`` rejects the other ones when it's created).
+    """
+
+    def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        """
+        Records a call which expires after ``interval`` seconds.
+
+        Parameters
+        ----------
+        key: str
+        interval: int
+        """
+
+    def count(
+        self,
+        key: str,
+    ) -> int:
+        """
+        Removes expired calls and counts the remaining ones.
+
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        int
+        """
+
+    def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        """
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        int
+            The remaining cooldown in seconds (``0`` if there is none).
+        """
+
+    def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        """
+        Starts a cooldown, unless there is already one.
+
+        Parameters
+        ----------
+        key: str
+        timeout: int
+        """
+
+    def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        """
+        Cleans, counts, applies the cooldowns and records the call
+        in one atomic operation. The call is only recorded if every rule allows it.
+
+        Parameters
+        ----------
+        algorithm: str
+        rules: typing.Sequence[_Rule]
+            ``key``, ``cooldown_key``, ``amount``, ``interval`` and ``timeout`` of every rule.
+        buckets: int
+
+        Returns
+        -------
+        _Result
+            Whether the call is allowed and the remaining calls and the timeout of every rule.
+        """
+
+    def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        """
+        Like ``evaluate``, but for many requests in one round trip.
+        Every request is evaluated on it's own.
+
+        Parameters
+        ----------
+        algorithm: str
+        requests: typing.Sequence[typing.Sequence[_Rule]]
+            The rules of every request.
+        buckets: int
+
+        Returns
+        -------
+        list[_Result]
+        """
+
+    def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        """
+        Like ``evaluate`` with ``algorithm="sliding_log"``,
+        but records up to ``size`` calls at once.
+
+        Parameters
+        ----------
+        rules: typing.Sequence[_Rule]
+        size: int
+
+        Returns
+        -------
+        tuple[int, list[tuple[int, int]], typing.Any]
+            The granted calls, the remaining calls and the timeout of every rule
+            and a handle which is needed to ``release`` the lease.
+        """
+
+    def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        """
+        Gives ``unused`` calls of a lease back.
+
+        Parameters
+        ----------
+        handle: typing.Any
+            The handle returned by ``lease``.
+        unused: int
+        """
+
+    def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        """
+        Parameters
+        ----------
+        algorithm: str
+        rules: typing.Sequence[_Rule]
+        ahead: int
+            How many calls are queued in front of this one.
+        buckets: int
+
+        Returns
+        -------
+        float
+            The seconds until every rule allows a call again (``0`` if they do already).
+        """
+
+    def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        """
+        Like ``evaluate``, but only reads (nothing is cleaned, recorded or put in cooldown).
+
+        Parameters
+        ----------
+        algorithm: str
+        rules: typing.Sequence[_Rule]
+        buckets: int
+
+        Returns
+        -------
+        _Result
+            Whether a call would be allowed and the remaining calls and the timeout of every rule.
+        """
+
+
+class RedisBackend:
+    """Keeps calls and cooldowns in redis (the default for ``ServerRateLimit``)."""
+
+    redis: Redis
+
+    __slots__ = (
+        "redis",
+        "_scripts",
+        "_retry_after_scripts",
+        "_peek_scripts",
+    )
+
+    def __init__(
+        self,
+        redis: Redis = None,
+    ):
+        """
+        Parameters
+        ----------
+        redis: Redis, optional
+            An own redis can optionally be set.
+        """
+        if redis is None:
+            redis = Redis("127.0.0.1", 6262, 0)
+        self.redis = redis
+        self._scripts = {
+            algorithm: redis.register_script(script)
+            for algorithm, script in _SCRIPTS.items()
+        }
+        self._retry_after_scripts = {
+            algorithm: redis.register_script(script)
+            for algorithm, script in _RETRY_AFTER_SCRIPTS.items()
+        }
+        self._peek_scripts = {
+            algorithm: redis.register_script(script)
+            for algorithm, script in _PEEK_SCRIPTS.items()
+        }
+
+    def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(key, {_member(): time() + interval})
+            pipe.expire(key, interval)
+            pipe.execute()
+
+    def count(
+        self,
+        key: str,
+    ) -> int:
+        with self.redis.pipeline(transaction=False) as pipe:
+            # cleanup
+            pipe.zremrangebyscore(key, 0, time())
+            pipe.zcard(key)
+            _, count = pipe.execute()
+        return int(count or 0)
+
+    def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        return max(0, self.redis.ttl(key))
+
+    def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        if timeout > 0:
+            self.redis.set(key, 1, ex=timeout, nx=True)
+
+    def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        granted, results = self._parse(
+            self._scripts[algorithm](*self._keys_and_args(algorithm, rules, buckets))
+        )
+        return bool(granted), results
+
+    def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        responses = self._evaluate_many(algorithm, requests, buckets)
+        if any(isinstance(response, NoScriptError) for response in responses):
+            # the script isn't cached (yet), so it's loaded and everything is retried
+            self.redis.script_load(self._scripts[algorithm].script)
+            responses = self._evaluate_many(algorithm, requests, buckets)
+
+        evaluated = []
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
+            granted, results = self._parse(response)
+            evaluated.append((bool(granted), results))
+        return evaluated
+
+    def _evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        buckets: int,
+    ) -> list[typing.Any]:
+        sha = self._scripts[algorithm].sha
+        pipe = self.redis.pipeline(transaction=False)
+        for rules in requests:
+            keys, args = self._keys_and_args(algorithm, rules, buckets)
+            pipe.evalsha(sha, len(keys), *keys, *args)
+        return pipe.execute(raise_on_error=False)
+
+    def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        token = _member()
+        granted, results = self._parse(
+            self._scripts["sliding_log"](
+                *self._keys_and_args("sliding_log", rules, 0, member=token, size=size)
+            )
+        )
+        return granted, results, (token, granted, [rule[0] for rule in rules])
+
+    def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        token, granted, keys = handle
+        members = [
+            b"%s:%d" % (token, i) for i in range(granted - unused + 1, granted + 1)
+        ]
+        if not members:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.zrem(key, *members)
+        pipe.execute()
+
+    def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        return float(
+            self._retry_after_scripts[algorithm](
+                *self._keys_and_args(algorithm, rules, buckets, size=ahead)
+            )
+        )
+
+    def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        allowed, results = self._parse(
+            self._peek_scripts[algorithm](
+                *self._keys_and_args(algorithm, rules, buckets)
+            )
+        )
+        return bool(allowed), results
+
+    @staticmethod
+    def _keys_and_args(
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        buckets: int,
+        *,
+        member: bytes = None,
+        size: int = None,
+    ) -> tuple[list[str], list[typing.Union[bytes, float, int, str]]]:
+        """Builds ``KEYS`` and ``ARGV`` like ``._scripts`` expects them."""
+        if algorithm == "sliding_log":
+            extra = member or _member()
+        elif algorithm == "sliding_window":
+            extra = buckets
+        else:
+            extra = ""
+
+        keys = []
+        args = [time(), extra, "" if size is None else size]
+        for key, cooldown_key, amount, interval, timeout in rules:
+            keys += (key, cooldown_key)
+            args += (amount, interval, timeout)
+        return keys, args
+
+    @staticmethod
+    def _parse(
+        response: list[int],
+    ) -> tuple[int, list[tuple[int, int]]]:
+        """Parses the response of a script into the granted calls and the remaining calls and timeout of every rule."""
+        return int(response[0]), [
+            (int(response[i]), int(response[i + 1])) for i in range(1, len(response), 2)
+        ]
+
+
+class _Entry:
+    """One key of the ``MemoryBackend``."""
+
+    __slots__ = (
+        "expires",
+        "value",
+    )
+
+    def __init__(
+        self,
+        expires: float,
+        value: typing.Any,
+    ):
+        self.expires = expires
+        self.value = value
+
+
+class MemoryBackend:
+    """
+    Keeps calls and cooldowns in-process, so limiting costs
+    microseconds instead of a network hop.
+
+    Notes
+    -----
+    The limits are only shared between the ``ServerRateLimit``'s
+    using the same instance and not between processes.
+    """
+
+    __slots__ = (
+        "_entries",
+        "_expiries",
+        "_lock",
+    )
+
+    def __init__(self):
+        self._entries: dict[str, _Entry] = {}
+        self._expiries: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        with self._lock:
+            now = monotonic()
+            self._sweep(now)
+            self._take("sliding_log", key, now, 0, interval, 0, 1)
+
+    def count(
+        self,
+        key: str,
+    ) -> int:
+        with self._lock:
+            now = monotonic()
+            self._sweep(now)
+            return self._count(key, now)
+
+    def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        with self._lock:
+            return self._get_cooldown(key, monotonic())
+
+    def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        with self._lock:
+            self._set_cooldown(key, monotonic(), timeout)
+
+    def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        with self._lock:
+            now = monotonic()
+            self._sweep(now)
+            granted, results = self._evaluate(algorithm, rules, now, buckets, 1)
+            return bool(granted), results
+
+    def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        return [self.evaluate(algorithm, rules, buckets=buckets) for rules in requests]
+
+    def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        with self._lock:
+            now = monotonic()
+            self._sweep(now)
+            granted, results = self._evaluate("sliding_log", rules, now, 0, size)
+            # every call of the lease expires at the same time
+            return granted, results, [(rule[0], now + rule[3]) for rule in rules]
+
+    def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        with self._lock:
+            for key, expires in handle:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                calls: deque[float] = entry.value
+                for _ in range(unused):
+                    try:
+                        calls.remove(expires)
+                    except ValueError:
+                        break
+
+    def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        with self._lock:
+            now = monotonic()
+            self._sweep(now)
+
+            retry = 0.0
+            for key, cooldown_key, amount, interval, _ in rules:
+                retry = max(
+                    retry,
+                    self._wait(algorithm, key, now, amount, interval, buckets, ahead),
+                )
+                cooldown = self._get(cooldown_key, now)
+                if cooldown is not None:
+                    retry = max(retry, cooldown.expires - now)
+            return retry
+
+    def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        with self._lock:
+            now = monotonic()
+            results = [
+                (
+                    self._available(algorithm, key, now, amount, interval, buckets),
+                    self._get_cooldown(cooldown_key, now),
+                )
+                for key, cooldown_key, amount, interval, _ in rules
+            ]
+            allowed = all(remaining > 0 and not ttl for remaining, ttl in results)
+            return allowed, [(max(0, remaining), ttl) for remaining, ttl in results]
+
+    def _evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        now: float,
+        buckets: int,
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]]]:
+        """Works like the Lua-scripts in ``._scripts``."""
+        available = []
+        for key, cooldown_key, amount, interval, timeout in rules:
+            remaining = self._available(algorithm, key, now, amount, interval, buckets)
+            if remaining <= 0:
+                self._set_cooldown(cooldown_key, now, timeout)
+            available.append(remaining)
+        ttls = [self._get_cooldown(rule[1], now) for rule in rules]
+
+        if any(remaining <= 0 for remaining in available) or any(ttls):
+            return 0, [
+                (max(0, remaining), ttl) for remaining, ttl in zip(available, ttls)
+            ]
+
+        granted = min(size, *available)
+        for key, _, amount, interval, _ in rules:
+            self._take(algorithm, key, now, amount, interval, buckets, granted)
+        return granted, [
+            (remaining - granted, ttl) for remaining, ttl in zip(available, ttls)
+        ]
+
+    def _sweep(
+        self,
+        now: float,
+    ) -> None:
+        """Drops every entry which is expired."""
+        expiries = self._expiries
+        while expiries and expiries[0][0] <= now:
+            _, key = heapq.heappop(expiries)
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry.expires <= now:
+                del self._entries[key]
+            else:
+                # the entry got extended in the meantime
+                heapq.heappush(expiries, (entry.expires, key))
+
+    def _get(
+        self,
+        key: str,
+        now: float,
+    ) -> typing.Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires <= now:
+            return None
+        return entry
+
+    def _put(
+        self,
+        key: str,
+        expires: float,
+        value: typing.Any,
+    ) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = _Entry(expires, value)
+            heapq.heappush(self._expiries, (expires, key))
+        else:
+            # the old expiry is still in the heap and gets updated by ``_sweep``
+            entry.expires = expires
+            entry.value = value
+
+    def _get_cooldown(
+        self,
+        key: str,
+        now: float,
+    ) -> int:
+        entry = self._get(key, now)
+        if entry is None:
+            return 0
+        return math.ceil(entry.expires - now)
+
+    def _set_cooldown(
+        self,
+        key: str,
+        now: float,
+        timeout: int,
+    ) -> None:
+        if timeout > 0 and self._get(key, now) is None:
+            self._put(key, now + timeout, None)
+
+    def _count(
+        self,
+        key: str,
+        now: float,
+    ) -> int:
+        entry = self._get(key, now)
+        if entry is None:
+            return 0
+        calls: deque[float] = entry.value
+        while calls and calls[0] <= now:
+            calls.popleft()
+        return len(calls)
+
+    def _available(
+        self,
+        algorithm: str,
+        key: str,
+        now: float,
+        amount: int,
+        interval: int,
+        buckets: int,
+    ) -> int:
+        """Returns how many calls are available (like the Lua-scripts do)."""
+        entry = self._get(key, now)
+
+        if algorithm == "sliding_log":
+            return amount - self._count(key, now)
+
+        elif algorithm == "gcra":
+            tat = now if entry is None else max(entry.value, now)
+            return math.floor((now + interval - tat) / (interval / amount) + 1e-6)
+
+        elif algorithm == "token_bucket":
+            if entry is None:
+                return amount
+            tokens, ts = entry.value
+            tokens = min(amount, tokens + max(0.0, now - ts) * amount / interval)
+            return math.floor(tokens + 1e-6)
+
+        elif algorithm == "sliding_window":
+            if entry is None:
+                return amount
+            size = interval / buckets
+            current = math.floor(now / size)
+            oldest = current - buckets
+            counters: dict[int, int] = entry.value
+
+            estimate = 0.0
+            for bucket, count in list(counters.items()):
+                if bucket < oldest:
+                    del counters[bucket]
+                elif bucket == oldest:
+                    estimate += count * ((current + 1) * size - now) / size
+                else:
+                    estimate += count
+            return amount - math.ceil(estimate - 1e-6)
+
+        raise ValueError(f"Unknown algorithm {algorithm!r}!")
+
+    def _wait(
+        self,
+        algorithm: str,
+        key: str,
+        now: float,
+        amount: int,
+        interval: int,
+        buckets: int,
+        ahead: int,
+    ) -> float:
+        """Returns the seconds until ``ahead + 1`` calls are available (like the Lua-scripts do)."""
+        if algorithm == "sliding_log":
+            calls = self._count(key, now)
+            index = calls - amount + ahead
+            if index < 0:
+                return 0.0
+            elif index >= calls:
+                return float(interval)
+            return self._get(key, now).value[index] - now
+
+        entry = self._get(key, now)
+
+        if algorithm == "gcra":
+            tat = now if entry is None else max(entry.value, now)
+            return max(0.0, tat + (ahead + 1) * interval / amount - interval - now)
+
+        elif algorithm == "token_bucket":
+            if entry is None:
+                tokens = amount
+            else:
+                tokens, ts = entry.value
+                tokens = min(amount, tokens + max(0.0, now - ts) * amount / interval)
+            return max(0.0, (ahead + 1 - tokens) * interval / amount)
+
+        elif algorithm == "sliding_window":
+            if self._available(algorithm, key, now, amount, interval, buckets) > ahead:
+                return 0.0
+            size = interval / buckets
+            return (math.floor(now / size) + 1) * size - now
+
+        raise ValueError(f"Unknown algorithm {algorithm!r}!")
+
+    def _take(
+        self,
+        algorithm: str,
+        key: str,
+        now: float,
+        amount: int,
+        interval: int,
+        buckets: int,
+        granted: int,
+    ) -> None:
+        """Records ``granted`` calls (expects ``_available`` to be called before)."""
+        entry = self._get(key, now)
+
+        if algorithm == "sliding_log":
+            calls = deque() if entry is None else entry.value
+            calls.extend([now + interval] * granted)
+            self._put(key, now + interval, calls)
+
+        elif algorithm == "gcra":
+            tat = now if entry is None else max(entry.value, now)
+            tat += granted * interval / amount
+            self._put(key, tat, tat)
+
+        elif algorithm == "token_bucket":
+            rate = amount / interval
+            if entry is None:
+                tokens = amount
+            else:
+                tokens, ts = entry.value
+                tokens = min(amount, tokens + max(0.0, now - ts) * rate)
+            tokens -= granted
+            self._put(key, now + (amount - tokens) / rate, (tokens, now))
+
+        elif algorithm == "sliding_window":
+            counters = {} if entry is None else entry.value
+            current = math.floor(now / (interval / buckets))
+            counters[current] = counters.get(current, 0) + granted
+            self._put(key, now + interval + interval / buckets, counters)
+
+        else:
+            raise ValueError(f"Unknown algorithm {algorithm!r}!")
+
+
+# digest (``_EMPTY`` if unused), expiry and the two values of an entry
+_SLOT = struct.Struct("=16sddd")
+# magic, slots and stripes of the table
+_HEADER = struct.Struct("=8sII")
+_MAGIC = b"AUU-RL01"
+_EMPTY = bytes(16)
+_NAN = float("nan")
+# fcntl-locks belong to the process (not to the file descriptor), so every
+# ``SharedMemoryBackend`` of a process has to use the same descriptor and thread-locks
+_LOCK_FILES: dict[str, tuple[int, list[threading.Lock]]] = {}
+_LOCK_FILES_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=4096)
+def _digest(
+    key: str,
+) -> bytes:
+    """The key of an entry in the ``SharedMemoryBackend`` (a collision is as unlikely as guessing a uuid4)."""
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class SharedMemoryBackend(MemoryBackend):
+    """
+    Keeps the limits in shared memory, so every process on the host which opens
+    the same ``name`` (e.g. the workers of gunicorn) shares exact limits at memory speed.
+
+    The entries are kept in a fixed-size open-addressing table, which is split into
+    ``stripes``, so processes only wait for each other if they use the same stripe.
+
+    Notes
+    -----
+    Only ``algorithm="gcra"`` and ``algorithm="token_bucket"`` are supported
+    (they only need one timestamp/counter per ``section`` and ``id``, see ``algorithms``),
+    so leases aren't either.
+    Every key is hashed onto one stripe, which holds ``slots // stripes`` entries,
+    so the table is full once the fullest stripe is, before all ``slots`` are used
+    (see ``capacity``).
+    The locks are ``fcntl``-locks, so it's only available on POSIX.
+    The shared memory stays until ``unlink()`` is called (e.g. when the server shuts down).
+
+    For ``.asynchronous.ratelimit.server.ServerRateLimit`` it can be wrapped by
+    ``.asynchronous.ratelimit.backend.MemoryBackend``.
+    """
+
+    name: str
+    slots: int
+    stripes: int
+    algorithms: tuple[str, ...] = ("gcra", "token_bucket")
+
+    __slots__ = (
+        "name",
+        "slots",
+        "stripes",
+        "_memory",
+        "_fd",
+        "_locks",
+    )
+
+    def __init__(
+        self,
+        name: str = "AlbertUnruhUtils-ratelimit",
+        *,
+        slots: int = 65536,
+        stripes: int = 64,
+    ):
+        """
+        Parameters
+        ----------
+        name: str
+            Every process which uses the same ``name`` shares the limits.
+        slots: int
+            How many entries (one per limit and ``id`` plus one per cooldown) fit at most.
+            Every entry takes 40 bytes. Since the stripes fill up unevenly,
+            it should be about twice the expected entries (see ``capacity``).
+        stripes: int
+            Into how many independently locked parts the table is split.
+        """
+        if fcntl is None:
+            raise RuntimeError("SharedMemoryBackend requires fcntl (POSIX)!")
+        if not isinstance(stripes, int) or stripes < 1:
+            raise ValueError(f"stripes must be a positive int, not {stripes!r}!")
+        if not isinstance(slots, int) or slots < stripes or slots % stripes:
+            raise ValueError(
+                f"slots must be a multiple of stripes ({stripes}), not {slots!r}!"
+            )
+
+        super().__init__()
+        self.name = name
+        self.slots = slots
+        self.stripes = stripes
+        with _LOCK_FILES_LOCK:
+            if name not in _LOCK_FILES:
+                fd = os.open(
+                    os.path.join(tempfile.gettempdir(), f"{name}.lock"),
+                    os.O_RDWR | os.O_CREAT,
+                    0o600,
+                )
+                # fcntl-locks don't exclude the threads of one process from each other
+                _LOCK_FILES[name] = fd, [threading.Lock() for _ in range(stripes)]
+            self._fd, self._locks = _LOCK_FILES[name]
+        if len(self._locks) != stripes:
+            raise ValueError(
+                f"{name!r} is already used with {len(self._locks)} stripes in this process!"
+            )
+
+        # the byte after the stripes locks the creation of the table
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripes)
+        try:
+            self._memory = self._open()
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripes)
+
+    def _open(self) -> shared_memory.SharedMemory:
+        size = _HEADER.size + self.slots * _SLOT.size
+        try:
+            memory = shared_memory.SharedMemory(self.name, create=True, size=size)
+            _HEADER.pack_into(memory.buf, 0, _MAGIC, self.slots, self.stripes)
+        except FileExistsError:
+            memory = shared_memory.SharedMemory(self.name)
+        # the memory has to outlive the process which created it (until ``unlink()``)
+        resource_tracker.unregister(memory._name, "shared_memory")  # noqa
+
+        magic, slots, stripes = _HEADER.unpack_from(memory.buf, 0)
+        if (magic, slots, stripes) != (_MAGIC, self.slots, self.stripes):
+            memory.close()
+            raise ValueError(
+                f"{self.name!r} already exists with {slots} slots and {stripes} stripes!"
+            )
+        return memory
+
+    def __len__(self) -> int:
+        now = monotonic()
+        count = 0
+        for index in range(self.slots):
+            digest, expires, _, _ = _SLOT.unpack_from(
+                self._memory.buf, _HEADER.size + index * _SLOT.size
+            )
+            count += digest != _EMPTY and expires > now
+        return count
+
+    @property
+    def capacity(self) -> int:
+        """How many entries fit into one stripe (the table is full once one stripe is)."""
+        return self.slots // self.stripes
+
+    def close(self) -> None:
+        """Detaches this instance from the shared memory."""
+        self._memory.close()
+
+    def unlink(self) -> None:
+        """Frees the shared memory (for every process, the lock-file is kept)."""
+        # ``unlink()`` unregisters it from the resource tracker again
+        resource_tracker.register(self._memory._name, "shared_memory")  # noqa
+        self._memory.unlink()
+
+    def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        self._check("sliding_log")
+
+    def count(
+        self,
+        key: str,
+    ) -> int:
+        self._check("sliding_log")
+
+    def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        with self._locked([key]):
+            return self._get_cooldown(key, monotonic())
+
+    def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        with self._locked([key]):
+            self._set_cooldown(key, monotonic(), timeout)
+
+    def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        self._check(algorithm)
+        with self._locked([key for rule in rules for key in rule[:2]]):
+            granted, results = self._evaluate(algorithm, rules, monotonic(), buckets, 1)
+            return bool(granted), results
+
+    def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        self._check("sliding_log")
+
+    def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        self._check("sliding_log")
+
+    def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        self._check(algorithm)
+        with self._locked([key for rule in rules for key in rule[:2]]):
+            now = monotonic()
+            retry = 0.0
+            for key, cooldown_key, amount, interval, _ in rules:
+                retry = max(
+                    retry,
+                    self._wait(algorithm, key, now, amount, interval, buckets, ahead),
+                )
+                cooldown = self._get(cooldown_key, now)
+                if cooldown is not None:
+                    retry = max(retry, cooldown.expires - now)
+            return retry
+
+    def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        self._check(algorithm)
+        with self._locked([key for rule in rules for key in rule[:2]]):
+            now = monotonic()
+            results = [
+                (
+                    self._available(algorithm, key, now, amount, interval, buckets),
+                    self._get_cooldown(cooldown_key, now),
+                )
+                for key, cooldown_key, amount, interval, _ in rules
+            ]
+            allowed = all(remaining > 0 and not ttl for remaining, ttl in results)
+            return allowed, [(max(0, remaining), ttl) for remaining, ttl in results]
+
+    def _check(
+        self,
+        algorithm: str,
+    ) -> None:
+        if algorithm not in self.algorithms:
+            raise ValueError(
+                f"SharedMemoryBackend doesn't support algorithm {algorithm!r}! "
+                f"Use 'gcra' or 'token_bucket' instead."
+            )
+
+    def _stripe(
+        self,
+        digest: bytes,
+    ) -> tuple[int, int]:
+        """Returns the stripe of ``digest`` and where it starts probing in there."""
+        h = int.from_bytes(digest[:8], "little")
+        return h % self.stripes, (h // self.stripes) % (self.slots // self.stripes)
+
+    @contextlib.contextmanager
+    def _locked(
+        self,
+        keys: typing.Iterable[str],
+    ) -> typing.Iterator[None]:
+        """Locks the stripes of ``keys`` (always in the same order, so it can't deadlock)."""
+        stripes = sorted({self._stripe(_digest(key))[0] for key in keys})
+        locked = []
+        try:
+            for stripe in stripes:
+                self._locks[stripe].acquire()
+                locked.append(stripe)
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            yield
+        finally:
+            for stripe in reversed(locked):
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+                self._locks[stripe].release()
+
+    def _find(
+        self,
+        digest: bytes,
+        now: float,
+    ) -> tuple[typing.Optional[int], typing.Optional[int]]:
+        """
+        Returns
+        -------
+        tuple[int, optional, int, optional]
+            The offset of ``digest`` (``None`` if it isn't in the table)
+            and the offset of the first slot it could be put in.
+        """
+        stripe, start = self._stripe(digest)
+        size = self.slots // self.stripes
+        buf = self._memory.buf
+        free = None
+        for probe in range(size):
+            offset = (
+                _HEADER.size + (stripe * size + (start + probe) % size) * _SLOT.size
+            )
+            stored, expires, _, _ = _SLOT.unpack_from(buf, offset)
+            if stored == digest:
+                return offset, offset
+            if stored == _EMPTY:
+                # no entry after an empty slot belongs to this chain
+                return None, offset if free is None else free
+            # expired entries are overwritten instead of being removed
+            if free is None and expires <= now:
+                free = offset
+        return None, free
+
+    def _sweep(
+        self,
+        now: float,
+    ) -> None:
+        """Expired entries are overwritten by ``_put``."""
+
+    def _get(
+        self,
+        key: str,
+        now: float,
+    ) -> typing.Optional[_Entry]:
+        offset, _ = self._find(_digest(key), now)
+        if offset is None:
+            return None
+        _, expires, first, second = _SLOT.unpack_from(self._memory.buf, offset)
+        if expires <= now:
+            return None
+        if math.isnan(first):
+            value = None
+        elif math.isnan(second):
+            value = first
+        else:
+            value = (first, second)
+        return _Entry(expires, value)
+
+    def _put(
+        self,
+        key: str,
+        expires: float,
+        value: typing.Any,
+    ) -> None:
+        digest = _digest(key)
+        _, offset = self._find(digest, monotonic())
+        if offset is None:
+            raise RuntimeError(
+                f"SharedMemoryBackend {self.name!r} is full: the stripe of {key!r} "
+                f"holds {self.capacity} entries (slots // stripes), "
+                f"use more slots (about twice the expected entries) or fewer stripes!"
+            )
+        if value is None:
+            first, second = _NAN, _NAN
+        elif isinstance(value, tuple):
+            first, second = value
+        else:
+            first, second = value, _NAN
+        _SLOT.pack_into(self._memory.buf, offset, digest, expires, first, second)
@@ -0,0 +1,470 @@
+__all__ = (
+    "CircuitBreaker",
+    "BreakerBackend",
+)
+
+
+import math
+import threading
+import typing
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    TimeoutError as _TimeoutError,
+)
+from redis.exceptions import RedisError
+from time import (
+    monotonic,
+    perf_counter,
+)
+
+from .backend import (
+    Backend,
+    MemoryBackend,
+    _Result,
+    _Rule,
+)
+
+
+_STATE = typing.Literal["closed", "open", "half_open"]
+_FALLBACK = typing.Literal["local", "open", "closed"]
+
+# the errors which count as a failed call of the backend
+_FAILURES = (RedisError, OSError)
+
+
+class CircuitBreaker:
+    """
+    Trips (opens) after ``failures`` slow or failed calls in a row,
+    so the backend isn't asked while it's down. After ``recovery`` seconds
+    one trial call is let through (half-open) which closes it again on success.
+    """
+
+    failures: int
+    slow: float
+    recovery: float
+
+    __slots__ = (
+        "failures",
+        "slow",
+        "recovery",
+        "_state",
+        "_count",
+        "_opened",
+        "_trial",
+        "_lock",
+    )
+
+    def __init__(
+        self,
+        *,
+        failures: int = 5,
+        slow: float = 0.25,
+        recovery: float = 5.0,
+    ):
+        """
+        Parameters
+        ----------
+        failures: int
+            After how many slow or failed calls in a row the breaker trips.
+        slow: float
+            Calls which take longer than ``slow`` seconds count as failed.
+        recovery: float
+            How many seconds the breaker stays open before a trial call is let through.
+        """
+        if not isinstance(failures, int) or failures < 1:
+            raise ValueError(f"failures must be a positive int, not {failures!r}!")
+        if not slow > 0:
+            raise ValueError(f"slow must be positive, not {slow!r}!")
+        if not recovery > 0:
+            raise ValueError(f"recovery must be positive, not {recovery!r}!")
+
+        self.failures = failures
+        self.slow = slow
+        self.recovery = recovery
+        self._state: _STATE = "closed"
+        self._count = 0
+        self._opened = 0.0
+        self._trial = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> _STATE:
+        with self._lock:
+            if self._state == "open" and monotonic() >= self._opened + self.recovery:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Returns
+        -------
+        bool
+            Whether the backend can be asked (the result has to be
+            reported via ``succeeded`` or ``failed`` afterwards).
+        """
+        with self._lock:
+            if self._state == "closed":
+                return True
+
+            now = monotonic()
+            if now < self._opened + self.recovery:
+                return False
+            # only one trial at once (a lost trial is replaced after ``recovery``)
+            if self._state == "half_open" and now < self._trial + self.recovery:
+                return False
+            self._state = "half_open"
+            self._trial = now
+            return True
+
+    def succeeded(
+        self,
+        duration: float,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        duration: float
+            How many seconds the call took.
+        """
+        if duration > self.slow:
+            self.failed()
+            return
+        with self._lock:
+            self._state = "closed"
+            self._count = 0
+
+    def failed(self) -> None:
+        with self._lock:
+            self._count += 1
+            # an already open breaker isn't opened again, otherwise
+            # failing calls could keep it open forever
+            if self._state == "half_open" or (
+                self._state == "closed" and self._count >= self.failures
+            ):
+                self._state = "open"
+                self._opened = monotonic()
+
+    def retry_after(self) -> float:
+        """
+        Returns
+        -------
+        float
+            The seconds until the backend is asked again (``0`` if the breaker is closed).
+        """
+        with self._lock:
+            if self._state == "closed":
+                return 0.0
+            return max(0.0, self._opened + self.recovery - monotonic())
+
+
+class _StaticBackend:
+    """Answers every call without any storage (``fallback="open"`` or ``"closed"``)."""
+
+    allowed: bool
+    breaker: CircuitBreaker
+
+    __slots__ = (
+        "allowed",
+        "breaker",
+    )
+
+    def __init__(
+        self,
+        allowed: bool,
+        breaker: CircuitBreaker,
+    ):
+        self.allowed = allowed
+        self.breaker = breaker
+
+    def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        pass
+
+    def count(
+        self,
+        key: str,
+    ) -> int:
+        return 0
+
+    def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        if self.allowed:
+            return 0
+        return max(1, math.ceil(self.breaker.retry_after()))
+
+    def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        pass
+
+    def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return self.allowed, self._results(rules, 1)
+
+    def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        return [self.evaluate(algorithm, rules, buckets=buckets) for rules in requests]
+
+    def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        return (size if self.allowed else 0), self._results(rules, size), None
+
+    def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        pass
+
+    def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        if self.allowed:
+            return 0.0
+        return self.breaker.retry_after()
+
+    def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return self.evaluate(algorithm, rules, buckets=buckets)
+
+    def _results(
+        self,
+        rules: typing.Sequence[_Rule],
+        granted: int,
+    ) -> list[tuple[int, int]]:
+        if self.allowed:
+            return [(max(0, rule[2] - granted), 0) for rule in rules]
+        timeout = self.get_cooldown("")
+        return [(0, timeout) for _ in rules]
+
+
+class BreakerBackend:
+    """
+    Wraps a backend (e.g. ``RedisBackend``) with a ``CircuitBreaker``.
+    While the breaker is open, or if a call fails, the ``fallback`` answers instead,
+    so a slow or unavailable redis doesn't block every limited call.
+
+    Notes
+    -----
+    Without ``timeout`` a call can't be interrupted, so the time a single call blocks
+    is bounded by the redis-client (e.g. ``Redis(socket_timeout=0.25)``).
+    """
+
+    backend: Backend
+    breaker: CircuitBreaker
+    fallback: _FALLBACK
+    timeout: typing.Optional[float]
+
+    __slots__ = (
+        "backend",
+        "breaker",
+        "fallback",
+        "timeout",
+        "_fallback",
+        "_executor",
+    )
+
+    def __init__(
+        self,
+        backend: Backend,
+        *,
+        breaker: CircuitBreaker = None,
+        fallback: _FALLBACK = "local",
+        timeout: float = None,
+    ):
+        """
+        Parameters
+        ----------
+        backend: Backend
+        breaker: CircuitBreaker, optional
+            Defaults to a ``CircuitBreaker()``.
+        fallback: _FALLBACK
+            Who answers while the breaker is open.
+            ``"local"`` limits approximately in-process (with a ``MemoryBackend``, default),
+            ``"open"`` allows every call and ``"closed"`` rejects every call.
+        timeout: float, optional
+            After how many seconds the ``fallback`` answers instead of a call of the backend
+            (which counts as failed). The call runs in a worker-thread therefore
+            and finishes there in the background.
+        """
+        if fallback not in _FALLBACK.__args__:  # type: ignore
+            raise ValueError(
+                f"Unknown fallback {fallback!r}! "
+                f"Use one of them instead: {', '.join(_FALLBACK.__args__)}"  # type: ignore
+            )
+        if timeout is not None and not timeout > 0:
+            raise ValueError(f"timeout must be positive, not {timeout!r}!")
+        if breaker is None:
+            breaker = CircuitBreaker()
+
+        self.backend = backend
+        self.breaker = breaker
+        self.fallback = fallback
+        self.timeout = timeout
+        self._executor = None
+        if timeout is not None:
+            self._executor = ThreadPoolExecutor(thread_name_prefix="BreakerBackend")
+        if fallback == "local":
+            self._fallback = MemoryBackend()
+        else:
+            self._fallback = _StaticBackend(fallback == "open", breaker)
+
+    @property
+    def algorithms(self) -> typing.Optional[tuple[str, ...]]:
+        """The algorithms the wrapped backend supports (``None`` if it supports all)."""
+        return getattr(self.backend, "algorithms", None)
+
+    def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        self._call("record", key, interval)
+
+    def count(
+        self,
+        key: str,
+    ) -> int:
+        return self._call("count", key)
+
+    def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        return self._call("get_cooldown", key)
+
+    def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        self._call("set_cooldown", key, timeout)
+
+    def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return self._call("evaluate", algorithm, rules, buckets=buckets)
+
+    def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        return self._call("evaluate_many", algorithm, requests, buckets=buckets)
+
+    def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        source = self.backend
+        succeeded, leased = self._try("lease", rules, size)
+        if not succeeded:
+            source = self._fallback
+            leased = self._fallback.lease(rules, size)
+        granted, results, handle = leased
+        # the handle is only known by the backend which leased it
+        return granted, results, (source, handle)
+
+    def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        source, handle = handle
+        if source is self._fallback:
+            self._fallback.release(handle, unused)
+        else:
+            # if the backend is down, the leased calls expire there on their own
+            self._try("release", handle, unused)
+
+    def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        return self._call("retry_after", algorithm, rules, ahead=ahead, buckets=buckets)
+
+    def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return self._call("peek", algorithm, rules, buckets=buckets)
+
+    def _call(
+        self,
+        method: str,
+        *args,
+        **kwargs,
+    ) -> typing.Any:
+        """Calls ``method`` of the backend (or of the fallback if the breaker is open or the call fails)."""
+        succeeded, result = self._try(method, *args, **kwargs)
+        if succeeded:
+            return result
+        return getattr(self._fallback, method)(*args, **kwargs)
+
+    def _try(
+        self,
+        method: str,
+        *args,
+        **kwargs,
+    ) -> tuple[bool, typing.Any]:
+        """Calls ``method`` of the backend if the breaker allows it and reports the outcome to the breaker."""
+        if not self.breaker.allow():
+            return False, None
+
+        start = perf_counter()
+        try:
+            if self._executor is None:
+                result = getattr(self.backend, method)(*args, **kwargs)
+            else:
+                result = self._executor.submit(
+                    getattr(self.backend, method), *args, **kwargs
+                ).result(self.timeout)
+        except _FAILURES + (_TimeoutError,):
+            self.breaker.failed()
+            return False, None
+        self.breaker.succeeded(perf_counter() - start)
+        return True, result
@@ -0,0 +1,96 @@
+__all__ = ("CooldownCache",)
+
+
+import math
+import threading
+import typing
+from collections import OrderedDict
+from time import monotonic
+
+
+_Key = typing.Hashable
+
+
+class CooldownCache:
+    """
+    An in-process LRU-cache which remembers until when a ``section`` and ``id``
+    is in cooldown, so those calls can be rejected without asking redis.
+    """
+
+    maxsize: int
+
+    __slots__ = (
+        "maxsize",
+        "_entries",
+        "_lock",
+    )
+
+    def __init__(
+        self,
+        maxsize: int,
+    ):
+        """
+        Parameters
+        ----------
+        maxsize: int
+            How many cooldowns are remembered at most.
+            The least recently used one is dropped first.
+        """
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ValueError(f"maxsize must be a positive int, not {maxsize!r}!")
+
+        self.maxsize = maxsize
+        self._entries: OrderedDict[_Key, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        key: _Key,
+    ) -> int:
+        """
+        Parameters
+        ----------
+        key: _Key
+
+        Returns
+        -------
+        int
+            The remaining cooldown in seconds (``0`` if there is none).
+        """
+        with self._lock:
+            deadline = self._entries.get(key)
+            if deadline is None:
+                return 0
+
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                del self._entries[key]
+                return 0
+
+            self._entries.move_to_end(key)
+            return math.ceil(remaining)
+
+    def set(
+        self,
+        key: _Key,
+        timeout: int,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        key: _Key
+        timeout: int
+            The cooldown in seconds.
+        """
+        with self._lock:
+            self._entries[key] = monotonic() + timeout
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,336 @@
+__all__ = (
+    "Observer",
+    "Metrics",
+    "MetricsBackend",
+)
+
+
+import bisect
+import threading
+import typing
+from time import perf_counter
+
+from .backend import (
+    Backend,
+    _Result,
+    _Rule,
+)
+
+
+_OUTCOME = typing.Literal["allowed", "denied", "cooldown"]
+_HISTOGRAM = typing.Literal["backend", "retrieve_section"]
+
+# upper bounds (in seconds) of the histogram-buckets (a redis round trip mostly takes 0.1-1ms)
+_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+_HELP: dict[str, str] = {
+    "backend": "Seconds a call of the backend took (one round trip to redis).",
+    "retrieve_section": "Seconds retrieve_section took.",
+}
+
+
+class Observer(typing.Protocol):
+    """
+    Gets every measurement of a ``ServerRateLimit(metrics=...)``,
+    so it can be exported anywhere (e.g. to statsd or OpenTelemetry).
+    """
+
+    def count(
+        self,
+        section: str,
+        outcome: _OUTCOME,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        section: str
+        outcome: _OUTCOME
+            ``"allowed"``, ``"denied"`` (no room left) or ``"cooldown"`` (rejected while in cooldown).
+        """
+
+    def observe(
+        self,
+        name: _HISTOGRAM,
+        seconds: float,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        name: _HISTOGRAM
+            ``"backend"`` (a call of the backend) or ``"retrieve_section"``.
+        seconds: float
+        """
+
+
+class _Histogram:
+    """Cumulative buckets like Prometheus exports them."""
+
+    __slots__ = (
+        "counts",
+        "sum",
+    )
+
+    def __init__(
+        self,
+        buckets: int,
+    ):
+        # the last one counts everything above the highest bucket (``+Inf``)
+        self.counts = [0] * (buckets + 1)
+        self.sum = 0.0
+
+
+class Metrics:
+    """
+    Counts the outcomes per ``section`` and keeps latency-histograms in-process
+    (the default ``Observer``), they can be dumped with ``prometheus()``.
+    """
+
+    buckets: tuple[float, ...]
+
+    __slots__ = (
+        "buckets",
+        "_counters",
+        "_histograms",
+        "_lock",
+    )
+
+    def __init__(
+        self,
+        *,
+        buckets: typing.Sequence[float] = _BUCKETS,
+    ):
+        """
+        Parameters
+        ----------
+        buckets: typing.Sequence[float]
+            The upper bounds (in seconds) of the histogram-buckets.
+        """
+        buckets = tuple(sorted(buckets))
+        if not buckets or not buckets[0] > 0:
+            raise ValueError(f"buckets must be positive, not {buckets!r}!")
+
+        self.buckets = buckets
+        self._counters: dict[tuple[str, str], int] = {}
+        self._histograms = {name: _Histogram(len(buckets)) for name in _HELP}
+        self._lock = threading.Lock()
+
+    @property
+    def counters(self) -> dict[tuple[str, str], int]:
+        """The count of every ``section`` and ``outcome``."""
+        with self._lock:
+            return dict(self._counters)
+
+    def count(
+        self,
+        section: str,
+        outcome: _OUTCOME,
+    ) -> None:
+        key = (section, outcome)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def observe(
+        self,
+        name: _HISTOGRAM,
+        seconds: float,
+    ) -> None:
+        histogram = self._histograms[name]
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram.counts[index] += 1
+            histogram.sum += seconds
+
+    def prometheus(
+        self,
+        prefix: str = "ratelimit",
+    ) -> str:
+        """
+        Parameters
+        ----------
+        prefix: str
+            Is put in front of every metric.
+
+        Returns
+        -------
+        str
+            Every metric in the Prometheus text-format (e.g. to be served at ``/metrics``).
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = {
+                name: (list(histogram.counts), histogram.sum)
+                for name, histogram in self._histograms.items()
+            }
+
+        lines = [
+            f"# HELP {prefix}_calls_total Calls checked by ServerRateLimit.",
+            f"# TYPE {prefix}_calls_total counter",
+        ]
+        for (section, outcome), value in counters:
+            lines.append(
+                f'{prefix}_calls_total{{section="{_escape(section)}",outcome="{outcome}"}} {value}'
+            )
+
+        for name, (counts, total) in histograms.items():
+            metric = f"{prefix}_{name}_seconds"
+            lines += [
+                f"# HELP {metric} {_HELP[name]}",
+                f"# TYPE {metric} histogram",
+            ]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+            lines += [
+                f"{metric}_sum {total!r}",
+                f"{metric}_count {cumulative}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(
+    value: str,
+) -> str:
+    """Escapes a label-value for the Prometheus text-format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsBackend:
+    """
+    Wraps a backend and reports how long every call of it took
+    (as ``"backend"``) to an ``Observer``.
+    ``ServerRateLimit(metrics=...)`` wraps it's backend with it.
+    """
+
+    backend: Backend
+    observer: Observer
+
+    __slots__ = (
+        "backend",
+        "observer",
+    )
+
+    def __init__(
+        self,
+        backend: Backend,
+        observer: Observer,
+    ):
+        """
+        Parameters
+        ----------
+        backend: Backend
+        observer: Observer
+        """
+        self.backend = backend
+        self.observer = observer
+
+    @property
+    def algorithms(self) -> typing.Optional[tuple[str, ...]]:
+        """The algorithms the wrapped backend supports (``None`` if it supports all)."""
+        return getattr(self.backend, "algorithms", None)
+
+    def record(
+        self,
+        key: str,
+        interval: int,
+    ) -> None:
+        self._call("record", key, interval)
+
+    def count(
+        self,
+        key: str,
+    ) -> int:
+        return self._call("count", key)
+
+    def get_cooldown(
+        self,
+        key: str,
+    ) -> int:
+        return self._call("get_cooldown", key)
+
+    def set_cooldown(
+        self,
+        key: str,
+        timeout: int,
+    ) -> None:
+        self._call("set_cooldown", key, timeout)
+
+    def evaluate(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return self._call("evaluate", algorithm, rules, buckets=buckets)
+
+    def evaluate_many(
+        self,
+        algorithm: str,
+        requests: typing.Sequence[typing.Sequence[_Rule]],
+        *,
+        buckets: int = 10,
+    ) -> list[_Result]:
+        return self._call("evaluate_many", algorithm, requests, buckets=buckets)
+
+    def lease(
+        self,
+        rules: typing.Sequence[_Rule],
+        size: int,
+    ) -> tuple[int, list[tuple[int, int]], typing.Any]:
+        return self._call("lease", rules, size)
+
+    def release(
+        self,
+        handle: typing.Any,
+        unused: int,
+    ) -> None:
+        self._call("release", handle, unused)
+
+    def retry_after(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        ahead: int = 0,
+        buckets: int = 10,
+    ) -> float:
+        return self._call("retry_after", algorithm, rules, ahead=ahead, buckets=buckets)
+
+    def peek(
+        self,
+        algorithm: str,
+        rules: typing.Sequence[_Rule],
+        *,
+        buckets: int = 10,
+    ) -> _Result:
+        return self._call("peek", algorithm, rules, buckets=buckets)
+
+    def _call(
+        self,
+        method: str,
+        *args,
+        **kwargs,
+    ) -> typing.Any:
+        """Calls ``method`` of the backend and reports how long it took (also if it fails)."""
+        start = perf_counter()
+        try:
+            return getattr(self.backend, method)(*args, **kwargs)
+        finally:
+            self.observer.observe("backend", perf_counter() - start)
@@ -0,0 +1,292 @@
+__all__ = (
+    "Limit",
+    "Policy",
+    "Decision",
+)
+
+
+import typing
+from collections.abc import Mapping
+
+from .backend import _Rule
+
+
+_LIMIT = dict[str, int]
+_SECTION = typing.Union[_LIMIT, "Limit", list[typing.Union[_LIMIT, "Limit"]]]
+
+
+def _layout(
+    section: str,
+    kind: str,
+    key_prefix: str,
+    hash_tags: bool,
+) -> tuple[str, str]:
+    """The parts of a key before and after the ``id`` (see ``ServerRateLimit(hash_tags=...)``)."""
+    if hash_tags:
+        return f"{key_prefix}{{{section}:", f"}}:{kind}"
+    return f"{key_prefix}{kind}-{section}-", ""
+
+
+class Limit:
+    """One validated limit of a section (immutable)."""
+
+    amount: int
+    interval: int
+    timeout: int
+
+    __slots__ = (
+        "amount",
+        "interval",
+        "timeout",
+    )
+
+    def __init__(
+        self,
+        amount: int,
+        interval: int,
+        timeout: int,
+    ):
+        """
+        Parameters
+        ----------
+        amount: int
+            How many calls are allowed per ``interval``.
+        interval: int
+            In seconds.
+        timeout: int
+            The cooldown (in seconds) which is applied if a section requests too often.
+        """
+        if not isinstance(amount, int) or amount < 1:
+            raise ValueError(f"amount must be a positive int, not {amount!r}!")
+        # redis only expires keys after whole seconds (``EXPIRE``)
+        if not isinstance(interval, int) or interval < 1:
+            raise ValueError(f"interval must be a positive int, not {interval!r}!")
+        if not isinstance(timeout, int) or timeout < 0:
+            raise ValueError(f"timeout must be a non-negative int, not {timeout!r}!")
+
+        object.__setattr__(self, "amount", amount)
+        object.__setattr__(self, "interval", interval)
+        object.__setattr__(self, "timeout", timeout)
+
+    def __setattr__(
+        self,
+        name: str,
+        value: typing.Any,
+    ) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable!")
+
+    def __repr__(self) -> str:
+        return f"<Limit amount={self.amount} interval={self.interval} timeout={self.timeout}>"
+
+    def __eq__(
+        self,
+        other: typing.Any,
+    ) -> bool:
+        if not isinstance(other, Limit):
+            return NotImplemented
+        return (self.amount, self.interval, self.timeout) == (
+            other.amount,
+            other.interval,
+            other.timeout,
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.amount, self.interval, self.timeout))
+
+    @classmethod
+    def parse(
+        cls,
+        limit: typing.Union[_LIMIT, "Limit"],
+    ) -> "Limit":
+        """
+        Parameters
+        ----------
+        limit: _LIMIT, Limit
+            ``{"amount": ..., "interval": ..., "timeout": ...}`` (or an already parsed ``Limit``).
+
+        Returns
+        -------
+        Limit
+        """
+        if isinstance(limit, cls):
+            return limit
+        try:
+            return cls(limit["amount"], limit["interval"], limit["timeout"])
+        except (KeyError, TypeError):
+            raise ValueError(
+                f"A limit needs an amount, interval and timeout, not {limit!r}!"
+            ) from None
+
+
+class Policy:
+    """
+    The compiled limits of a section (immutable).
+    The keys are laid out once, so building the rules of a call
+    only concatenates the ``id`` in.
+    """
+
+    section: str
+    limits: tuple[Limit, ...]
+
+    __slots__ = (
+        "section",
+        "limits",
+        "_templates",
+        "_cooldown",
+    )
+
+    def __init__(
+        self,
+        section: str,
+        limits: _SECTION,
+        *,
+        kind: str = "call",
+        key_prefix: str = "",
+        hash_tags: bool = False,
+    ):
+        """
+        Parameters
+        ----------
+        section: str
+        limits: _SECTION
+            One or many limits (like ``ServerRateLimit`` takes them per section).
+        kind: str
+            What is stored (e.g. ``"call"``, depends on the algorithm).
+        key_prefix: str
+        hash_tags: bool
+            See ``ServerRateLimit``.
+        """
+        if isinstance(limits, (dict, Limit)):
+            limits = [limits]
+        limits = tuple(Limit.parse(limit) for limit in limits)
+        if not limits:
+            raise ValueError(f"Section {section!r} needs at least one limit!")
+
+        templates = []
+        for index, limit in enumerate(limits):
+            head, tail = _layout(section, kind, key_prefix, hash_tags)
+            # the first limit keeps the key it had before sections could have many limits
+            if index:
+                tail += f"-{index}"
+            templates.append((head, tail, limit.amount, limit.interval, limit.timeout))
+
+        object.__setattr__(self, "section", section)
+        object.__setattr__(self, "limits", limits)
+        object.__setattr__(self, "_templates", tuple(templates))
+        object.__setattr__(
+            self, "_cooldown", _layout(section, "cooldown", key_prefix, hash_tags)
+        )
+
+    def __setattr__(
+        self,
+        name: str,
+        value: typing.Any,
+    ) -> None:
+        raise AttributeError(f"{self.__class__.__name__} is immutable!")
+
+    def __repr__(self) -> str:
+        return f"<Policy section={self.section!r} limits={list(self.limits)!r}>"
+
+    def rules(
+        self,
+        id: typing.Union[str, int],  # noqa
+    ) -> list[_Rule]:
+        """
+        Parameters
+        ----------
+        id: str, int
+
+        Returns
+        -------
+        list[_Rule]
+            ``key``, ``cooldown_key``, ``amount``, ``interval`` and ``timeout``
+            of every limit like ``Backend.evaluate`` takes them.
+        """
+        id = str(id)  # noqa
+        cooldown_key = self._cooldown[0] + id + self._cooldown[1]
+        return [
+            (head + id + tail, cooldown_key, amount, interval, timeout)
+            for head, tail, amount, interval, timeout in self._templates
+        ]
+
+
+class Decision(Mapping):
+    """
+    The outcome of a call (reporting the tightest limit).
+    It can still be used like the dict it replaces (``decision["request"]["remaining"]``).
+    """
+
+    allowed: bool
+    remaining: int
+    limit: int
+    period: int
+    timeout: int
+
+    __slots__ = (
+        "allowed",
+        "remaining",
+        "limit",
+        "period",
+        "timeout",
+    )
+
+    def __init__(
+        self,
+        allowed: bool,
+        remaining: int,
+        limit: int,
+        period: int,
+        timeout: int,
+    ):
+        """
+        Parameters
+        ----------
+        allowed: bool
+        remaining: int
+            The remaining calls of the tightest limit.
+        limit: int
+            The ``amount`` of the tightest limit.
+        period: int
+            The ``interval`` of the tightest limit.
+        timeout: int
+            The longest running cooldown.
+        """
+        self.allowed = allowed
+        self.remaining = remaining
+        self.limit = limit
+        self.period = period
+        self.timeout = timeout
+
+    def __getitem__(
+        self,
+        key: str,
+    ) -> dict[str, int]:
+        if key != "request":
+            raise KeyError(key)
+        return {
+            "remaining": self.remaining,
+            "limit": self.limit,
+            "period": self.period,
+            "timeout": self.timeout,
+        }
+
+    def __iter__(self) -> typing.Iterator[str]:
+        yield "request"
+
+    def __len__(self) -> int:
+        return 1
+
+    def __repr__(self) -> str:
+        return (
+            f"<Decision allowed={self.allowed} remaining={self.remaining} "
+            f"limit={self.limit} period={self.period} timeout={self.timeout}>"
+        )
+
+    def as_dict(self) -> dict[str, dict[str, int]]:
+        """
+        Returns
+        -------
+        dict[str, dict[str, int]]
+            The legacy dict (e.g. to serialize it as JSON).
+        """
+        return {"request": self["request"]}
@@ -2,39 +2,158 @@ __all__ = ("ServerRateLimit",)
 
 
 import functools
+import heapq
+import itertools
+import threading
 import typing
-import uuid
 from redis import Redis
-from time import time
+from redis.exceptions import RedisError
+from time import (
+    monotonic,
+    perf_counter,
+)
+
+from ._base import (
+    BaseServerRateLimit,
+    _ALGORITHM,
+    _ENGINE,
+    _Policies,
+    _SCOPE,
+    _SCOPES,
+    _SECTION,
+)
+from .backend import (
+    Backend,
+    RedisBackend,
+)
+from .metrics import (
+    MetricsBackend,
+    Observer,
+)
+from .policy import Decision
+from .store import PolicyStore
 
 
 C_IN = typing.TypeVar("C_IN")
 C_OUT = typing.TypeVar("C_OUT")
 
 
-class ServerRateLimit:
+class _Lease:
+    """Calls which are leased from the backend and handed out locally."""
+
+    __slots__ = (
+        "permits",
+        "remaining",
+        "expires",
+        "handle",
+        "lock",
+        "swept",
+    )
+
+    def __init__(self):
+        self.permits = 0
+        self.remaining: list[int] = []
+        self.expires = 0.0
+        self.handle = None
+        self.lock = threading.Lock()
+        # set once the lease is removed from ``_leases``, a waiting call has to look it up again
+        self.swept = False
+
+
+class _Waiters:
+    """Parks waiting calls until their wake-up time and wakes them in order."""
+
+    __slots__ = (
+        "queued",
+        "_heap",
+        "_counter",
+        "_condition",
+    )
+
+    def __init__(self):
+        self.queued: dict[tuple[_SCOPE, ...], int] = {}
+        self._heap: list[tuple[float, int]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+    def enqueue(
+        self,
+        scopes: tuple[_SCOPE, ...],
+    ) -> int:
+        """Returns how many calls of ``scopes`` are already waiting."""
+        with self._condition:
+            ahead = self.queued.get(scopes, 0)
+            self.queued[scopes] = ahead + 1
+            return ahead
+
+    def dequeue(
+        self,
+        scopes: tuple[_SCOPE, ...],
+    ) -> None:
+        with self._condition:
+            if self.queued[scopes] > 1:
+                self.queued[scopes] -= 1
+            else:
+                del self.queued[scopes]
+
+    def park(
+        self,
+        until: float,
+    ) -> None:
+        """Blocks until ``until`` (``monotonic``) is reached and every earlier waiter is woken."""
+        ticket = (until, next(self._counter))
+        with self._condition:
+            heapq.heappush(self._heap, ticket)
+            try:
+                while True:
+                    if self._heap[0] != ticket:
+                        self._condition.wait()
+                        continue
+                    timeout = until - monotonic()
+                    if timeout <= 0:
+                        return
+                    self._condition.wait(timeout)
+            finally:
+                self._heap.remove(ticket)
+                heapq.heapify(self._heap)
+                self._condition.notify_all()
+
+
+class ServerRateLimit(BaseServerRateLimit):
     """Docs 'll come soon... (If you want docs right now you can take a look into ``__init__``)"""
 
-    section: dict[str, dict[str, int]]
-    retrieve_section: typing.Callable[[...], tuple[str, typing.Union[str, int]]]
+    sections: typing.Mapping[str, _SECTION]
+    retrieve_section: typing.Callable[[...], _SCOPES]
 
     __slots__ = (
-        "sections",
-        "retrieve_section",
-        "_redis",
+        "_waiters",
+        "_sweeper",
+        "_sweeper_lock",
     )
 
     def __init__(
         self,
-        sections: dict[str, dict[str, int]],
-        retrieve_section: typing.Callable[[...], tuple[str, typing.Union[str, int]]],
+        sections: typing.Union[dict[str, _SECTION], PolicyStore],
+        retrieve_section: typing.Callable[[...], _SCOPES],
         *,
         redis: Redis = None,
+        backend: Backend = None,
+        engine: _ENGINE = "commands",
+        algorithm: _ALGORITHM = "sliding_log",
+        buckets: int = 10,
+        cooldown_cache: int = 0,
+        lease: float = 0,
+        lease_ttl: float = 1.0,
+        wait: bool = False,
+        max_wait: float = None,
+        key_prefix: str = "",
+        hash_tags: bool = False,
+        metrics: Observer = None,
     ):
         """
         Parameters
         ----------
-        sections: dict[str, dict[str, int]]
+        sections: dict[str, _SECTION], PolicyStore
             Parameter ``sections`` requires following structure:
             ```py
             >>> {
@@ -51,10 +170,20 @@ class ServerRateLimit:
             ...     "<second NAME or TYPE>": {
             ...         ...
             ...     },
+            ...     "<NAME or TYPE with stacked limits (e.g. 10/s AND 1000/h)>": [
+            ...         {"amount": 10, "interval": 1, "timeout": 5},
+            ...         {"amount": 1000, "interval": 3600, "timeout": 60},
+            ...     ],
             ...     ...
             ... }
             ```
-        retrieve_section: typing.Callable[[...], tuple[str, typing.Union[str, int]]]
+            A call is only allowed (and recorded) if every limit of it's section allows it,
+            the returned data reports the tightest limit.
+            The sections are validated and compiled into ``Policy``'s once
+            (a limit can also be given as ``Limit``).
+            If a ``PolicyStore`` is given, the policies are recompiled and swapped in at once
+            whenever it's updated, so the next call uses the new limits.
+        retrieve_section: typing.Callable[[...], _SCOPES]
             This function 'll feed all it's data from the original callable.
             e.g. ```py
             >>> @ServerRateLimit({"user": {...}, "admin": {...}}, retrieve)
@@ -68,144 +197,464 @@ class ServerRateLimit:
             ...         return "admin", 0
             ...     return "user", 0
             ```
+            To count a call against many scopes at once (e.g. global -> tenant -> user)
+            it can also return a list of ``section``'s and ``id``'s:
+            ```py
+            >>> def retrieve(*args, **kwargs) -> list[tuple[str, str]]:
+            ...     return [("global", 0), ("tenant", kwargs["tenant_id"]), ("user", kwargs["user_id"])]
+            ```
+            The call is only allowed (and recorded against every scope) if every scope has room.
         redis: Redis, optional
             An own redis can optionally be set.
+        backend: Backend, optional
+            Where the calls and cooldowns are stored (e.g. ``MemoryBackend()`` to limit in-process).
+            Defaults to a ``RedisBackend`` using ``redis``.
+        engine: _ENGINE
+            How a call gets checked and recorded.
+            ``"commands"`` sends every redis-command on its own (default),
+            ``"script"`` runs one Lua-script (``EVALSHA``) which cleans, counts,
+            applies the cooldown and records the call atomically in a single round trip.
+            A section with more than one limit and a call with more than one scope
+            always use the script, so their limits are checked and recorded atomically.
+        algorithm: _ALGORITHM
+            How the calls are counted.
+            ``"sliding_log"`` stores one entry per call (default),
+            ``"gcra"`` (generic cell rate algorithm) and ``"token_bucket"``
+            only store one timestamp/counter per ``section`` and ``id``,
+            so memory and CPU stay constant no matter how big ``amount`` is.
+            ``"sliding_window"`` splits ``interval`` into ``buckets`` counters
+            and estimates the window by weighting the oldest one.
+            Every algorithm except ``"sliding_log"`` is always evaluated
+            atomically (e.g. by a Lua-script), regardless of ``engine``.
+        buckets: int
+            How many counters ``algorithm="sliding_window"`` uses per ``interval``.
+            More buckets are more precise, but need more memory.
+        cooldown_cache: int
+            If set, up to ``cooldown_cache`` cooldowns are remembered in-process
+            (least recently used ones are dropped first) and calls from a ``section`` and ``id``
+            which is still in cooldown are rejected without asking the backend.
+            Those rejections report ``0`` remaining calls.
+        lease: float
+            If set, blocks of ``lease * amount`` calls are leased from the backend
+            at once and handed out locally until the lease runs out or expires
+            (only one round trip per block instead of per call).
+            This is only supported by ``algorithm="sliding_log"``.
+        lease_ttl: float
+            After how many seconds the unused calls of a lease are given back.
+        wait: bool
+            If set, a rejected call waits until the backend has room again instead of
+            returning ``(False, data), ()`` right away. The waiting calls are parked locally
+            and woken in order at the exact time the next call is permitted, so they don't poll.
+        max_wait: float, optional
+            How many seconds a call waits at most (only with ``wait=True``).
+            If the next permitted call is further away, it's rejected right away.
+        key_prefix: str
+            Is put in front of every key (e.g. ``"rl:"``), so many limiters can share one redis.
+        hash_tags: bool
+            If set, the keys are laid out as ``<key_prefix>{<section>:<id>}:<kind>``
+            (e.g. ``rl:{user:42}:call`` and ``rl:{user:42}:cooldown``) instead of
+            ``<key_prefix><kind>-<section>-<id>``. In a Redis Cluster only the part
+            in braces is hashed, so every key of one ``section`` and ``id`` lands on the
+            same slot while different ones spread across the cluster.
+        metrics: Observer, optional
+            Gets the outcome of every call (``"allowed"``, ``"denied"`` or ``"cooldown"``
+            per ``section``; the rejection which starts a cooldown is ``"denied"``, the ones
+            while it's running are ``"cooldown"``, as far as this process knows) and how long ``retrieve_section`` and every call of the backend took
+            (e.g. ``Metrics()``, which can be dumped in the Prometheus text-format).
 
         Notes
         -----
         The first return value from ``retrieve_section``
         is the ``section``, the second is the ``id`` to
-        have every section separated.
+        have every section separated (the same applies to
+        every scope if a list is returned).
+
+        A call which is counted against many scopes touches the keys of every scope at once,
+        so with a Redis Cluster only one scope can be returned per call (unless all of them
+        hash to the same slot).
         """
-        self.sections = sections
-        self.retrieve_section = retrieve_section
+        if redis is not None and backend is not None:
+            raise ValueError("Only one of redis and backend can be set!")
+
+        super().__init__(
+            sections,
+            retrieve_section,
+            engine=engine,
+            algorithm=algorithm,
+            buckets=buckets,
+            cooldown_cache=cooldown_cache,
+            lease=lease,
+            lease_ttl=lease_ttl,
+            wait=wait,
+            max_wait=max_wait,
+            key_prefix=key_prefix,
+            hash_tags=hash_tags,
+            metrics=metrics,
+        )
 
-        if redis is None:
-            redis = Redis("127.0.0.1", 6262, 0)
-        self._redis = redis
+        if backend is None:
+            backend = RedisBackend(redis)
+        self._check_backend(backend)
+        if metrics is not None:
+            backend = MetricsBackend(backend, metrics)
+        self._backend = backend
+        self._waiters = _Waiters()
+        self._sweeper: typing.Optional[threading.Timer] = None
+        self._sweeper_lock = threading.Lock()
 
     def __call__(
         self,
         func: typing.Callable[[C_IN], C_OUT],
-    ) -> typing.Callable[[C_IN], tuple[tuple[bool, dict[str, int]], C_OUT]]:
-        def decorator(*args, **kwargs) -> tuple[tuple[bool, dict[str, int]], C_OUT]:
+    ) -> typing.Callable[[C_IN], tuple[tuple[bool, Decision], C_OUT]]:
+        def decorator(*args, **kwargs) -> tuple[tuple[bool, Decision], C_OUT]:
             """
             Returns
             -------
-            tuple[tuple[bool, dict[str, int]], C_OUT]
+            tuple[tuple[bool, Decision], C_OUT]
             """
-            section, id = self.retrieve_section(*args, **kwargs)  # noqa
-            if section not in self.sections:
-                raise RuntimeError(
-                    "Can't use key {section!r}. You have to return one of the following: {possible}".format(
-                        section=section,
-                        possible=", ".join(f"{k!r}" for k in self.sections),
-                    )
-                )
-
-            self._check_timeout(section, id)
-
-            timeout = self._calculate_timeout(section, id)
-            remaining = self._calculate_remaining_calls(section, id)
-
-            data = {
-                "request": {
-                    "remaining": -1,
-                    "limit": self.sections[section]["amount"],
-                    "period": self.sections[section]["interval"],
-                    "timeout": timeout,
-                }
-            }
-
-            if not remaining > 0 or timeout:
-                data["request"]["remaining"] = self._calculate_remaining_calls(
-                    section, id
-                )
+            start = perf_counter()
+            retrieved = self.retrieve_section(*args, **kwargs)
+            if self.metrics is not None:
+                self.metrics.observe("retrieve_section", perf_counter() - start)
+            # one snapshot per call, a ``PolicyStore`` can swap them in the meantime
+            policies = self._policies
+            scopes = self._scopes(policies, retrieved)
+
+            allowed, results = self._acquire(policies, scopes)
+            if not allowed and self.wait:
+                allowed, results = self._wait(policies, scopes, results)
+            self._report(policies, scopes, allowed, results)
+            data = self._data(policies, scopes, allowed, results)
+
+            if not allowed:
                 return (False, data), ()
-
-            self._record_call(section, id)
-            data["request"]["remaining"] = self._calculate_remaining_calls(section, id)
             return (True, data), func(*args, **kwargs)
 
         return functools.update_wrapper(decorator, func)
 
-    def _record_call(
+    def acquire_many(
+        self,
+        requests: typing.Iterable[_SCOPES],
+    ) -> list[tuple[bool, Decision]]:
+        """
+        Checks and records many requests with one round trip to the backend.
+        Every request is evaluated on it's own and atomically (regardless of ``engine``),
+        leases aren't used and rejected requests don't ``wait``.
+
+        Parameters
+        ----------
+        requests: typing.Iterable[_SCOPES]
+            The ``section`` and ``id`` (or a list of them) of every request
+            (like ``retrieve_section`` returns them).
+
+        Returns
+        -------
+        list[tuple[bool, Decision]]
+            Whether the request is allowed and it's data (in the same order as ``requests``).
+        """
+        policies = self._policies
+        requests = [self._scopes(policies, request) for request in requests]
+
+        results: list[typing.Optional[tuple[bool, list[tuple[int, int]]]]] = [
+            None
+        ] * len(requests)
+        pending = []
+        for index, scopes in enumerate(requests):
+            cached = self._cached(policies, scopes)
+            if cached is not None:
+                results[index] = cached
+                continue
+            pending.append(index)
+
+        if pending:
+            evaluated = self._backend.evaluate_many(
+                self.algorithm,
+                [self._rules(policies, requests[index]) for index in pending],
+                buckets=self.buckets,
+            )
+            for index, result in zip(pending, evaluated):
+                results[index] = result
+                self._cache(policies, requests[index], result[1])
+
+        for scopes, (allowed, limits) in zip(requests, results):
+            self._report(policies, scopes, allowed, limits)
+        return [
+            (allowed, self._data(policies, scopes, allowed, limits))
+            for scopes, (allowed, limits) in zip(requests, results)
+        ]
+
+    def peek(
         self,
         section: str,
         id: typing.Union[str, int],  # noqa
-    ) -> None:
+    ) -> Decision:
         """
+        Reads the data of ``section`` and ``id`` like the decorator returns it,
+        but without recording a call (e.g. for ``X-RateLimit-Remaining``-headers).
+        The backend is only read (one round trip) and nothing gets cleaned up.
+
         Parameters
         ----------
         section: str
         id: str, int
+
+        Returns
+        -------
+        Decision
+            Whether a call would be allowed and the data of the tightest limit.
+
+        Notes
+        -----
+        A peek doesn't start a cooldown, only running ones are reported.
+        Leased calls which aren't handed out yet count as used.
         """
-        key = f"call-{section}-{id}"
-        self._redis.execute_command(
-            f"ZADD {key} {time()+self.sections[section]['interval']} {uuid.uuid4()}"
+        policies = self._policies
+        scopes = self._scopes(policies, (section, id))
+        cached = self._cached(policies, scopes)
+        if cached is not None:
+            return self._data(policies, scopes, *cached)
+        allowed, results = self._backend.peek(
+            self.algorithm, self._rules(policies, scopes), buckets=self.buckets
         )
-        self._redis.expire(key, self.sections[section]["interval"])
+        return self._data(policies, scopes, allowed, results)
 
-    def _calculate_remaining_calls(
+    def _acquire(
         self,
-        section: str,
-        id: typing.Union[str, int],  # noqa
-    ) -> int:
+        policies: _Policies,
+        scopes: list[_SCOPE],
+        *,
+        cached: bool = True,
+    ) -> tuple[bool, list[tuple[int, int]]]:
         """
         Parameters
         ----------
-        section: str
-        id: str, int
+        policies: _Policies
+        scopes: list[_SCOPE]
+        cached: bool
+            Whether the ``cooldown_cache`` is asked first.
 
         Returns
         -------
-        int
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
         """
-        key = f"call-{section}-{id}"
-
-        # cleanup
-        self._redis.zremrangebyscore(key, 0, time())
+        if cached:
+            rejection = self._cached(policies, scopes)
+            if rejection is not None:
+                return rejection
+
+        if self.lease:
+            allowed, results = self._take_lease(policies, scopes)
+        elif (
+            self.engine == "script"
+            or self.algorithm != "sliding_log"
+            or self._stacked(policies, scopes)
+        ):
+            allowed, results = self._evaluate(policies, scopes)
+        else:
+            allowed, results = self._run_commands(policies, scopes)
+
+        self._cache(policies, scopes, results)
+        return allowed, results
+
+    def _wait(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+        results: list[tuple[int, int]],
+    ) -> tuple[bool, list[tuple[int, int]]]:
+        """
+        Parks the call until the backend has room again and retries it.
 
-        return self.sections[section]["amount"] - int(
-            self._redis.zcount(key, 0, 2**62) or 0
-        )
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
+        results: list[tuple[int, int]]
+            The results of the rejected call.
 
-    def _check_timeout(
+        Returns
+        -------
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
+        """
+        deadline = None if self.max_wait is None else monotonic() + self.max_wait
+        key = tuple(scopes)
+        # calls which already wait get the permits before this one
+        ahead = self._waiters.enqueue(key)
+        try:
+            while True:
+                until = monotonic() + self._backend.retry_after(
+                    self.algorithm,
+                    self._rules(policies, scopes),
+                    ahead=ahead,
+                    buckets=self.buckets,
+                )
+                if deadline is not None and until > deadline:
+                    return False, results
+
+                self._waiters.park(until)
+                # the cooldown_cache only knows whole seconds
+                allowed, results = self._acquire(policies, scopes, cached=False)
+                if allowed:
+                    return True, results
+                ahead = 0
+        finally:
+            self._waiters.dequeue(key)
+
+    def _run_commands(
         self,
-        section: str,
-        id: typing.Union[str, int],  # noqa
-    ) -> None:
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> tuple[bool, list[tuple[int, int]]]:
         """
         Parameters
         ----------
-        section: str
-        id: str, int
+        policies: _Policies
+        scopes: list[_SCOPE]
+
+        Returns
+        -------
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
         """
-        key = f"cooldown-{section}-{id}"
+        rules = self._rules(policies, scopes)
+        for key, cooldown_key, amount, _, timeout in rules:
+            if not amount - self._backend.count(key) > 0:
+                self._backend.set_cooldown(cooldown_key, timeout)
+
+        timeouts = [self._backend.get_cooldown(rule[1]) for rule in rules]
+        remaining = [
+            amount - self._backend.count(key) for key, _, amount, _, _ in rules
+        ]
+
+        allowed = all(calls > 0 for calls in remaining) and not any(timeouts)
+        if allowed:
+            for key, _, _, interval, _ in rules:
+                self._backend.record(key, interval)
+            remaining = [calls - 1 for calls in remaining]
+        return allowed, [(max(0, calls), t) for calls, t in zip(remaining, timeouts)]
+
+    def _evaluate(
+        self,
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> tuple[bool, list[tuple[int, int]]]:
+        """
+        Parameters
+        ----------
+        policies: _Policies
+        scopes: list[_SCOPE]
 
-        if not self._calculate_remaining_calls(section, id) > 0:
-            if not self._redis.exists(key):
-                self._redis.append(key, 1)
-                self._redis.expire(key, self.sections[section]["timeout"])
+        Returns
+        -------
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
+        """
+        return self._backend.evaluate(
+            self.algorithm, self._rules(policies, scopes), buckets=self.buckets
+        )
 
-    def _calculate_timeout(
+    def _take_lease(
         self,
-        section: str,
-        id: typing.Union[str, int],  # noqa
-    ) -> int:
+        policies: _Policies,
+        scopes: list[_SCOPE],
+    ) -> tuple[bool, list[tuple[int, int]]]:
         """
         Parameters
         ----------
-        section: str
-        id: str, int
+        policies: _Policies
+        scopes: list[_SCOPE]
 
         Returns
         -------
-        int
+        tuple[bool, list[tuple[int, int]]]
+            Whether the call is allowed and the remaining calls and the timeout of every limit.
         """
-        key = f"cooldown-{section}-{id}"
-
-        return max(0, self._redis.ttl(key))
+        key = tuple(scopes)
+        while True:
+            lease = self._leases.get(key)
+            if lease is None:
+                lease = self._leases.setdefault(key, _Lease())
+
+            with lease.lock:
+                if lease.swept:
+                    continue
+
+                if lease.permits > 0 and lease.expires > monotonic():
+                    lease.permits -= 1
+                    return True, self._leased(lease)
+
+                if lease.permits > 0:
+                    self._backend.release(lease.handle, lease.permits)
+                    lease.permits = 0
+
+                rules = self._rules(policies, scopes)
+                amount = min(rule[2] for rule in rules)
+                granted, results, handle = self._backend.lease(
+                    rules, max(1, int(amount * self.lease))
+                )
+                if not granted:
+                    return False, results
+
+                lease.permits = granted - 1
+                lease.remaining = [remaining for remaining, _ in results]
+                lease.expires = monotonic() + self.lease_ttl
+                lease.handle = handle
+                self._schedule_sweep()
+                return True, [
+                    (remaining + lease.permits, t) for remaining, t in results
+                ]
+
+    def _schedule_sweep(self) -> None:
+        """Sweeps the leases after ``lease_ttl`` seconds (if no sweep is scheduled yet)."""
+        with self._sweeper_lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Timer(self.lease_ttl, self._sweep_leases)
+                self._sweeper.daemon = True
+                self._sweeper.start()
+
+    def _sweep_leases(self) -> None:
+        """
+        Gives the unused calls of every expired lease back and removes it,
+        so an ``id`` which isn't used anymore doesn't keep them reserved
+        (or it's entry in ``_leases``). Runs every ``lease_ttl`` seconds as long as there are leases.
+        """
+        with self._sweeper_lock:
+            self._sweeper = None
+
+        for key, lease in list(self._leases.items()):
+            # a lease which is in use right now is swept next time
+            if lease.expires > monotonic() or not lease.lock.acquire(blocking=False):
+                continue
+            try:
+                if lease.expires > monotonic():
+                    continue
+                if lease.permits > 0:
+                    try:
+                        self._backend.release(lease.handle, lease.permits)
+                    except (RedisError, OSError):
+                        # the backend expires them on it's own
+                        pass
+                    lease.permits = 0
+                lease.swept = True
+                if self._leases.get(key) is lease:
+                    del self._leases[key]
+            finally:
+                lease.lock.release()
+
+        if self._leases:
+            self._schedule_sweep()
+
+    def release_leases(self) -> None:
+        """Gives the unused calls of every lease back (e.g. before shutting down)."""
+        for lease in list(self._leases.values()):
+            with lease.lock:
+                if lease.permits > 0:
+                    self._backend.release(lease.handle, lease.permits)
+                    lease.permits = 0
+                lease.swept = True
+        self._leases.clear()
 
 
 if __name__ == "__main__":
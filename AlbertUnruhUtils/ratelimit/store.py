@@ -0,0 +1,289 @@
+__all__ = ("PolicyStore",)
+
+
+import json
+import threading
+import typing
+import weakref
+from redis import Redis
+from redis.exceptions import RedisError
+from types import MappingProxyType
+
+from .policy import Limit
+
+
+_LIMIT = dict[str, int]
+_SECTION = typing.Union[_LIMIT, Limit, list[typing.Union[_LIMIT, Limit]]]
+_SECTIONS = typing.Mapping[str, tuple[Limit, ...]]
+_SUBSCRIBER = typing.Callable[[_SECTIONS], None]
+
+# the errors which don't stop ``watch()``
+_FAILURES = (RedisError, OSError, ValueError)
+
+
+def _parse(
+    sections: typing.Mapping[str, _SECTION],
+) -> _SECTIONS:
+    """Validates ``sections`` (raises ``ValueError`` if a limit is invalid)."""
+    parsed = {}
+    for section, limits in sections.items():
+        if isinstance(limits, (dict, Limit)):
+            limits = [limits]
+        parsed[section] = tuple(Limit.parse(limit) for limit in limits)
+        if not parsed[section]:
+            raise ValueError(f"Section {section!r} needs at least one limit!")
+    return MappingProxyType(parsed)
+
+
+def _decode(
+    fields: dict[bytes, bytes],
+) -> _SECTIONS:
+    """Parses the fields of a redis-hash (the ``section``'s) with their limits as JSON."""
+    try:
+        return _parse(
+            {section.decode(): json.loads(limits) for section, limits in fields.items()}
+        )
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid sections in redis: {e}") from None
+
+
+def _encode(
+    sections: _SECTIONS,
+) -> dict[str, str]:
+    """The fields of a redis-hash (``_decode`` reverses it)."""
+    return {
+        section: json.dumps(
+            [
+                {
+                    "amount": limit.amount,
+                    "interval": limit.interval,
+                    "timeout": limit.timeout,
+                }
+                for limit in limits
+            ]
+        )
+        for section, limits in sections.items()
+    }
+
+
+class PolicyStore:
+    """
+    Versioned sections which can be swapped at runtime.
+    A ``ServerRateLimit`` which got a ``PolicyStore`` as ``sections`` recompiles it's
+    policies on every update and swaps them in at once, so a decorated function
+    uses the new limits from it's next call on (without any locking per call).
+
+    The sections can also be kept in a redis-hash (one field per ``section``
+    with the limit or the list of limits as JSON, e.g.
+    ``HSET rl:sections user '{"amount": 10, "interval": 60, "timeout": 60}'``),
+    which is polled by ``watch()``.
+    """
+
+    __slots__ = (
+        "_sections",
+        "_version",
+        "_subscribers",
+        "_lock",
+        "_stop",
+    )
+
+    def __init__(
+        self,
+        sections: typing.Mapping[str, _SECTION],
+    ):
+        """
+        Parameters
+        ----------
+        sections: typing.Mapping[str, _SECTION]
+            The sections like ``ServerRateLimit`` takes them.
+        """
+        self._sections = _parse(sections)
+        self._version = 1
+        self._subscribers: list[typing.Callable[[], typing.Optional[_SUBSCRIBER]]] = []
+        self._lock = threading.Lock()
+        self._stop: typing.Optional[threading.Event] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"<PolicyStore version={self._version} sections={list(self._sections)!r}>"
+        )
+
+    @property
+    def sections(self) -> _SECTIONS:
+        """The current sections (read-only, an update replaces them)."""
+        return self._sections
+
+    @property
+    def version(self) -> int:
+        """Is incremented by every update."""
+        return self._version
+
+    def subscribe(
+        self,
+        callback: _SUBSCRIBER,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        callback: _SUBSCRIBER
+            Gets the current sections right away and the new ones on every update.
+            Bound methods are only referenced weakly, so the
+            ``ServerRateLimit``'s using this store can still be garbage collected.
+        """
+        if hasattr(callback, "__self__"):
+            reference = weakref.WeakMethod(callback)  # type: ignore
+        else:
+            reference = lambda: callback  # noqa
+        with self._lock:
+            callback(self._sections)
+            self._subscribers.append(reference)
+
+    def update(
+        self,
+        sections: typing.Mapping[str, _SECTION],
+    ) -> int:
+        """
+        Parameters
+        ----------
+        sections: typing.Mapping[str, _SECTION]
+            Replaces every section (they are validated before anything is swapped).
+
+        Returns
+        -------
+        int
+            The new version.
+
+        Raises
+        ------
+        ValueError
+            If a limit is invalid (the current sections are kept).
+        """
+        return self._swap(_parse(sections))
+
+    def load(
+        self,
+        redis: Redis,
+        key: str,
+    ) -> bool:
+        """
+        Updates the sections from a redis-hash (if they changed).
+
+        Parameters
+        ----------
+        redis: Redis
+        key: str
+            The key of the hash.
+
+        Returns
+        -------
+        bool
+            Whether the sections changed.
+
+        Raises
+        ------
+        ValueError
+            If the hash is empty or contains invalid sections (the current sections are kept).
+        """
+        return self._load(redis.hgetall(key), key)
+
+    def save(
+        self,
+        redis: Redis,
+        key: str,
+    ) -> None:
+        """
+        Replaces the redis-hash with the current sections (e.g. to publish a change
+        which was made with ``update()`` to every process which ``watch()``'s the hash).
+
+        Parameters
+        ----------
+        redis: Redis
+        key: str
+            The key of the hash.
+        """
+        fields = _encode(self._sections)
+        # without MULTI/EXEC (a ``RedisCluster`` doesn't support it), so the hash
+        # is never empty in between, the removed sections are deleted afterwards
+        stale = [field for field in redis.hkeys(key) if field.decode() not in fields]
+        with redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=fields)
+            if stale:
+                pipe.hdel(key, *stale)
+            pipe.execute()
+
+    def watch(
+        self,
+        redis: Redis,
+        key: str,
+        *,
+        interval: float = 5.0,
+        on_error: typing.Callable[[Exception], None] = None,
+    ) -> None:
+        """
+        Polls the redis-hash every ``interval`` seconds in a daemon-thread
+        until ``stop()`` is called. The hash is loaded once before this returns.
+
+        Parameters
+        ----------
+        redis: Redis
+        key: str
+            The key of the hash.
+        interval: float
+            In seconds.
+        on_error: typing.Callable[[Exception], None], optional
+            Gets every error of a poll (e.g. if redis is down or the hash contains invalid sections),
+            the current sections are kept until the next poll succeeds.
+        """
+        if not interval > 0:
+            raise ValueError(f"interval must be positive, not {interval!r}!")
+        if self._stop is not None:
+            raise RuntimeError("The store is already watched!")
+
+        self.load(redis, key)
+        stop = self._stop = threading.Event()
+
+        def poll() -> None:
+            while not stop.wait(interval):
+                try:
+                    self.load(redis, key)
+                except _FAILURES as e:
+                    if on_error is not None:
+                        on_error(e)
+
+        threading.Thread(target=poll, name=f"PolicyStore({key})", daemon=True).start()
+
+    def stop(self) -> None:
+        """Stops ``watch()``."""
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+    def _load(
+        self,
+        fields: dict[bytes, bytes],
+        key: str,
+    ) -> bool:
+        if not fields:
+            raise ValueError(f"There are no sections in {key!r}!")
+        sections = _decode(fields)
+        if sections == self._sections:
+            return False
+        self._swap(sections)
+        return True
+
+    def _swap(
+        self,
+        sections: _SECTIONS,
+    ) -> int:
+        """Replaces the sections and hands them to every subscriber."""
+        with self._lock:
+            self._sections = sections
+            self._version += 1
+            subscribers = []
+            for reference in self._subscribers:
+                callback = reference()
+                if callback is not None:
+                    subscribers.append(reference)
+                    callback(sections)
+            self._subscribers = subscribers
+            return self._version
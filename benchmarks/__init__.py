@@ -0,0 +1,4 @@
+"""
+Benchmarks for the rate limiters (they aren't part of the package).
+Run them from the root of the repository with ``python -m benchmarks.ratelimit``.
+"""
@@ -0,0 +1,389 @@
+"""
+Benchmarks ``.ratelimit.server.ServerRateLimit`` and ``.asynchronous.ratelimit.server.ServerRateLimit``
+against a local redis (see ``.server``) across concurrency levels, key cardinalities and ``amount`` sizes.
+
+Usage (from the root of the repository)::
+
+    python -m benchmarks.ratelimit --save baseline.json
+    # ... change something ...
+    python -m benchmarks.ratelimit --compare baseline.json
+
+Every case reports the calls per second, how many of them were allowed and the p50/p99 latency
+of a single call, overall and separately for allowed and denied calls (a denied call skips the write,
+so with a small ``amount`` most calls take the deny-path; ``--amount`` can be sized to ``--calls``
+to measure the allow-path only).
+With ``--compare`` every case which got slower than ``--threshold`` is reported
+and the exit code is ``1``, so it can be used in CI.
+"""
+
+__all__ = (
+    "run",
+    "compare",
+)
+
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import platform
+import random
+import sys
+import threading
+import typing
+from redis import Redis
+from time import perf_counter
+
+from AlbertUnruhUtils.asynchronous.ratelimit.backend import (
+    RedisBackend as AsyncRedisBackend,
+)
+from AlbertUnruhUtils.asynchronous.ratelimit.server import (
+    ServerRateLimit as AsyncServerRateLimit,
+)
+from AlbertUnruhUtils.ratelimit.server import ServerRateLimit
+
+from .server import redis_server
+
+
+_MODE = typing.Literal["sync", "async"]
+_Stats = dict[str, float]
+
+
+def _percentile(
+    latencies: list[float],
+    percent: float,
+) -> float:
+    """Nearest-rank percentile of sorted ``latencies``."""
+    return latencies[max(0, math.ceil(percent / 100 * len(latencies)) - 1)]
+
+
+def _stats(
+    allowed: list[float],
+    denied: list[float],
+    elapsed: float,
+) -> _Stats:
+    """
+    Parameters
+    ----------
+    allowed: list[float]
+        The latencies of the allowed calls.
+    denied: list[float]
+        The latencies of the denied calls.
+    elapsed: float
+
+    Returns
+    -------
+    _Stats
+        The ``p50_ms``/``p99_ms`` of every call, prefixed with ``allowed_`` or ``denied_``
+        for the calls of one path (only if there were any).
+    """
+    latencies = sorted(allowed + denied)
+    stats = {
+        "calls_per_sec": len(latencies) / elapsed,
+        "allowed": len(allowed) / len(latencies),
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+    for path, path_latencies in (("allowed", allowed), ("denied", denied)):
+        if path_latencies:
+            path_latencies.sort()
+            stats[f"{path}_p50_ms"] = _percentile(path_latencies, 50) * 1000
+            stats[f"{path}_p99_ms"] = _percentile(path_latencies, 99) * 1000
+    return stats
+
+
+def _sections(
+    amount: int,
+) -> dict[str, dict[str, int]]:
+    # a long interval, so ``amount`` decides how much state is kept per key
+    return {"bench": {"amount": amount, "interval": 60, "timeout": 0}}
+
+
+def _run_sync(
+    port: int,
+    concurrency: int,
+    keys: int,
+    amount: int,
+    calls: int,
+    algorithm: str,
+    engine: str,
+) -> _Stats:
+    redis = Redis("127.0.0.1", port, max_connections=concurrency + 1)
+    redis.flushdb()
+    limiter = ServerRateLimit(
+        _sections(amount),
+        lambda id: ("bench", id),  # noqa
+        redis=redis,
+        algorithm=algorithm,  # type: ignore
+        engine=engine,  # type: ignore
+    )
+    call = limiter(lambda id: None)  # noqa
+
+    per_worker = max(1, calls // concurrency)
+    allowed: list[float] = []
+    denied: list[float] = []
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        own = {True: [], False: []}
+        barrier.wait()
+        for _ in range(per_worker):
+            id = rng.randrange(keys)  # noqa
+            start = perf_counter()
+            (ok, _), _ = call(id=id)
+            own[ok].append(perf_counter() - start)
+        allowed.extend(own[True])
+        denied.extend(own[False])
+
+    threads = [
+        threading.Thread(target=worker, args=(seed,)) for seed in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+
+    redis.close()
+    return _stats(allowed, denied, elapsed)
+
+
+async def _run_async(
+    port: int,
+    concurrency: int,
+    keys: int,
+    amount: int,
+    calls: int,
+    algorithm: str,
+    engine: str,
+) -> _Stats:
+    backend = AsyncRedisBackend(port=port, max_connections=concurrency + 1)
+    await backend.redis.flushdb()
+
+    async def retrieve(id: int) -> tuple[str, int]:  # noqa
+        return "bench", id
+
+    limiter = AsyncServerRateLimit(
+        _sections(amount),
+        retrieve,
+        backend=backend,
+        algorithm=algorithm,  # type: ignore
+        engine=engine,  # type: ignore
+    )
+
+    @limiter
+    async def call(id: int) -> None:  # noqa
+        pass
+
+    per_worker = max(1, calls // concurrency)
+    allowed: list[float] = []
+    denied: list[float] = []
+
+    async def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        for _ in range(per_worker):
+            id = rng.randrange(keys)  # noqa
+            start = perf_counter()
+            (ok, _), _ = await call(id=id)
+            (allowed if ok else denied).append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(worker(seed) for seed in range(concurrency)))
+    elapsed = perf_counter() - start
+
+    await backend.redis.close()
+    await backend.redis.connection_pool.disconnect()
+    return _stats(allowed, denied, elapsed)
+
+
+def run(
+    *,
+    port: int,
+    modes: typing.Iterable[_MODE] = ("sync", "async"),
+    concurrency: typing.Iterable[int] = (1, 8, 32),
+    keys: typing.Iterable[int] = (1, 1000),
+    amounts: typing.Iterable[int] = (10, 1000),
+    calls: int = 2000,
+    algorithm: str = "sliding_log",
+    engine: str = "script",
+    report: typing.Callable[[str, _Stats], None] = None,
+) -> dict[str, _Stats]:
+    """
+    Parameters
+    ----------
+    port: int
+        The port of the redis on ``127.0.0.1``.
+    modes: typing.Iterable[_MODE]
+    concurrency: typing.Iterable[int]
+        How many threads (``"sync"``) or tasks (``"async"``) call at once.
+    keys: typing.Iterable[int]
+        Across how many ``id``'s the calls are spread.
+    amounts: typing.Iterable[int]
+        The ``amount`` of the limit (the interval is 60 seconds, so with fewer
+        than ``calls`` per key the remaining calls are denied).
+    calls: int
+        How many calls are made per case.
+    algorithm: str
+    engine: str
+    report: typing.Callable[[str, _Stats], None], optional
+        Gets the name and the stats of every case when it's done.
+
+    Returns
+    -------
+    dict[str, _Stats]
+        The stats of every case (keyed by their name).
+    """
+    results = {}
+    for mode, workers, cardinality, amount in itertools.product(
+        modes, concurrency, keys, amounts
+    ):
+        name = f"{mode}/{algorithm}/{engine}/c={workers}/keys={cardinality}/amount={amount}"
+        args = (port, workers, cardinality, amount, calls, algorithm, engine)
+        if mode == "sync":
+            stats = _run_sync(*args)
+        else:
+            stats = asyncio.run(_run_async(*args))
+        results[name] = stats
+        if report is not None:
+            report(name, stats)
+    return results
+
+
+def compare(
+    baseline: dict[str, _Stats],
+    results: dict[str, _Stats],
+    threshold: float = 0.1,
+) -> list[str]:
+    """
+    Parameters
+    ----------
+    baseline: dict[str, _Stats]
+    results: dict[str, _Stats]
+    threshold: float
+        How much slower (relative) a case may get before it counts as regression.
+
+    Returns
+    -------
+    list[str]
+        The names of the cases which regressed (fewer calls per second or a higher p99 latency,
+        overall or of the allowed or denied calls).
+    """
+    regressions = []
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        slower = stats["calls_per_sec"] < old["calls_per_sec"] * (1 - threshold)
+        laggier = any(
+            stats[key] > old[key] * (1 + threshold)
+            for key in ("p99_ms", "allowed_p99_ms", "denied_p99_ms")
+            if key in stats and key in old
+        )
+        if slower or laggier:
+            regressions.append(name)
+    return regressions
+
+
+def _ints(
+    value: str,
+) -> list[int]:
+    return [int(part) for part in value.split(",")]
+
+
+def main(
+    argv: typing.Sequence[str] = None,
+) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.ratelimit",
+        description="Benchmarks ServerRateLimit against a local redis.",
+    )
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 8, 32])
+    parser.add_argument("--keys", type=_ints, default=[1, 1000])
+    parser.add_argument("--amount", type=_ints, default=[10, 1000])
+    parser.add_argument("--calls", type=int, default=2000, help="calls per case")
+    parser.add_argument(
+        "--algorithm",
+        choices=["sliding_log", "gcra", "token_bucket", "sliding_window"],
+        default="sliding_log",
+    )
+    parser.add_argument("--engine", choices=["commands", "script"], default="script")
+    parser.add_argument(
+        "--server",
+        choices=["redis-server", "stand-in"],
+        default=None,
+        help="defaults to redis-server if it's installed",
+    )
+    parser.add_argument("--save", metavar="FILE", help="stores the results as baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compares with a baseline")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    def report(name: str, stats: _Stats) -> None:
+        line = (
+            f"{name:<55} {stats['calls_per_sec']:>10.0f} calls/s"
+            f"  {stats['allowed']:>6.1%} allowed"
+            f"  p50 {stats['p50_ms']:>7.3f}ms  p99 {stats['p99_ms']:>7.3f}ms"
+        )
+        for path in ("allowed", "denied"):
+            if f"{path}_p50_ms" in stats:
+                line += (
+                    f"  {path} p50 {stats[f'{path}_p50_ms']:>7.3f}ms"
+                    f" p99 {stats[f'{path}_p99_ms']:>7.3f}ms"
+                )
+        old = None if baseline is None else baseline["results"].get(name)
+        if old is not None:
+            change = stats["calls_per_sec"] / old["calls_per_sec"] - 1
+            line += f"  ({change:+.1%} calls/s)"
+        print(line, flush=True)
+
+    with redis_server(args.server) as (server, port):
+        print(f"server: {server} (port {port})", flush=True)
+        if baseline is not None and baseline["server"] != server:
+            print(
+                f"warning: the baseline was measured against {baseline['server']!r}",
+                file=sys.stderr,
+            )
+        results = run(
+            port=port,
+            modes=("sync", "async") if args.mode == "both" else (args.mode,),
+            concurrency=args.concurrency,
+            keys=args.keys,
+            amounts=args.amount,
+            calls=args.calls,
+            algorithm=args.algorithm,
+            engine=args.engine,
+            report=report,
+        )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "server": server,
+                    "python": platform.python_version(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if baseline is not None:
+        regressions = compare(baseline["results"], results, args.threshold)
+        for name in regressions:
+            print(f"regression: {name}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
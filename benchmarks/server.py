@@ -0,0 +1,124 @@
+"""
+Starts a redis to benchmark against, on a random port.
+
+A real ``redis-server`` is used if it's on the ``PATH``, otherwise the pure-Python
+``fakeredis.TcpFakeServer`` stands in (install the ``bench``-extra, the Lua-scripts need ``lupa``).
+The stand-in is much slower than a real redis, so only results
+which were measured against the same kind of server are comparable.
+"""
+
+__all__ = ("redis_server",)
+
+
+import contextlib
+import shutil
+import socket
+import subprocess
+import threading
+import typing
+from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from time import (
+    monotonic,
+    sleep,
+)
+
+
+_KIND = typing.Literal["redis-server", "stand-in"]
+
+
+@contextlib.contextmanager
+def redis_server(
+    kind: _KIND = None,
+) -> typing.Iterator[tuple[_KIND, int]]:
+    """
+    Parameters
+    ----------
+    kind: _KIND, optional
+        Which server is started.
+        Defaults to ``"redis-server"`` if it's installed, otherwise to ``"stand-in"``.
+
+    Yields
+    ------
+    tuple[_KIND, int]
+        Which server was started and it's port (on ``127.0.0.1``).
+    """
+    if kind is None:
+        kind = "redis-server" if shutil.which("redis-server") else "stand-in"
+
+    if kind == "redis-server":
+        with _redis_server() as port:
+            yield kind, port
+    elif kind == "stand-in":
+        with _stand_in() as port:
+            yield kind, port
+    else:
+        raise ValueError(f"Unknown kind {kind!r}!")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(
+    port: int,
+    timeout: float = 10.0,
+) -> None:
+    deadline = monotonic() + timeout
+    redis = Redis("127.0.0.1", port)
+    while True:
+        try:
+            redis.ping()
+            return
+        except RedisConnectionError:
+            if monotonic() > deadline:
+                raise
+            sleep(0.05)
+        finally:
+            redis.close()
+
+
+@contextlib.contextmanager
+def _redis_server() -> typing.Iterator[int]:
+    port = _free_port()
+    # nothing is persisted, so the benchmark only measures the limiter
+    process = subprocess.Popen(
+        [
+            "redis-server",
+            "--bind",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--save",
+            "",
+            "--appendonly",
+            "no",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_until_ready(port)
+        yield port
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextlib.contextmanager
+def _stand_in() -> typing.Iterator[int]:
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", 0))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        port = server.server_address[1]
+        _wait_until_ready(port)
+        yield port
+    finally:
+        server.shutdown()
+        server.server_close()
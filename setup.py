@@ -22,14 +22,18 @@ description = re.search(
 
 # not in setup.cfg for GitHub's Dependency-Graph
 install_requires = [
-    "redis>=4.3.4,<4.6.0",
+    # cancelling a command (e.g. by ``asyncio.wait_for``) is only safe since 4.5.4 (CVE-2023-28858/28859)
+    "redis>=4.5.4,<4.6.0",
     "pillow>=9.2,<9.6",
     "matplotlib>=3.6.1,<3.8.0",
 ]
 extras_require = {
-    "async": [
-        "aioredis~=2.0.1",
-    ],
+    # async-support uses ``redis.asyncio``, the extra is only kept for compatibility
+    "async": [],
+    # ``python -m pytest`` (the scripts of ``RedisBackend`` need ``lupa``)
+    "test": ["pytest", "fakeredis[lua]>=2.10"],
+    # ``python -m benchmarks.ratelimit`` without a ``redis-server`` (``fakeredis.TcpFakeServer``)
+    "bench": ["fakeredis[lua]>=2.31.1"],
 }
 
 
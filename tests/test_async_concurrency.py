@@ -0,0 +1,54 @@
+"""Checks the behavior of ``.asynchronous.ratelimit.concurrency.ConcurrencyLimit``."""
+
+import asyncio
+import fakeredis
+import pytest
+from fakeredis import aioredis
+
+from AlbertUnruhUtils.asynchronous.ratelimit import ConcurrencyLimit
+
+
+def _redis():
+    return aioredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+def test_slots_are_limited_extended_and_given_back():
+    limit = ConcurrencyLimit({"user": {"amount": 1, "ttl": 0.2}}, None, redis=_redis())
+
+    async def run():
+        token, remaining = await limit.acquire("user", 42)
+        assert token is not None and remaining == 0
+        assert await limit.acquire("user", 42) == (None, 0)
+
+        await asyncio.sleep(0.15)
+        assert await limit.extend("user", 42, token) is True
+        await asyncio.sleep(0.15)
+        assert await limit.acquire("user", 42) == (None, 0)
+
+        await limit.release("user", 42, token)
+        assert (await limit.acquire("user", 42))[0] is not None
+
+    asyncio.run(run())
+
+
+def test_decorator_gives_the_slot_back():
+    async def user():
+        return "user", 42
+
+    limit = ConcurrencyLimit({"user": {"amount": 1, "ttl": 60}}, user, redis=_redis())
+
+    @limit
+    async def call():
+        return await limit.acquire("user", 42)
+
+    async def run():
+        (allowed, _), inner = await call()
+        assert allowed is True and inner == (None, 0)
+        assert (await call())[0][0] is True
+
+    asyncio.run(run())
+
+
+def test_invalid_sections_are_rejected():
+    with pytest.raises(ValueError):
+        ConcurrencyLimit({"user": {"amount": 0, "ttl": 60}}, None, redis=_redis())
@@ -0,0 +1,101 @@
+"""Checks the behavior of ``.asynchronous.ratelimit.server.ServerRateLimit``."""
+
+import asyncio
+import pytest
+import time
+
+from AlbertUnruhUtils.asynchronous.ratelimit import (
+    MemoryBackend,
+    ServerRateLimit,
+)
+
+from .test_server import Spy
+
+
+async def _user():
+    return "user", 1
+
+
+async def _noop():
+    pass
+
+
+def test_stacked_limits_are_evaluated_at_once():
+    backend = Spy(MemoryBackend())
+
+    @ServerRateLimit(
+        {
+            "user": [
+                {"amount": 2, "interval": 1, "timeout": 0},
+                {"amount": 1000, "interval": 3600, "timeout": 0},
+            ]
+        },
+        _user,
+        backend=backend,
+        engine="commands",
+    )
+    async def limited():
+        pass
+
+    async def run():
+        return [(await limited())[0][0] for _ in range(3)]
+
+    assert asyncio.run(run()) == [True, True, False]
+    assert set(backend.calls) == {"evaluate"}
+
+
+@pytest.mark.parametrize("batch", (0, 0.05))
+def test_concurrent_checks_are_batched(batch):
+    backend = Spy(MemoryBackend())
+    limited = ServerRateLimit(
+        {"user": {"amount": 3, "interval": 60, "timeout": 0}},
+        _user,
+        backend=backend,
+        batch=batch,
+    )(_noop)
+
+    async def run():
+        return [
+            result[0][0]
+            for result in await asyncio.gather(*(limited() for _ in range(5)))
+        ]
+
+    assert sorted(asyncio.run(run())) == [False, False, True, True, True]
+    # one round trip for every check
+    assert backend.calls == ["evaluate_many"]
+
+
+def test_acquire_many_and_peek():
+    backend = Spy(MemoryBackend())
+    limiter = ServerRateLimit(
+        {"user": {"amount": 2, "interval": 60, "timeout": 0}},
+        _user,
+        backend=backend,
+    )
+
+    async def run():
+        decisions = await limiter.acquire_many([("user", 1)] * 3)
+        assert [allowed for allowed, _ in decisions] == [True, True, False]
+        assert backend.calls == ["evaluate_many"]
+        assert (await limiter.peek("user", 2)).remaining == 2
+        assert (await limiter.peek("user", 2)).remaining == 2
+
+    asyncio.run(run())
+
+
+def test_wait_parks_the_call_until_there_is_room():
+    limited = ServerRateLimit(
+        {"user": {"amount": 1, "interval": 1, "timeout": 0}},
+        _user,
+        backend=MemoryBackend(),
+        wait=True,
+        max_wait=2,
+    )(_noop)
+
+    async def run():
+        assert (await limited())[0][0] is True
+        start = time.monotonic()
+        assert (await limited())[0][0] is True
+        assert 0.5 < time.monotonic() - start < 2
+
+    asyncio.run(run())
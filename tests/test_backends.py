@@ -0,0 +1,187 @@
+"""
+Runs the same calls through ``MemoryBackend`` and ``RedisBackend`` (on ``fakeredis``,
+the scripts need ``lupa``) and checks that both allow and deny the same calls.
+"""
+
+import asyncio
+import fakeredis
+import pytest
+import time
+from fakeredis import aioredis
+
+from AlbertUnruhUtils.asynchronous.ratelimit import (
+    MemoryBackend as AsyncMemoryBackend,
+    RedisBackend as AsyncRedisBackend,
+    ServerRateLimit as AsyncServerRateLimit,
+    TimerWheelBackend,
+)
+from AlbertUnruhUtils.ratelimit import (
+    MemoryBackend,
+    RedisBackend,
+    ServerRateLimit,
+)
+
+
+ALGORITHMS = ("sliding_log", "gcra", "token_bucket", "sliding_window")
+
+# (sections, the scopes of every call, the expected outcome of every call)
+SCENARIOS = {
+    "burst": (
+        {"user": {"amount": 3, "interval": 60, "timeout": 0}},
+        [("user", 1)] * 6,
+        [True, True, True, False, False, False],
+    ),
+    "cooldown": (
+        {"user": {"amount": 2, "interval": 60, "timeout": 30}},
+        [("user", 1)] * 4,
+        [True, True, False, False],
+    ),
+    "ids": (
+        {"user": {"amount": 1, "interval": 60, "timeout": 0}},
+        [("user", 1), ("user", 2), ("user", 1), ("user", 3), ("user", 2)],
+        [True, True, False, True, False],
+    ),
+    "limits": (
+        {
+            "user": [
+                {"amount": 4, "interval": 60, "timeout": 0},
+                {"amount": 2, "interval": 30, "timeout": 0},
+            ]
+        },
+        [("user", 1)] * 3,
+        [True, True, False],
+    ),
+    "scopes": (
+        {
+            "global": {"amount": 3, "interval": 60, "timeout": 0},
+            "user": {"amount": 2, "interval": 60, "timeout": 0},
+        },
+        [
+            [("global", 0), ("user", 1)],
+            [("global", 0), ("user", 1)],
+            [("global", 0), ("user", 1)],
+            [("global", 0), ("user", 2)],
+            [("global", 0), ("user", 2)],
+            [("global", 0), ("user", 3)],
+        ],
+        [True, True, False, True, False, False],
+    ),
+}
+
+
+def _backends():
+    yield "memory", "commands", MemoryBackend()
+    for engine in ("commands", "script"):
+        redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        yield "redis", engine, RedisBackend(redis)
+
+
+def _async_backends():
+    yield "memory", "commands", AsyncMemoryBackend()
+    yield "timer-wheel", "commands", TimerWheelBackend()
+    for engine in ("commands", "script"):
+        redis = aioredis.FakeRedis(server=fakeredis.FakeServer())
+        yield "redis", engine, AsyncRedisBackend(redis)
+
+
+def _limited(sections, algorithm, engine, backend):
+    return ServerRateLimit(
+        sections,
+        lambda scopes: scopes,
+        backend=backend,
+        algorithm=algorithm,
+        engine=engine,
+    )(lambda scopes: None)
+
+
+def _async_limited(sections, algorithm, engine, backend):
+    async def retrieve_section(scopes):
+        return scopes
+
+    async def func(scopes):
+        return None
+
+    return AsyncServerRateLimit(
+        sections,
+        retrieve_section,
+        backend=backend,
+        algorithm=algorithm,
+        engine=engine,
+    )(func)
+
+
+def _outcome(result):
+    (allowed, decision), _ = result
+    return allowed, decision["request"]["remaining"]
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_same_decisions(algorithm, scenario):
+    sections, calls, expected = SCENARIOS[scenario]
+
+    outcomes = {}
+    for name, engine, backend in _backends():
+        limited = _limited(sections, algorithm, engine, backend)
+        outcomes[name, engine] = [_outcome(limited(scopes)) for scopes in calls]
+
+    memory = outcomes.pop(("memory", "commands"))
+    assert [allowed for allowed, _ in memory] == expected
+    for backend, outcome in outcomes.items():
+        assert outcome == memory, backend
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_same_decisions_async(algorithm, scenario):
+    sections, calls, expected = SCENARIOS[scenario]
+
+    async def run():
+        outcomes = {}
+        for name, engine, backend in _async_backends():
+            limited = _async_limited(sections, algorithm, engine, backend)
+            outcomes[name, engine] = [
+                _outcome(await limited(scopes)) for scopes in calls
+            ]
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    memory = outcomes.pop(("memory", "commands"))
+    assert [allowed for allowed, _ in memory] == expected
+    for backend, outcome in outcomes.items():
+        assert outcome == memory, backend
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_same_decisions_after_interval(algorithm):
+    sections = {"user": {"amount": 2, "interval": 1, "timeout": 0}}
+    limited = {
+        (name, engine): _limited(sections, algorithm, engine, backend)
+        for name, engine, backend in _backends()
+    }
+
+    outcomes = {backend: [] for backend in limited}
+    for backend, func in limited.items():
+        outcomes[backend] += [func(("user", 1))[0][0] for _ in range(3)]
+    # every algorithm has forgotten the calls after two intervals
+    time.sleep(2.1)
+    for backend, func in limited.items():
+        outcomes[backend] += [func(("user", 1))[0][0] for _ in range(3)]
+
+    for backend, outcome in outcomes.items():
+        assert outcome == [True, True, False, True, True, False], backend
+
+
+def test_commands_dont_use_transactions(monkeypatch):
+    # ``RedisCluster`` doesn't support MULTI/EXEC
+    redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    pipeline = redis.pipeline
+
+    def no_transaction(transaction=True, **kwargs):
+        assert not transaction
+        return pipeline(transaction=transaction, **kwargs)
+
+    monkeypatch.setattr(redis, "pipeline", no_transaction)
+    backend = RedisBackend(redis)
+    backend.record("key", 60)
+    assert backend.count("key") == 1
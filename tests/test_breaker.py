@@ -0,0 +1,111 @@
+"""Checks the behavior of ``.ratelimit.breaker``."""
+
+import pytest
+import time
+from redis.exceptions import ConnectionError
+
+from AlbertUnruhUtils.ratelimit import (
+    BreakerBackend,
+    CircuitBreaker,
+    MemoryBackend,
+)
+
+
+RULES = [("user-1", "cooldown-user-1", 2, 60, 0)]
+
+
+class Slow(MemoryBackend):
+    """A backend which is up, but takes ``delay`` seconds per call."""
+
+    __slots__ = ("delay",)
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def evaluate(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return super().evaluate(*args, **kwargs)
+
+
+class Down(MemoryBackend):
+    __slots__ = ()
+
+    def evaluate(self, *args, **kwargs):
+        raise ConnectionError
+
+
+def test_breaker_opens_after_failures_and_closes_after_a_trial():
+    breaker = CircuitBreaker(failures=2, recovery=0.1)
+
+    breaker.failed()
+    assert breaker.state == "closed"
+    breaker.failed()
+    assert breaker.state == "open"
+    assert breaker.allow() is False
+
+    time.sleep(0.15)
+    assert breaker.allow() is True
+    # only one trial at once
+    assert breaker.allow() is False
+    breaker.succeeded(0.0)
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = CircuitBreaker(failures=1, recovery=0.1)
+    breaker.failed()
+
+    time.sleep(0.15)
+    assert breaker.allow() is True
+    breaker.failed()
+    assert breaker.state == "open"
+
+
+def test_failures_while_open_dont_keep_the_breaker_open():
+    breaker = CircuitBreaker(failures=1, recovery=0.2)
+    breaker.failed()
+
+    for _ in range(4):
+        time.sleep(0.06)
+        breaker.failed()
+    assert breaker.state == "half_open"
+
+
+def test_slow_calls_count_as_failed():
+    breaker = CircuitBreaker(failures=1, slow=0.01)
+    backend = BreakerBackend(Slow(0.05), breaker=breaker)
+
+    assert backend.evaluate("sliding_log", RULES)[0] is True
+    assert breaker.state == "open"
+
+
+def test_timeout_answers_with_the_fallback():
+    breaker = CircuitBreaker(failures=1, slow=10)
+    backend = BreakerBackend(
+        Slow(0.5), breaker=breaker, fallback="closed", timeout=0.05
+    )
+
+    start = time.perf_counter()
+    allowed, _ = backend.evaluate("sliding_log", RULES)
+    assert time.perf_counter() - start < 0.4
+    assert allowed is False
+    assert breaker.state == "open"
+
+
+@pytest.mark.parametrize(
+    "fallback, allowed",
+    (
+        ("local", [True, True, False]),
+        ("open", [True, True, True]),
+        ("closed", [False, False, False]),
+    ),
+)
+def test_fallback_answers_while_the_backend_is_down(fallback, allowed):
+    backend = BreakerBackend(Down(), fallback=fallback)
+    assert [backend.evaluate("sliding_log", RULES)[0] for _ in range(3)] == allowed
+
+
+def test_invalid_timeout_is_rejected():
+    with pytest.raises(ValueError):
+        BreakerBackend(MemoryBackend(), timeout=0)
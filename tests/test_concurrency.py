@@ -0,0 +1,112 @@
+"""Checks the behavior of ``.ratelimit.concurrency.ConcurrencyLimit``."""
+
+import fakeredis
+import pytest
+import time
+
+from AlbertUnruhUtils.ratelimit import ConcurrencyLimit
+
+
+SECTIONS = {"user": {"amount": 2, "ttl": 60}}
+
+
+def _redis():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+@pytest.mark.parametrize(
+    "key_prefix, hash_tags, key",
+    (
+        ("", False, b"inflight-user-42"),
+        ("rl:", False, b"rl:inflight-user-42"),
+        ("rl:", True, b"rl:{user:42}:inflight"),
+    ),
+)
+def test_keys_are_laid_out_like_server_rate_limit(key_prefix, hash_tags, key):
+    redis = _redis()
+    limit = ConcurrencyLimit(
+        SECTIONS, None, redis=redis, key_prefix=key_prefix, hash_tags=hash_tags
+    )
+
+    token, _ = limit.acquire("user", 42)
+    assert redis.keys() == [key]
+    limit.release("user", 42, token)
+    assert redis.keys() == []
+
+
+def test_braces_in_key_prefix_are_rejected_with_hash_tags():
+    with pytest.raises(ValueError):
+        ConcurrencyLimit(
+            SECTIONS, None, redis=_redis(), key_prefix="{rl}:", hash_tags=True
+        )
+
+
+def test_slots_are_limited_and_given_back():
+    limit = ConcurrencyLimit(SECTIONS, None, redis=_redis())
+
+    first, remaining = limit.acquire("user", 42)
+    assert first is not None and remaining == 1
+    second, remaining = limit.acquire("user", 42)
+    assert second is not None and remaining == 0
+    assert limit.acquire("user", 42) == (None, 0)
+    # other ids have their own slots
+    assert limit.acquire("user", 43)[0] is not None
+
+    limit.release("user", 42, first)
+    assert limit.acquire("user", 42)[0] is not None
+
+
+def test_decorator_holds_a_slot_while_the_call_runs():
+    limit = ConcurrencyLimit(
+        {"user": {"amount": 1, "ttl": 60}}, lambda: ("user", 42), redis=_redis()
+    )
+
+    @limit
+    def call():
+        return limit.acquire("user", 42)
+
+    (allowed, data), inner = call()
+    assert allowed is True
+    assert data == {"request": {"remaining": 0, "limit": 1, "ttl": 60}}
+    assert inner == (None, 0)
+    # the slot is given back afterwards
+    assert call()[0][0] is True
+
+
+def test_slots_are_reclaimed_after_ttl_unless_extended():
+    limit = ConcurrencyLimit({"user": {"amount": 1, "ttl": 0.2}}, None, redis=_redis())
+
+    token, _ = limit.acquire("user", 42)
+    time.sleep(0.15)
+    assert limit.extend("user", 42, token) is True
+    time.sleep(0.15)
+    # still held thanks to ``extend``
+    assert limit.acquire("user", 42) == (None, 0)
+
+    time.sleep(0.25)
+    assert limit.extend("user", 42, token) is False
+    assert limit.acquire("user", 42)[0] is not None
+
+
+@pytest.mark.parametrize(
+    "sections",
+    (
+        {"user": {"ttl": 60}},
+        {"user": {"amount": 0, "ttl": 60}},
+        {"user": {"amount": 1.5, "ttl": 60}},
+        {"user": {"amount": 2}},
+        {"user": {"amount": 2, "ttl": 0}},
+        {"user": {"amount": 2, "ttl": "60"}},
+    ),
+)
+def test_invalid_sections_are_rejected(sections):
+    with pytest.raises(ValueError):
+        ConcurrencyLimit(sections, None, redis=_redis())
+
+
+def test_unknown_section_is_rejected():
+    limit = ConcurrencyLimit(SECTIONS, None, redis=_redis())
+    with pytest.raises(RuntimeError):
+        limit.acquire("admin", 42)
+    with pytest.raises(RuntimeError):
+        limit.extend("admin", 42, b"token")
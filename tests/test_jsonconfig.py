@@ -0,0 +1,122 @@
+"""Checks the behavior of ``.config.jsonconfig.JSONConfig``."""
+
+import json
+import pytest
+import time
+
+from AlbertUnruhUtils.config import JSONConfig
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_file_cant_be_changed_inside_a_transaction(tmp_path):
+    config = JSONConfig(file=str(tmp_path / "a.json"), default_config={"a": 1})
+
+    with config.transaction():
+        config["k"] = 1
+        with pytest.raises(RuntimeError):
+            config.file = str(tmp_path / "b.json")
+
+    assert _read(tmp_path / "a.json") == {"a": 1, "k": 1}
+    assert not (tmp_path / "b.json").exists()
+
+    # the transaction is over, so every change is written again
+    config["after"] = 1
+    assert _read(tmp_path / "a.json") == {"a": 1, "k": 1, "after": 1}
+
+
+def test_file_can_be_changed_outside_a_transaction(tmp_path):
+    config = JSONConfig(file=str(tmp_path / "a.json"), flush_threshold=10)
+    config["k"] = 1
+    config.file = str(tmp_path / "b.json")
+
+    assert _read(tmp_path / "a.json")["k"] == 1
+    assert "k" not in _read(tmp_path / "b.json")
+    with config.transaction():
+        config["k"] = 2
+    assert _read(tmp_path / "b.json")["k"] == 2
+
+
+def test_rollback_doesnt_change_default_config(tmp_path):
+    default = {"a": 1}
+    config = JSONConfig(file=str(tmp_path / "a.json"), default_config=default)
+
+    with pytest.raises(KeyError):
+        with config.transaction():
+            config["k"] = 1
+            raise KeyError("k")
+
+    assert default == {"a": 1}
+    assert config.config == {"a": 1}
+    config.file = str(tmp_path / "b.json")
+    assert _read(tmp_path / "b.json") == {"a": 1}
+
+
+def test_changes_are_written_right_away_by_default(tmp_path):
+    config = JSONConfig(file=str(tmp_path / "a.json"), default_config={"x": 0})
+    config["k"] = 1
+    assert _read(tmp_path / "a.json") == {"x": 0, "k": 1}
+
+
+def test_flush_threshold_writes_every_nth_change(tmp_path):
+    config = JSONConfig(
+        file=str(tmp_path / "a.json"), default_config={"x": 0}, flush_threshold=3
+    )
+
+    config["a"] = 1
+    config["b"] = 2
+    assert _read(tmp_path / "a.json") == {"x": 0}
+    config["c"] = 3
+    assert _read(tmp_path / "a.json") == {"x": 0, "a": 1, "b": 2, "c": 3}
+
+    config["d"] = 4
+    config.flush()
+    assert _read(tmp_path / "a.json")["d"] == 4
+
+
+def test_flush_delay_writes_after_the_delay(tmp_path):
+    config = JSONConfig(
+        file=str(tmp_path / "a.json"), default_config={"x": 0}, flush_delay=0.1
+    )
+
+    config["a"] = 1
+    assert _read(tmp_path / "a.json") == {"x": 0}
+    time.sleep(0.3)
+    assert _read(tmp_path / "a.json") == {"x": 0, "a": 1}
+
+
+@pytest.mark.parametrize(
+    "kwargs", ({"flush_delay": 0}, {"flush_threshold": 0}, {"flush_threshold": 1.5})
+)
+def test_invalid_write_behind_is_rejected(tmp_path, kwargs):
+    with pytest.raises(ValueError):
+        JSONConfig(file=str(tmp_path / "a.json"), **kwargs)
+
+
+def test_transaction_writes_once_at_the_end(tmp_path):
+    config = JSONConfig(file=str(tmp_path / "a.json"), default_config={"a": {"b": 1}})
+
+    with config.transaction():
+        config["k"] = 1
+        # in-place changes are written as well
+        config["a"]["b"] = 2
+        assert _read(tmp_path / "a.json") == {"a": {"b": 1}}
+
+    assert _read(tmp_path / "a.json") == {"a": {"b": 2}, "k": 1}
+
+
+def test_nested_rollback_only_discards_the_inner_changes(tmp_path):
+    config = JSONConfig(file=str(tmp_path / "a.json"), default_config={"x": 0})
+
+    with config.transaction():
+        config["outer"] = 1
+        with pytest.raises(KeyError):
+            with config.transaction():
+                config["inner"] = 1
+                raise KeyError("inner")
+        assert config.config == {"x": 0, "outer": 1}
+
+    assert _read(tmp_path / "a.json") == {"x": 0, "outer": 1}
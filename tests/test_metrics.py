@@ -0,0 +1,63 @@
+"""Checks the behavior of ``.ratelimit.metrics`` (e.g. what ``ServerRateLimit(metrics=...)`` reports)."""
+
+import pytest
+import re
+
+from AlbertUnruhUtils.ratelimit import (
+    MemoryBackend,
+    Metrics,
+    ServerRateLimit,
+)
+
+
+def _counters(calls, *, timeout, cooldown_cache=0):
+    metrics = Metrics()
+    limited = ServerRateLimit(
+        {"user": {"amount": 1, "interval": 60, "timeout": timeout}},
+        lambda: ("user", 1),
+        backend=MemoryBackend(),
+        cooldown_cache=cooldown_cache,
+        metrics=metrics,
+    )(lambda: None)
+    for _ in range(calls):
+        limited()
+    return metrics.counters
+
+
+@pytest.mark.parametrize("cooldown_cache", (0, 10))
+def test_the_rejection_which_starts_a_cooldown_is_denied(cooldown_cache):
+    counters = _counters(3, timeout=3, cooldown_cache=cooldown_cache)
+    assert counters == {
+        ("user", "allowed"): 1,
+        ("user", "denied"): 1,
+        ("user", "cooldown"): 1,
+    }
+
+
+def test_without_timeout_every_rejection_is_denied():
+    counters = _counters(3, timeout=0)
+    assert counters == {("user", "allowed"): 1, ("user", "denied"): 2}
+
+
+def test_latencies_are_observed_and_dumped():
+    metrics = Metrics(buckets=(0.5, 1))
+    limited = ServerRateLimit(
+        {'user "a"': {"amount": 1, "interval": 60, "timeout": 0}},
+        lambda: ('user "a"', 1),
+        backend=MemoryBackend(),
+        metrics=metrics,
+    )(lambda: None)
+    limited()
+
+    text = metrics.prometheus("rl")
+    assert 'rl_calls_total{section="user \\"a\\"",outcome="allowed"} 1' in text
+    assert "# TYPE rl_backend_seconds histogram" in text
+    # every command of ``engine="commands"`` is observed on it's own
+    backend = re.search(r"^rl_backend_seconds_count (\d+)$", text, re.MULTILINE)
+    assert backend and int(backend[1]) > 0
+    assert "rl_retrieve_section_seconds_count 1" in text
+
+
+def test_invalid_buckets_are_rejected():
+    with pytest.raises(ValueError):
+        Metrics(buckets=())
@@ -0,0 +1,96 @@
+"""Checks the behavior of ``.ratelimit.policy``."""
+
+import pytest
+
+from AlbertUnruhUtils.ratelimit import (
+    Decision,
+    Limit,
+    MemoryBackend,
+    Policy,
+    ServerRateLimit,
+)
+
+
+@pytest.mark.parametrize(
+    "limit",
+    (
+        {"amount": 0, "interval": 60, "timeout": 0},
+        {"amount": 1, "interval": 0.5, "timeout": 0},
+        {"amount": 1, "interval": 60, "timeout": -1},
+        {"amount": 1, "interval": 60},
+        None,
+    ),
+)
+def test_invalid_limits_are_rejected(limit):
+    with pytest.raises(ValueError):
+        Limit.parse(limit)
+
+
+def test_limits_and_policies_are_immutable():
+    limit = Limit(1, 60, 0)
+    policy = Policy("user", limit)
+
+    with pytest.raises(AttributeError):
+        limit.amount = 2  # noqa
+    with pytest.raises(AttributeError):
+        policy.limits = ()  # noqa
+    assert Limit.parse({"amount": 1, "interval": 60, "timeout": 0}) == limit
+
+
+@pytest.mark.parametrize(
+    "key_prefix, hash_tags, keys",
+    (
+        ("", False, ("call-user-42", "call-user-42-1", "cooldown-user-42")),
+        (
+            "rl:",
+            True,
+            ("rl:{user:42}:call", "rl:{user:42}:call-1", "rl:{user:42}:cooldown"),
+        ),
+    ),
+)
+def test_rules_of_stacked_limits(key_prefix, hash_tags, keys):
+    policy = Policy(
+        "user",
+        [Limit(10, 1, 5), {"amount": 1000, "interval": 3600, "timeout": 60}],
+        key_prefix=key_prefix,
+        hash_tags=hash_tags,
+    )
+
+    assert policy.rules(42) == [
+        (keys[0], keys[2], 10, 1, 5),
+        (keys[1], keys[2], 1000, 3600, 60),
+    ]
+
+
+def test_sections_need_a_limit():
+    with pytest.raises(ValueError):
+        Policy("user", [])
+
+
+def test_decision_can_be_used_like_the_legacy_dict():
+    decision = Decision(False, 0, 10, 60, 30)
+    data = {"request": {"remaining": 0, "limit": 10, "period": 60, "timeout": 30}}
+
+    assert dict(decision) == data
+    assert decision.as_dict() == data
+    assert decision["request"]["timeout"] == 30
+    assert list(decision) == ["request"]
+    with pytest.raises(KeyError):
+        decision["response"]  # noqa
+
+
+def test_decision_reports_the_tightest_limit():
+    limited = ServerRateLimit(
+        {
+            "user": [
+                {"amount": 10, "interval": 1, "timeout": 0},
+                {"amount": 3, "interval": 3600, "timeout": 0},
+            ]
+        },
+        lambda: ("user", 1),
+        backend=MemoryBackend(),
+    )(lambda: None)
+
+    (allowed, decision), _ = limited()
+    assert allowed is decision.allowed is True
+    assert (decision.remaining, decision.limit, decision.period) == (2, 3, 3600)
@@ -0,0 +1,251 @@
+"""Checks the behavior of ``.ratelimit.server.ServerRateLimit``."""
+
+import fakeredis
+import pytest
+import time
+
+from AlbertUnruhUtils.ratelimit import (
+    MemoryBackend,
+    RedisBackend,
+    ServerRateLimit,
+)
+
+
+ALGORITHMS = ("sliding_log", "gcra", "token_bucket", "sliding_window")
+USER = {"amount": 1, "interval": 60, "timeout": 0}
+
+
+class Spy:
+    """Wraps a backend and remembers which of it's methods were called."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = []
+
+    def __getattr__(self, name):
+        attribute = getattr(self.backend, name)
+        if callable(attribute):
+            self.calls.append(name)
+        return attribute
+
+
+def _redis_backend():
+    return RedisBackend(fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+
+
+def test_stacked_limits_are_evaluated_at_once():
+    backend = Spy(MemoryBackend())
+    limited = ServerRateLimit(
+        {
+            "user": [
+                {"amount": 2, "interval": 1, "timeout": 0},
+                {"amount": 1000, "interval": 3600, "timeout": 0},
+            ]
+        },
+        lambda: ("user", 1),
+        backend=backend,
+        engine="commands",
+    )(lambda: None)
+
+    assert [limited()[0][0] for _ in range(3)] == [True, True, False]
+    assert set(backend.calls) == {"evaluate"}
+
+
+def test_scopes_are_evaluated_at_once():
+    backend = Spy(MemoryBackend())
+    limited = ServerRateLimit(
+        {
+            "global": {"amount": 10, "interval": 60, "timeout": 0},
+            "user": {"amount": 1, "interval": 60, "timeout": 0},
+        },
+        lambda: [("global", 0), ("user", 1)],
+        backend=backend,
+        engine="commands",
+    )(lambda: None)
+
+    limited()
+    assert set(backend.calls) == {"evaluate"}
+
+
+@pytest.mark.parametrize("engine", ("commands", "script"))
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_rejected_scopes_arent_recorded(algorithm, engine):
+    limiter = ServerRateLimit(
+        {
+            "global": {"amount": 10, "interval": 60, "timeout": 0},
+            "tenant": {"amount": 5, "interval": 60, "timeout": 0},
+            "user": {"amount": 1, "interval": 60, "timeout": 0},
+        },
+        lambda user: [("global", 0), ("tenant", 0), ("user", user)],
+        backend=_redis_backend(),
+        algorithm=algorithm,
+        engine=engine,
+    )
+    limited = limiter(lambda user: None)
+
+    assert [limited(1)[0][0] for _ in range(3)] == [True, False, False]
+    # only the allowed call is counted by the higher levels
+    assert limiter.peek("global", 0)["request"]["remaining"] == 9
+    assert limiter.peek("tenant", 0)["request"]["remaining"] == 4
+
+
+def test_leases_hand_out_blocks_of_calls():
+    backend = Spy(MemoryBackend())
+    limiter = ServerRateLimit(
+        {"user": {"amount": 10, "interval": 60, "timeout": 0}},
+        lambda: ("user", 1),
+        backend=backend,
+        lease=0.5,
+    )
+    limited = limiter(lambda: None)
+
+    assert [limited()[0][0] for _ in range(11)] == [True] * 10 + [False]
+    # one round trip per block of 5 calls (and one for the rejection)
+    assert backend.calls.count("lease") == 3
+
+
+def test_unused_leased_calls_are_given_back():
+    limiter = ServerRateLimit(
+        {"user": {"amount": 10, "interval": 60, "timeout": 0}},
+        lambda: ("user", 1),
+        backend=MemoryBackend(),
+        lease=0.5,
+    )
+    limiter(lambda: None)()
+
+    # the leased calls which aren't handed out yet count as used
+    assert limiter.peek("user", 1).remaining == 5
+    limiter.release_leases()
+    assert limiter.peek("user", 1).remaining == 9
+
+
+def test_leases_are_given_back_after_lease_ttl():
+    limiter = ServerRateLimit(
+        {"user": {"amount": 10, "interval": 60, "timeout": 0}},
+        lambda: ("user", 1),
+        backend=MemoryBackend(),
+        lease=0.5,
+        lease_ttl=0.1,
+    )
+    limiter(lambda: None)()
+
+    time.sleep(0.3)
+    assert limiter.peek("user", 1).remaining == 9
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_acquire_many_uses_one_round_trip(algorithm):
+    backend = Spy(_redis_backend())
+    limiter = ServerRateLimit(
+        {"user": {"amount": 2, "interval": 60, "timeout": 0}},
+        None,
+        backend=backend,
+        algorithm=algorithm,
+    )
+
+    decisions = limiter.acquire_many([("user", 1)] * 3 + [("user", 2)])
+    assert [allowed for allowed, _ in decisions] == [True, True, False, True]
+    assert [decision.remaining for _, decision in decisions] == [1, 0, 0, 1]
+    assert backend.calls == ["evaluate_many"]
+
+
+def test_wait_parks_the_call_until_there_is_room():
+    limited = ServerRateLimit(
+        {"user": {"amount": 1, "interval": 1, "timeout": 0}},
+        lambda: ("user", 1),
+        backend=MemoryBackend(),
+        wait=True,
+        max_wait=2,
+    )(lambda: None)
+
+    assert limited()[0][0] is True
+    start = time.monotonic()
+    assert limited()[0][0] is True
+    assert 0.5 < time.monotonic() - start < 2
+
+
+def test_max_wait_rejects_calls_which_would_wait_too_long():
+    limited = ServerRateLimit(
+        {"user": {"amount": 1, "interval": 60, "timeout": 0}},
+        lambda: ("user", 1),
+        backend=MemoryBackend(),
+        wait=True,
+        max_wait=0.1,
+    )(lambda: None)
+
+    assert limited()[0][0] is True
+    start = time.monotonic()
+    assert limited()[0][0] is False
+    assert time.monotonic() - start < 0.1
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_peek_doesnt_record_a_call(algorithm):
+    limiter = ServerRateLimit(
+        {"user": {"amount": 2, "interval": 60, "timeout": 30}},
+        lambda: ("user", 1),
+        backend=_redis_backend(),
+        algorithm=algorithm,
+    )
+    limited = limiter(lambda: None)
+
+    assert [limiter.peek("user", 1).remaining for _ in range(3)] == [2, 2, 2]
+    limited()
+    decision = limiter.peek("user", 1)
+    assert decision.allowed is True and decision.remaining == 1
+
+    limited()
+    limited()
+    decision = limiter.peek("user", 1)
+    assert decision.allowed is False and decision.timeout > 0
+
+
+@pytest.mark.parametrize("engine", ("commands", "script"))
+@pytest.mark.parametrize(
+    "key_prefix, hash_tags, keys",
+    (
+        ("", False, {b"call-user-42", b"cooldown-user-42"}),
+        ("rl:", False, {b"rl:call-user-42", b"rl:cooldown-user-42"}),
+        ("rl:", True, {b"rl:{user:42}:call", b"rl:{user:42}:cooldown"}),
+    ),
+)
+def test_keys_are_laid_out_with_key_prefix_and_hash_tags(
+    engine, key_prefix, hash_tags, keys
+):
+    backend = _redis_backend()
+    limited = ServerRateLimit(
+        {"user": {"amount": 1, "interval": 60, "timeout": 30}},
+        lambda: ("user", 42),
+        backend=backend,
+        engine=engine,
+        key_prefix=key_prefix,
+        hash_tags=hash_tags,
+    )(lambda: None)
+
+    assert [limited()[0][0] for _ in range(2)] == [True, False]
+    assert set(backend.redis.keys()) == keys
+
+
+def test_braces_in_key_prefix_are_rejected_with_hash_tags():
+    with pytest.raises(ValueError):
+        ServerRateLimit(
+            {"user": {"amount": 1, "interval": 60, "timeout": 0}},
+            None,
+            backend=MemoryBackend(),
+            key_prefix="{rl}:",
+            hash_tags=True,
+        )
+
+
+def test_sections_are_read_only():
+    limiter = ServerRateLimit(
+        {"user": USER, "admin": [USER]}, None, backend=MemoryBackend()
+    )
+
+    with pytest.raises(TypeError):
+        limiter.sections["user"] = {**USER, "amount": 5}  # noqa
+    with pytest.raises(TypeError):
+        limiter.sections["user"]["amount"] = 5  # noqa
+    with pytest.raises(TypeError):
+        limiter.sections["admin"][0]["amount"] = 5  # noqa
+    assert limiter.sections["user"]["amount"] == 1
@@ -0,0 +1,82 @@
+"""Checks the behavior of ``.ratelimit.backend.SharedMemoryBackend``."""
+
+import asyncio
+import pytest
+import uuid
+
+from AlbertUnruhUtils.asynchronous.ratelimit import (
+    MemoryBackend as AsyncMemoryBackend,
+    ServerRateLimit as AsyncServerRateLimit,
+)
+from AlbertUnruhUtils.ratelimit import (
+    BreakerBackend,
+    ServerRateLimit,
+    SharedMemoryBackend,
+)
+
+
+SECTIONS = {"user": {"amount": 2, "interval": 60, "timeout": 0}}
+
+
+@pytest.fixture
+def backend():
+    backend = SharedMemoryBackend(f"test-{uuid.uuid4().hex}", slots=64, stripes=4)
+    yield backend
+    backend.unlink()
+
+
+@pytest.mark.parametrize("algorithm", ("sliding_log", "sliding_window"))
+def test_unsupported_algorithms_are_rejected_at_once(backend, algorithm):
+    with pytest.raises(ValueError):
+        ServerRateLimit(SECTIONS, None, backend=backend, algorithm=algorithm)
+    with pytest.raises(ValueError):
+        ServerRateLimit(
+            SECTIONS, None, backend=BreakerBackend(backend), algorithm=algorithm
+        )
+    with pytest.raises(ValueError):
+        AsyncServerRateLimit(
+            SECTIONS, None, backend=AsyncMemoryBackend(backend), algorithm=algorithm
+        )
+
+
+@pytest.mark.parametrize("algorithm", ("gcra", "token_bucket"))
+def test_instances_with_the_same_name_share_the_limits(backend, algorithm):
+    other = SharedMemoryBackend(backend.name, slots=64, stripes=4)
+    first, second = (
+        ServerRateLimit(SECTIONS, lambda: ("user", 1), backend=b, algorithm=algorithm)(
+            lambda: None
+        )
+        for b in (backend, other)
+    )
+
+    assert [first()[0][0], second()[0][0], first()[0][0]] == [True, True, False]
+    other.close()
+
+
+def test_async_server_rate_limit(backend):
+    async def retrieve_section():
+        return "user", 1
+
+    @AsyncServerRateLimit(
+        SECTIONS,
+        retrieve_section,
+        backend=AsyncMemoryBackend(backend),
+        algorithm="gcra",
+    )
+    async def limited():
+        pass
+
+    async def run():
+        return [(await limited())[0][0] for _ in range(3)]
+
+    assert asyncio.run(run()) == [True, True, False]
+
+
+def test_full_table_names_the_capacity(backend):
+    assert backend.capacity == 16
+    rules = [(f"key-{i}", f"cooldown-{i}", 2, 60, 0) for i in range(64)]
+    with pytest.raises(RuntimeError, match="holds 16 entries"):
+        for rule in rules:
+            backend.evaluate("gcra", [rule])
+    # a stripe is full before every slot is used
+    assert len(backend) < backend.slots
@@ -0,0 +1,92 @@
+"""Checks the behavior of ``.ratelimit.store.PolicyStore``."""
+
+import fakeredis
+import json
+import pytest
+import time
+
+from AlbertUnruhUtils.ratelimit import (
+    Limit,
+    MemoryBackend,
+    PolicyStore,
+    ServerRateLimit,
+)
+
+
+USER = {"amount": 1, "interval": 60, "timeout": 0}
+
+
+def _redis():
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+def test_update_is_used_from_the_next_call_on():
+    store = PolicyStore({"user": USER})
+    limited = ServerRateLimit(store, lambda: ("user", 1), backend=MemoryBackend())(
+        lambda: None
+    )
+
+    assert [limited()[0][0] for _ in range(2)] == [True, False]
+    assert store.update({"user": {**USER, "amount": 3}}) == 2
+    assert [limited()[0][0] for _ in range(3)] == [True, True, False]
+
+
+def test_invalid_update_keeps_the_sections():
+    store = PolicyStore({"user": USER})
+
+    with pytest.raises(ValueError):
+        store.update({"user": {**USER, "amount": 0}})
+    assert store.version == 1
+    assert store.sections["user"] == (Limit(1, 60, 0),)
+
+
+def test_save_and_load_through_redis():
+    redis = _redis()
+    store = PolicyStore({"user": USER, "admin": USER})
+    store.save(redis, "rl:sections")
+
+    other = PolicyStore({"user": USER})
+    assert other.load(redis, "rl:sections") is True
+    assert set(other.sections) == {"user", "admin"}
+    # nothing changed
+    assert other.load(redis, "rl:sections") is False
+
+    # removed sections are removed from the hash as well
+    store.update({"user": USER})
+    store.save(redis, "rl:sections")
+    assert redis.hkeys("rl:sections") == [b"user"]
+
+
+def test_invalid_hash_keeps_the_sections():
+    redis = _redis()
+    store = PolicyStore({"user": USER})
+
+    with pytest.raises(ValueError):
+        store.load(redis, "rl:sections")
+    redis.hset("rl:sections", "user", "{")
+    with pytest.raises(ValueError):
+        store.load(redis, "rl:sections")
+    assert store.version == 1
+
+
+def test_watch_polls_the_hash():
+    redis = _redis()
+    redis.hset("rl:sections", "user", json.dumps(USER))
+    store = PolicyStore({"user": {**USER, "amount": 5}})
+    errors = []
+
+    store.watch(redis, "rl:sections", interval=0.05, on_error=errors.append)
+    try:
+        assert store.sections["user"][0].amount == 1
+        with pytest.raises(RuntimeError):
+            store.watch(redis, "rl:sections")
+
+        redis.hset("rl:sections", "user", json.dumps({**USER, "amount": 2}))
+        time.sleep(0.2)
+        assert store.sections["user"][0].amount == 2
+
+        redis.hset("rl:sections", "user", "{")
+        time.sleep(0.2)
+        assert errors and store.sections["user"][0].amount == 2
+    finally:
+        store.stop()